@@ -11,6 +11,10 @@ from werkzeug.middleware.proxy_fix import ProxyFix
 
 # Import Core
 from core.utils import jst_converter
+from core.database import init_app as init_database
+from services.ingredient_index import init_ingredient_index
+from services.summary_store import init_summary_store
+from services.standard_snapshot import init_standard_snapshot
 
 # Import Routes (Blueprints)
 from routes.personal import personal_bp
@@ -37,6 +41,18 @@ logging.basicConfig(
     encoding='utf-8'
 )
 
+# リクエスト単位の DB 接続 (終了時にコネクションプールへ返却)
+init_database(app)
+
+# 材料の転置インデックスを準備 (INGREDIENT_INDEX=off の場合は何もしない)
+init_ingredient_index()
+
+# 一覧表示用のサマリーストアを mmap (RECIPE_SUMMARY_STORE=off の場合は何もしない)
+init_summary_store()
+
+# 基礎レシピ 3 表をメモリに読み込む (STANDARD_SNAPSHOT=off の場合は何もしない)
+init_standard_snapshot()
+
 # Register Blueprints
 app.register_blueprint(personal_bp)
 app.register_blueprint(standard_bp)
@@ -1,6 +1,10 @@
 import os
 import sys
 import mysql.connector
+from flask import g
+from core.pool import get_pool, DB_POOL_SIZE
+from core.statements import query, in_list
+from core.synonyms import get_synonym_model, SynonymModel
 
 # --- データベース接続情報 ---
 # --- データベース接続情報 ---
@@ -34,36 +38,72 @@ if not all(DB_CONFIG.values()):
 
 
 def get_db_connection():
-    """データベースへの接続を確立する"""
+    """
+    データベースへの接続を取得する
+    DB_POOL_SIZE > 0 の場合はプールから借りる (close() でプールに返却される)
+    """
     try:
+        if DB_POOL_SIZE > 0:
+            return get_pool(DB_CONFIG).acquire()
         conn = mysql.connector.connect(**DB_CONFIG)
         return conn
     except mysql.connector.Error as err:
         print(f"データベース接続エラー: {err}", file=sys.stderr)
         return None
 
+
+def get_pooled_connection(timeout=None):
+    """
+    並列検索用に接続を借りる (close() で返却)
+    接続できない・空きが無い場合は mysql.connector.Error を送出する
+    """
+    if DB_POOL_SIZE > 0:
+        return get_pool(DB_CONFIG).acquire(timeout)
+    return mysql.connector.connect(**DB_CONFIG)
+
+
+# --- リクエスト単位の接続 ---
+# 1 リクエストの中では同じ接続を使い回し、アプリコンテキストの終了時に返却する
+
+def get_request_connection():
+    """現在のリクエスト用の接続 (接続できない場合は None)"""
+    if 'db_conn' not in g:
+        g.db_conn = get_db_connection()
+    return g.db_conn
+
+
+def release_request_connection(exception=None):
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        conn.close()
+
+
+def init_app(app):
+    app.teardown_appcontext(release_request_connection)
+
 def get_synonyms(cursor, keyword):
     """
     指定されたキーワードの同義語を取得する
     """
+    model = get_synonym_model(cursor)
+    if model is not None:
+        return model.get_synonyms(keyword)
+
     synonyms = {keyword}
     
     # 1. キーワードが normalized_name かどうか確認し、そうなら synonym を取得
     sql_get_synonyms = "SELECT synonym FROM synonym_dictionary WHERE normalized_name = %s"
-    cursor.execute(sql_get_synonyms, (keyword,))
-    for row in cursor.fetchall():
+    for row in query(cursor, sql_get_synonyms, (keyword,)):
         synonyms.add(row['synonym'])
 
     # 2. キーワードが synonym かどうか確認し、そうなら normalized_name を取得
     #    さらに、その normalized_name に紐づく他の synonym も取得
     sql_get_normalized = "SELECT normalized_name FROM synonym_dictionary WHERE synonym = %s"
-    cursor.execute(sql_get_normalized, (keyword,))
-    normalized_names = [row['normalized_name'] for row in cursor.fetchall()]
+    normalized_names = [row['normalized_name'] for row in query(cursor, sql_get_normalized, (keyword,))]
     
     for norm_name in normalized_names:
         synonyms.add(norm_name)
-        cursor.execute(sql_get_synonyms, (norm_name,))
-        for row in cursor.fetchall():
+        for row in query(cursor, sql_get_synonyms, (norm_name,)):
             synonyms.add(row['synonym'])
             
     return list(synonyms)
@@ -72,21 +112,50 @@ def get_normalized_name(cursor, keyword):
     """
     指定されたキーワードに対応する normalized_name を取得する
     """
+    model = get_synonym_model(cursor)
+    if model is not None:
+        return model.get_normalized_name(keyword)
+
     # 1. キーワードが既に normalized_name として存在するか確認
     sql_check_norm = "SELECT normalized_name FROM synonym_dictionary WHERE normalized_name = %s LIMIT 1"
-    cursor.execute(sql_check_norm, (keyword,))
-    if cursor.fetchone():
+    if query(cursor, sql_check_norm, (keyword,)):
         return keyword
 
     # 2. キーワードが synonym の場合、対応する normalized_name を取得
     sql_get_norm = "SELECT normalized_name FROM synonym_dictionary WHERE synonym = %s LIMIT 1"
-    cursor.execute(sql_get_norm, (keyword,))
-    row = cursor.fetchone()
-    if row:
-        return row['normalized_name']
+    rows = query(cursor, sql_get_norm, (keyword,))
+    if rows:
+        return rows[0]['normalized_name']
         
     return None
 
+def get_normalized_names(cursor, keywords):
+    """
+    get_normalized_name をキーワードのリストに対してまとめて行う (辞書を引くのは最大 1 クエリ)
+    Returns: {keyword: normalized_name または None}
+    """
+    keywords = list(dict.fromkeys(keywords))
+    if not keywords:
+        return {}
+
+    model = get_synonym_model(cursor)
+    if model is not None:
+        return {kw: model.get_normalized_name(kw) for kw in keywords}
+
+    placeholders, keyword_params = in_list(keywords)
+    sql = f"""
+        SELECT synonym, normalized_name
+        FROM synonym_dictionary
+        WHERE normalized_name IN ({placeholders}) OR synonym IN ({placeholders})
+        ORDER BY id ASC
+    """
+    rows = query(cursor, sql, keyword_params + keyword_params)
+
+    # IN は列の照合順序で比較されるため、大文字・小文字や全角・半角だけが違う行も返る。
+    # 取得した行からモデルを作り、キャッシュ有効時と同じ規則 (fold_name) でキーワードに対応付ける
+    model = SynonymModel([(row['synonym'], row['normalized_name']) for row in rows], 0, None)
+    return {kw: model.get_normalized_name(kw) for kw in keywords}
+
 def unify_keywords(cursor, keywords):
     """
     キーワードリスト内の同義語を統合する。
@@ -96,56 +165,33 @@ def unify_keywords(cursor, keywords):
     if not keywords:
         return []
 
+    model = get_synonym_model(cursor)
+    if model is not None:
+        return model.unify_keywords(keywords)
+
     # 1. 各入力キーワードの normalized_name を取得
-    placeholders = ', '.join(['%s'] * len(keywords))
+    #    (IN は列の照合順序で比較されるため、大文字・小文字や全角・半角だけが違う行も返る)
+    placeholders, keyword_params = in_list(keywords)
     sql = f"""
         SELECT synonym, normalized_name 
         FROM synonym_dictionary 
         WHERE synonym IN ({placeholders})
     """
-    cursor.execute(sql, keywords)
-    rows = cursor.fetchall()
-    
-    # keyword -> normalized_name
-    kw_to_norm = {row['synonym']: row['normalized_name'] for row in rows}
-    
-    # 2. 必要な normalized_name を収集
-    seen_norms = set()
-    for kw in keywords:
-        if kw in kw_to_norm:
-            seen_norms.add(kw_to_norm[kw])
-            
-    # 3. 各 normalized_name について、IDが最小の synonym を取得
-    norm_to_best = {}
-    if seen_norms:
-        placeholders_norm = ', '.join(['%s'] * len(seen_norms))
-        sql_best = f"""
-            SELECT normalized_name, synonym, id
-            FROM synonym_dictionary 
-            WHERE normalized_name IN ({placeholders_norm})
-            ORDER BY id ASC
-        """
-        cursor.execute(sql_best, list(seen_norms))
-        best_rows = cursor.fetchall()
-        
-        for row in best_rows:
-            norm = row['normalized_name']
-            if norm not in norm_to_best:
-                norm_to_best[norm] = row['synonym']
-    
-    # 4. 結果の構築 (入力順序を維持しつつ置換)
-    unified_keywords = []
-    processed_norms = set()
-    
-    for kw in keywords:
-        if kw in kw_to_norm:
-            norm = kw_to_norm[kw]
-            if norm not in processed_norms:
-                if norm in norm_to_best:
-                    unified_keywords.append(norm_to_best[norm])
-                processed_norms.add(norm)
-        else:
-            # DBにないキーワードはそのまま
-            unified_keywords.append(kw)
-            
-    return unified_keywords
+    rows = query(cursor, sql, keyword_params)
+    if not rows:
+        return list(keywords)
+
+    # 2. その normalized_name を持つ行をすべて id 順に取得
+    placeholders_norm, norm_params = in_list(dict.fromkeys(row['normalized_name'] for row in rows))
+    sql_best = f"""
+        SELECT synonym, normalized_name
+        FROM synonym_dictionary 
+        WHERE normalized_name IN ({placeholders_norm})
+        ORDER BY id ASC
+    """
+    best_rows = query(cursor, sql_best, norm_params)
+
+    # 3. 取得した行からモデルを作り、キャッシュ有効時と同じ規則 (fold_name) で統合する
+    #    (同じ normalized_name のキーワードは id が最小の synonym にまとめ、入力順を維持する)
+    model = SynonymModel([(row['synonym'], row['normalized_name']) for row in best_rows], 0, None)
+    return model.unify_keywords(keywords)
@@ -0,0 +1,275 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+import mysql.connector
+from core.statements import StatementCache, StatementCursor, STATEMENT_CACHE_ENABLED
+
+# --- MySQL コネクションプール ---
+# リクエストごとに connect すると TCP + 認証のハンドシェイクが毎回発生するため、
+# ワーカープロセスごとに接続を保持して再利用する。
+#   DB_POOL_SIZE         : 1 プロセスあたりの最大接続数 (0 = プールを使わず毎回接続)
+#   DB_POOL_TIMEOUT      : 空きを待つ最大秒数
+#   DB_POOL_MAX_LIFETIME : 作成からこの秒数を過ぎた接続は作り直す
+#   DB_POOL_IDLE_TIMEOUT : この秒数使われなかった接続は閉じる (wait_timeout より短くする)
+#   DB_POOL_PING_AFTER   : この秒数以上使われていなかった接続は貸し出し前に ping で確認する
+# gunicorn --preload で fork された場合に親プロセスの接続 (ソケット) を共有しないよう、
+# プールは PID ごとに作り直す。
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 4))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5))
+DB_POOL_MAX_LIFETIME = float(os.environ.get('DB_POOL_MAX_LIFETIME', 3600))
+DB_POOL_IDLE_TIMEOUT = float(os.environ.get('DB_POOL_IDLE_TIMEOUT', 300))
+DB_POOL_PING_AFTER = float(os.environ.get('DB_POOL_PING_AFTER', 30))
+
+
+class PoolTimeout(mysql.connector.Error):
+    """DB_POOL_TIMEOUT 秒待っても接続を借りられなかった"""
+
+
+class PooledConnection:
+    """
+    プールから借りた接続
+    mysql.connector の接続と同じように使え、close() でプールに返却される
+    """
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self.created_at = created_at
+        self.last_used = time.monotonic()
+        self._checked_out = False
+        self._statements = None
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    @property
+    def raw(self):
+        return self._raw
+
+    @property
+    def statements(self):
+        """この接続の prepared statement キャッシュ (接続と同じ寿命)"""
+        if self._statements is None:
+            self._statements = StatementCache(self._raw)
+        return self._statements
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._raw.cursor(*args, **kwargs)
+        if not STATEMENT_CACHE_ENABLED or kwargs.get('prepared'):
+            return cursor
+        return StatementCursor(cursor, self.statements)
+
+    def close(self):
+        if self._checked_out:
+            self._pool.release(self)
+
+    def discard(self):
+        """壊れた接続をプールに戻さずに捨てる"""
+        if self._checked_out:
+            self._pool.release(self, discard=True)
+
+
+class ConnectionPool:
+    """
+    スレッドセーフな接続プール (1 プロセスに 1 つ)
+    空いている接続は後入れ先出しで貸し出す (よく使う接続ほど温かく、古いものは idle で閉じる)
+    """
+
+    def __init__(self, config, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+                 max_lifetime=DB_POOL_MAX_LIFETIME, idle_timeout=DB_POOL_IDLE_TIMEOUT,
+                 ping_after=DB_POOL_PING_AFTER):
+        self.config = dict(config)
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self.pid = os.getpid()
+
+        self._idle = deque()
+        self._total = 0
+        self._cond = threading.Condition()
+
+        # metrics
+        self.acquires = 0
+        self.acquire_seconds = 0.0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+        self.created = 0
+        self.recycled = 0
+        self.ping_failures = 0
+        self.discarded = 0
+
+    def _connect(self):
+        raw = mysql.connector.connect(**self.config)
+        self.created += 1
+        return PooledConnection(self, raw, time.monotonic())
+
+    def _close_raw(self, conn):
+        try:
+            conn.raw.close()
+        except (mysql.connector.Error, OSError):
+            pass
+
+    def _is_usable(self, conn, now):
+        """
+        貸し出し前の確認 (寿命・アイドル時間・ping)
+        ping はネットワークの往復になるため、ロックを持たずに呼ぶ
+        """
+        if now - conn.created_at > self.max_lifetime or now - conn.last_used > self.idle_timeout:
+            with self._cond:
+                self.recycled += 1
+            return False
+        if now - conn.last_used > self.ping_after:
+            try:
+                conn.raw.ping(reconnect=False)
+            except (mysql.connector.Error, OSError):
+                with self._cond:
+                    self.ping_failures += 1
+                return False
+        return True
+
+    def acquire(self, timeout=None):
+        """接続を借りる (空きが無ければ timeout 秒まで待ち、それでも無ければ PoolTimeout)"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._idle:
+                        conn = self._idle.pop()
+                        break
+                    if self._total < self.size:
+                        # 接続処理はロックの外で行う
+                        self._total += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(f"No database connection available within {timeout}s")
+                    waited = True
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                break
+            # 取り出した接続の確認もロックの外で行う (遅い ping が他の貸し出し・返却を待たせない)
+            # 使えなければ閉じて、もう一度空きを探す
+            if self._is_usable(conn, time.monotonic()):
+                with self._cond:
+                    return self._checkout(conn, started, waited)
+            self._close_raw(conn)
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            return self._checkout(conn, started, waited)
+
+    def _checkout(self, conn, started, waited):
+        # called with self._cond held
+        elapsed = time.monotonic() - started
+        self.acquires += 1
+        self.acquire_seconds += elapsed
+        if waited:
+            self.waits += 1
+            self.wait_seconds += elapsed
+            self.max_wait_seconds = max(self.max_wait_seconds, elapsed)
+        conn._checked_out = True
+        return conn
+
+    def release(self, conn, discard=False):
+        """接続を返却する (未完了のトランザクションはロールバックする)"""
+        conn._checked_out = False
+        if not discard and os.getpid() == self.pid:
+            try:
+                if conn.raw.in_transaction:
+                    conn.raw.rollback()
+            except (mysql.connector.Error, OSError):
+                discard = True
+        if os.getpid() != self.pid:
+            # fork 前に借りた接続: ソケットは親と共有しているので閉じずに手放す
+            return
+        if discard:
+            self._close_raw(conn)
+            with self._cond:
+                self.discarded += 1
+                self._total -= 1
+                self._cond.notify()
+            return
+        conn.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def close_idle(self):
+        """空いている接続をすべて閉じる"""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._close_raw(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'pid': self.pid,
+                'size': self.size,
+                'open': self._total,
+                'idle': len(self._idle),
+                'in_use': self._total - len(self._idle),
+                'acquires': self.acquires,
+                'avg_acquire_ms': round(self.acquire_seconds / self.acquires * 1000, 3) if self.acquires else 0.0,
+                'waits': self.waits,
+                'avg_wait_ms': round(self.wait_seconds / self.waits * 1000, 3) if self.waits else 0.0,
+                'max_wait_ms': round(self.max_wait_seconds * 1000, 3),
+                'timeouts': self.timeouts,
+                'created': self.created,
+                'recycled': self.recycled,
+                'ping_failures': self.ping_failures,
+                'discarded': self.discarded,
+            }
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool(config):
+    """
+    このプロセスのプールを返す
+    fork 後 (PID が変わった場合) は親の接続を使わずに新しいプールを作る
+    """
+    global _POOL
+    pool = _POOL
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+    with _POOL_LOCK:
+        if _POOL is None or _POOL.pid != os.getpid():
+            if _POOL is not None:
+                logging.info(f"Connection pool re-created after fork (pid {_POOL.pid} -> {os.getpid()})")
+            # 親プロセスの接続は閉じずに手放す (閉じると親側のソケットも切断される)
+            _POOL = ConnectionPool(config)
+        return _POOL
+
+
+def get_pool_stats():
+    pool = _POOL
+    if pool is None or pool.pid != os.getpid():
+        return None
+    return pool.stats()
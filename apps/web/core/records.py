@@ -0,0 +1,165 @@
+from core.utils import COOKING_TIME_MAP, STANDARDS
+
+# --- レシピ詳細のレコード型 ---
+# 詳細表示のレシピ・材料・手順・栄養値は、行ごとの dict と入れ子の dict で組み立てると
+# 1 レシピあたり数十個の dict が作られる。__slots__ のクラスにして、タプルの行から直接作る。
+# テンプレートからは dict と同じく recipe.title / ingredient.nutrition.energy で参照でき、
+# recipe['title'] / recipe.get('title') の書き方も使える。JSON にする場合は _asdict() を使う。
+
+
+class Record:
+    """__slots__ のレコード型の共通部分 (属性名 = フィールド名)"""
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def keys(self):
+        return self.__slots__
+
+    def _asdict(self):
+        """入れ子のレコード・リストも含めて dict に変換する"""
+        return {name: _plain(getattr(self, name)) for name in self.__slots__}
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+def _plain(value):
+    if isinstance(value, Record):
+        return value._asdict()
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    return value
+
+
+class Nutrition(Record):
+    """栄養値 (合計・1人分・基準値比[%])"""
+
+    __slots__ = ('energy', 'protein', 'fat', 'carbs', 'fiber', 'salt')
+
+    def __init__(self, energy, protein, fat, carbs, fiber, salt):
+        self.energy = energy
+        self.protein = protein
+        self.fat = fat
+        self.carbs = carbs
+        self.fiber = fiber
+        self.salt = salt
+
+
+class IngredientNutrition(Record):
+    """材料 1 つ分の栄養値 (分量から換算済み)"""
+
+    __slots__ = ('energy', 'protein', 'fat', 'carbs', 'normalized_name', 'normalized_quantity_g')
+
+    def __init__(self, energy, protein, fat, carbs, normalized_name, normalized_quantity_g):
+        self.energy = energy
+        self.protein = protein
+        self.fat = fat
+        self.carbs = carbs
+        self.normalized_name = normalized_name
+        self.normalized_quantity_g = normalized_quantity_g
+
+
+class Ingredient(Record):
+    __slots__ = ('name', 'quantity', 'nutrition')
+
+    def __init__(self, name, quantity, nutrition):
+        self.name = name
+        self.quantity = quantity
+        self.nutrition = nutrition
+
+
+class Step(Record):
+    __slots__ = ('memo',)
+
+    def __init__(self, memo):
+        self.memo = memo
+
+
+class Recipe(Record):
+    """レシピ詳細 (process_recipe_rows が返す dict と同じ項目)"""
+
+    __slots__ = ('id', 'title', 'description', 'cooking_time', 'serving_for', 'serving_size',
+                 'ingredients', 'steps', 'nutrition_totals', 'nutrition_per_serving',
+                 'nutrition_ratios', 'standards')
+
+    def __init__(self, id, title, description, cooking_time, serving_for, serving_size,
+                 ingredients, steps, nutrition_totals, nutrition_per_serving,
+                 nutrition_ratios, standards):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.cooking_time = cooking_time
+        self.serving_for = serving_for
+        self.serving_size = serving_size
+        self.ingredients = ingredients
+        self.steps = steps
+        self.nutrition_totals = nutrition_totals
+        self.nutrition_per_serving = nutrition_per_serving
+        self.nutrition_ratios = nutrition_ratios
+        self.standards = standards
+
+
+def make_recipe(recipe_id, title, description, cooking_time_id, serving_for, serving_size,
+                energy, protein, fat, carbs, fiber, salt):
+    """
+    ヘッダの値から Recipe を作る (材料・手順は空)
+    換算は build_recipes_dict + process_recipe_rows と同じ
+    """
+    serving_size = serving_size or 1
+    totals = Nutrition(energy or 0, protein or 0, fat or 0, carbs or 0, fiber or 0, salt or 0)
+    per_serving = Nutrition(
+        totals.energy / serving_size,
+        totals.protein / serving_size,
+        totals.fat / serving_size,
+        totals.carbs / serving_size,
+        totals.fiber / serving_size,
+        totals.salt / serving_size,
+    )
+    ratios = Nutrition(
+        (per_serving.energy / STANDARDS['energy']) * 100,
+        (per_serving.protein / STANDARDS['protein']) * 100,
+        (per_serving.fat / STANDARDS['fat']) * 100,
+        (per_serving.carbs / STANDARDS['carbs']) * 100,
+        (per_serving.fiber / STANDARDS['fiber']) * 100,
+        (per_serving.salt / STANDARDS['salt']) * 100,
+    )
+    return Recipe(recipe_id, title, description, COOKING_TIME_MAP.get(cooking_time_id), serving_for,
+                  serving_size, [], [], totals, per_serving, ratios, STANDARDS)
+
+
+def make_ingredient(name, quantity, normalized_name, quantity_g,
+                    enerc_kcal, prot, fat, choavldf, fib):
+    """100g あたりの栄養成分から材料を作る (nutritions を JOIN した行)"""
+    quantity_g = quantity_g or 0
+    return Ingredient(name, quantity, IngredientNutrition(
+        ((enerc_kcal or 0) / 100.0) * quantity_g,
+        ((prot or 0) / 100.0) * quantity_g,
+        ((fat or 0) / 100.0) * quantity_g,
+        (((choavldf or 0) + (fib or 0)) / 100.0) * quantity_g,
+        normalized_name,
+        quantity_g,
+    ))
+
+
+def make_precomputed_ingredient(name, quantity, normalized_name, quantity_g,
+                                energy, protein, fat, carbs):
+    """換算済みの値 (ingredient_nutrition) から材料を作る"""
+    return Ingredient(name, quantity, IngredientNutrition(
+        energy, protein or 0, fat or 0, carbs or 0, normalized_name, quantity_g or 0,
+    ))
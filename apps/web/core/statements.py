@@ -0,0 +1,126 @@
+import os
+import threading
+from collections import OrderedDict
+
+# --- サーバーサイド prepared statement のキャッシュ ---
+# 検索で何度も実行される SQL (同義語ごとの範囲スキャン・同義語辞書の参照・基準レシピの材料参照など) は
+# 毎回 MySQL 側で構文解析される。プール接続ごとに SQL 文字列 -> prepared カーソル (バイナリプロトコル) を
+# 保持し、2 回目以降は EXECUTE だけを送る。
+#   STATEMENT_CACHE      : on / off
+#   STATEMENT_CACHE_SIZE : 1 接続あたりに保持する文の数 (超えたら最も古いものを DEALLOCATE)
+# 可変長の IN (...) は in_list() で件数を 2 のべき乗に切り上げ、文の種類が増えすぎないようにする。
+STATEMENT_CACHE_ENABLED = os.environ.get('STATEMENT_CACHE', 'on') != 'off'
+STATEMENT_CACHE_SIZE = int(os.environ.get('STATEMENT_CACHE_SIZE', 64))
+
+
+def in_bucket(n):
+    """IN リストの長さ n を切り上げたサイズ (1, 2, 4, 8, ...)"""
+    size = 1
+    while size < n:
+        size <<= 1
+    return size
+
+
+def in_list(values):
+    """
+    IN (...) 用のプレースホルダと値
+    件数を in_bucket() に揃えるため、最後の値を繰り返して埋める (IN の結果は変わらない)
+    Returns: (placeholders, padded_values)
+    """
+    values = list(values)
+    if values:
+        values.extend([values[-1]] * (in_bucket(len(values)) - len(values)))
+    return ', '.join(['%s'] * len(values)), values
+
+
+class StatementCache:
+    """1 本の接続に紐づく prepared カーソルの LRU"""
+
+    def __init__(self, raw_conn, maxsize=STATEMENT_CACHE_SIZE):
+        self._conn = raw_conn
+        self.maxsize = maxsize
+        self._cursors = OrderedDict()
+        self._lock = threading.Lock()
+        self.prepares = 0
+        self.executions = 0
+        self.evictions = 0
+
+    def execute(self, sql, params=()):
+        """sql を prepared statement で実行し、fetchall() 相当の dict の行を返す"""
+        names, rows = self.execute_tuples(sql, params)
+        return [dict(zip(names, row)) for row in rows]
+
+    def execute_tuples(self, sql, params=()):
+        """sql を prepared statement で実行する Returns: (列名, タプルの行のリスト)"""
+        with self._lock:
+            cursor = self._cursors.get(sql)
+            if cursor is None:
+                cursor = self._conn.cursor(prepared=True)
+                self._cursors[sql] = cursor
+                self.prepares += 1
+                while len(self._cursors) > self.maxsize:
+                    _, old = self._cursors.popitem(last=False)
+                    old.close()
+                    self.evictions += 1
+            else:
+                self._cursors.move_to_end(sql)
+            self.executions += 1
+            # 同じカーソルで同じ文を実行すると、再 PREPARE せずに EXECUTE だけが送られる
+            cursor.execute(sql, tuple(params))
+            rows = cursor.fetchall()
+            names = cursor.column_names
+        return names, rows
+
+    def stats(self):
+        return {
+            'statements': len(self._cursors),
+            'prepares': self.prepares,
+            'executions': self.executions,
+            'evictions': self.evictions,
+        }
+
+
+class StatementCursor:
+    """
+    通常のカーソルに、接続の StatementCache を添えたもの
+    (プール接続の cursor() が返す。それ以外の操作は元のカーソルにそのまま渡す)
+    """
+
+    __slots__ = ('_cursor', 'statements')
+
+    def __init__(self, cursor, statements):
+        self._cursor = cursor
+        self.statements = statements
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+def query(cursor, sql, params=()):
+    """
+    sql を実行して fetchall() の結果を返す
+    プール接続のカーソルなら prepared statement を使い、それ以外は通常の execute
+    """
+    statements = getattr(cursor, 'statements', None)
+    if statements is not None:
+        return statements.execute(sql, params)
+    cursor.execute(sql, params)
+    return cursor.fetchall()
+
+
+def query_tuples(cursor, sql, params=()):
+    """
+    query() と同じだが、行を SELECT の列順のタプルで返す (dict を作らない)
+    dictionary=True の通常カーソルでは、受け取った dict を値の順にタプルへ変換する
+    """
+    statements = getattr(cursor, 'statements', None)
+    if statements is not None:
+        return statements.execute_tuples(sql, params)[1]
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    if rows and isinstance(rows[0], dict):
+        return [tuple(row.values()) for row in rows]
+    return rows
@@ -0,0 +1,165 @@
+import os
+import time
+import logging
+import threading
+import unicodedata
+from types import MappingProxyType
+
+# --- 同義語辞書のプロセス内キャッシュ ---
+# synonym_dictionary は小さくほぼ更新されないため、全件を一度だけ読み込み、
+# 不変なマッピングとして共有する。
+# SYNONYM_CHECK_INTERVAL 秒ごとに CHECKSUM TABLE を確認し、
+# 変化していれば新しいモデルを作って差し替える (バージョンを 1 つ進める)。
+# (COUNT(*), MAX(id)) では既存行の UPDATE や、件数と最大 ID が変わらない削除 + 追加を検知できない。
+SYNONYM_CACHE_ENABLED = os.environ.get('SYNONYM_CACHE', 'on') != 'off'
+SYNONYM_CHECK_INTERVAL = int(os.environ.get('SYNONYM_CHECK_INTERVAL', 300))
+
+
+def fold_name(text):
+    """
+    照合順序 (utf8mb4_general_ci など) で同じとみなされる語を揃えるキー
+    大文字・小文字と全角・半角の違いを無視する
+    """
+    return unicodedata.normalize('NFKC', text).casefold()
+
+
+class SynonymModel:
+    """
+    synonym_dictionary の不変スナップショット
+    DB の照合順序と同じく大文字・小文字や全角・半角を区別しないよう、キーはすべて fold_name で揃える
+        synonym_to_norms : fold_name(synonym) -> (normalized_name, ...) (id 昇順)
+        norm_to_synonyms : fold_name(normalized_name) -> (synonym, ...) (id 昇順)
+        norm_to_best     : fold_name(normalized_name) -> id が最小の synonym (代表語)
+        norm_names       : fold_name(normalized_name) -> normalized_name (id が最小のもの)
+    """
+
+    __slots__ = ('version', 'signature', 'loaded_at',
+                 'synonym_to_norms', 'norm_to_synonyms', 'norm_to_best', 'norm_names')
+
+    def __init__(self, rows, version, signature):
+        synonym_to_norms = {}
+        norm_to_synonyms = {}
+        norm_to_best = {}
+        norm_names = {}
+        # rows は id 昇順
+        for synonym, norm in rows:
+            norm_key = fold_name(norm)
+            norms = synonym_to_norms.setdefault(fold_name(synonym), [])
+            if norm not in norms:
+                norms.append(norm)
+            syns = norm_to_synonyms.setdefault(norm_key, [])
+            if synonym not in syns:
+                syns.append(synonym)
+            norm_to_best.setdefault(norm_key, synonym)
+            norm_names.setdefault(norm_key, norm)
+
+        self.version = version
+        self.signature = signature
+        self.loaded_at = time.time()
+        self.synonym_to_norms = MappingProxyType({k: tuple(v) for k, v in synonym_to_norms.items()})
+        self.norm_to_synonyms = MappingProxyType({k: tuple(v) for k, v in norm_to_synonyms.items()})
+        self.norm_to_best = MappingProxyType(norm_to_best)
+        self.norm_names = MappingProxyType(norm_names)
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError("SynonymModel is immutable")
+        object.__setattr__(self, name, value)
+
+    def get_synonyms(self, keyword):
+        key = fold_name(keyword)
+        synonyms = {keyword}
+        synonyms.update(self.norm_to_synonyms.get(key, ()))
+        for norm in self.synonym_to_norms.get(key, ()):
+            synonyms.add(norm)
+            synonyms.update(self.norm_to_synonyms.get(fold_name(norm), ()))
+        return list(synonyms)
+
+    def get_normalized_name(self, keyword):
+        # SQL (WHERE normalized_name = %s, 次に synonym = %s) と同じ順に引く
+        key = fold_name(keyword)
+        if key in self.norm_names:
+            return self.norm_names[key]
+        norms = self.synonym_to_norms.get(key)
+        if norms:
+            return norms[0]
+        return None
+
+    def unify_keywords(self, keywords):
+        unified_keywords = []
+        processed_norms = set()
+        for kw in keywords:
+            norms = self.synonym_to_norms.get(fold_name(kw))
+            if norms:
+                norm_key = fold_name(norms[0])
+                if norm_key not in processed_norms:
+                    unified_keywords.append(self.norm_to_best[norm_key])
+                    processed_norms.add(norm_key)
+            else:
+                # 辞書にないキーワードはそのまま
+                unified_keywords.append(kw)
+        return unified_keywords
+
+
+_MODEL = None
+_LAST_CHECK = 0.0
+_LOCK = threading.Lock()
+_RELOAD_LISTENERS = []
+
+
+def _fetch_signature(cursor):
+    cursor.execute("CHECKSUM TABLE synonym_dictionary")
+    return tuple(tuple(row.values()) if isinstance(row, dict) else tuple(row) for row in cursor.fetchall())
+
+
+def load_synonym_model(cursor):
+    """synonym_dictionary を全件読み込み、新しいモデルに差し替える"""
+    global _MODEL, _LAST_CHECK
+    signature = _fetch_signature(cursor)
+    cursor.execute("SELECT synonym, normalized_name FROM synonym_dictionary ORDER BY id ASC")
+    rows = [
+        (row['synonym'], row['normalized_name']) if isinstance(row, dict) else (row[0], row[1])
+        for row in cursor.fetchall()
+    ]
+    version = (_MODEL.version + 1) if _MODEL else 1
+    model = SynonymModel(rows, version, signature)
+    with _LOCK:
+        _MODEL = model
+        _LAST_CHECK = time.time()
+    logging.info(f"Synonym model v{version} loaded: {len(rows)} rows")
+    for listener in list(_RELOAD_LISTENERS):
+        listener(model)
+    return model
+
+
+def on_synonym_reload(listener):
+    """モデル差し替え時に呼び出す関数を登録する (キャッシュの無効化など)"""
+    _RELOAD_LISTENERS.append(listener)
+    return listener
+
+
+def current_synonym_version():
+    """読み込み済みモデルのバージョン (未読み込み・無効時は 0)"""
+    model = _MODEL
+    return model.version if model is not None else 0
+
+
+def get_synonym_model(cursor):
+    """
+    現在のモデルを返す (無効化されている場合は None)
+    未読み込み、または確認間隔を過ぎて辞書が変化していれば読み直す
+    """
+    global _LAST_CHECK
+    if not SYNONYM_CACHE_ENABLED:
+        return None
+
+    model = _MODEL
+    if model is None:
+        return load_synonym_model(cursor)
+
+    now = time.time()
+    if now - _LAST_CHECK > SYNONYM_CHECK_INTERVAL:
+        _LAST_CHECK = now
+        if _fetch_signature(cursor) != model.signature:
+            return load_synonym_model(cursor)
+    return model
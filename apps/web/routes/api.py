@@ -1,5 +1,12 @@
 from flask import Blueprint, request, g, jsonify, current_app
+import os
+import hmac
 import json
+from core.database import get_request_connection
+from core.pool import get_pool_stats
+from services.search import get_search_cache_stats, invalidate_search_cache, search_recipes_page, attach_nutrition
+from services.search_token import InvalidSearchToken
+from services.nutrition import get_nutrition_cache_stats
 
 api_bp = Blueprint('api', __name__)
 
@@ -14,3 +21,89 @@ def log_action():
     except Exception as e:
         current_app.logger.error(f"Error logging action: {e}")
         return jsonify({'status': 'error', 'message': str(e)}), 400
+
+
+@api_bp.route('/api/search', methods=['GET', 'POST'])
+def search_api():
+    """
+    パーソナル検索 (JSON)
+    params: query, search_mode ('and' / 'or'), limit (最大50), token (前回の next_token), seed
+    """
+    params = request.values
+    search_query = params.get('query', '')
+    search_mode = params.get('search_mode', 'and')
+    if search_mode not in ('and', 'or'):
+        search_mode = 'and'
+    limit = max(1, min(params.get('limit', 10, type=int), 50))
+    token = params.get('token') or None
+    seed = params.get('seed', type=int)
+
+    try:
+        conn = get_request_connection()
+        if not conn:
+            return jsonify({'status': 'error', 'message': 'database connection failed'}), 503
+        cursor = conn.cursor(dictionary=True)
+        recipes, next_token = search_recipes_page(cursor, search_query, limit=limit, search_mode=search_mode, token=token, seed=seed)
+        recipes = attach_nutrition(cursor, recipes)
+        return jsonify({
+            'status': 'success',
+            'query': search_query,
+            'search_mode': search_mode,
+            'recipes': [
+                {
+                    'id': r['id'],
+                    'title': r['title'],
+                    'description': r['description'],
+                    'published_at': str(r['published_at']) if r['published_at'] is not None else None,
+                    'nutrition_per_serving': r['nutrition_per_serving']._asdict() if r.get('nutrition_per_serving') else None,
+                }
+                for r in recipes
+            ],
+            'next_token': next_token,
+        })
+    except InvalidSearchToken as e:
+        return jsonify({'status': 'error', 'message': f'invalid token: {e}'}), 400
+    except Exception as e:
+        current_app.logger.error(f"Search API Error: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+def _is_admin_request():
+    # ADMIN_TOKEN が未設定の場合は管理用APIを無効にする
+    admin_token = os.environ.get('ADMIN_TOKEN')
+    if not admin_token:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token)
+
+@api_bp.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    if not _is_admin_request():
+        return jsonify({'status': 'error', 'message': 'forbidden'}), 403
+    return jsonify({'status': 'success', 'search': get_search_cache_stats(), 'nutrition': get_nutrition_cache_stats()})
+
+@api_bp.route('/api/cache/invalidate', methods=['POST'])
+def cache_invalidate():
+    """
+    テーブル更新後に検索結果キャッシュを破棄する
+    キャッシュはワーカーごとにあるため、DB の共通の世代 (search_cache_generation) を進める。
+    このワーカーはすぐに、他のワーカーは SEARCH_CACHE_CHECK_INTERVAL 秒以内に破棄する。
+    材料の転置インデックスを使っている場合は、同時にバックグラウンドで読み直す (レシピの追加を反映する)。
+    """
+    if not _is_admin_request():
+        return jsonify({'status': 'error', 'message': 'forbidden'}), 403
+    conn = get_request_connection()
+    if not conn:
+        return jsonify({'status': 'error', 'message': 'database connection failed'}), 503
+    try:
+        generation = invalidate_search_cache(conn)
+    except Exception as e:
+        current_app.logger.error(f"Cache invalidation failed: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    current_app.logger.info(f"Search result cache invalidated (generation {generation})")
+    return jsonify({'status': 'success', 'generation': generation})
+
+@api_bp.route('/api/db/pool/stats', methods=['GET'])
+def pool_stats():
+    """このワーカーのコネクションプールの状態 (待ち時間など)"""
+    if not _is_admin_request():
+        return jsonify({'status': 'error', 'message': 'forbidden'}), 403
+    return jsonify({'status': 'success', 'pool': get_pool_stats()})
@@ -1,6 +1,10 @@
-from flask import Blueprint, render_template, current_app
+from flask import Blueprint, render_template, current_app, request, jsonify
 import os
-from services.nutrition import STAPLE_FOODS, load_nutrition_data
+from services.nutrition import (STAPLE_FOODS, SEARCH_FIELDS, NUTRIENT_COLUMNS, get_nutrition_table,
+                                search_nutrition, parse_calculation_request)
+
+# 栄養計算ページに埋め込む最初のページの件数 (以降は /api/nutrition/ingredients から取得する)
+FIRST_PAGE_SIZE = 20
 
 nutrition_bp = Blueprint('nutrition', __name__)
 
@@ -20,9 +24,81 @@ def nutrition_calculation():
     # Assuming app.py is in apps/web, root_path is apps/web.
     data_dir = os.path.join(current_app.root_path, 'data')
     
-    ingredients = load_nutrition_data(data_dir)
+    try:
+        table = get_nutrition_table(data_dir)
+        # 最初のページ (食品名の昇順) だけを埋め込み、残りは DataTables が API から取得する
+        total, ingredients = search_nutrition(table, sort='name', limit=FIRST_PAGE_SIZE)
+    except Exception as e:
+        current_app.logger.error(f"Error reading csv: {e}")
+        total, ingredients = 0, []
     
     if not ingredients:
-         return render_template('nutrition_calculation.html', error="データの読み込みに失敗しました。", ingredients=[], staple_foods=STAPLE_FOODS, standards=STANDARDS)
+         return render_template('nutrition_calculation.html', error="データの読み込みに失敗しました。", ingredients=[], ingredients_total=0, staple_foods=STAPLE_FOODS, standards=STANDARDS)
+
+    return render_template('nutrition_calculation.html', ingredients=ingredients, ingredients_total=total, staple_foods=STAPLE_FOODS, standards=STANDARDS)
+
+
+@nutrition_bp.route('/api/nutrition/ingredients')
+def nutrition_ingredients_api():
+    """
+    食品成分表の検索 (JSON)
+    params: q, match ('substring' / 'prefix'), sort (id / name / 栄養素), order ('asc' / 'desc'),
+            offset, limit (最大100), fields (カンマ区切り)
+    """
+    params = request.args
+    query = params.get('q', '')
+    mode = params.get('match', 'substring')
+    sort = params.get('sort', 'id')
+    descending = params.get('order', 'asc') == 'desc'
+    offset = max(0, params.get('offset', 0, type=int))
+    limit = max(1, min(params.get('limit', 20, type=int), 100))
+    fields = [f.strip() for f in params.get('fields', '').split(',') if f.strip()] or None
+
+    try:
+        table = get_nutrition_table(os.path.join(current_app.root_path, 'data'))
+        total, items = search_nutrition(table, query, mode=mode, sort=sort, descending=descending,
+                                        offset=offset, limit=limit, fields=fields)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Nutrition API Error: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    return jsonify({
+        'status': 'success',
+        'total': total,
+        'available': len(table),
+        'offset': offset,
+        'limit': limit,
+        'fields': list(fields or SEARCH_FIELDS),
+        'items': items,
+    })
+
+
+@nutrition_bp.route('/api/nutrition/calculate', methods=['POST'])
+def nutrition_calculate_api():
+    """
+    栄養計算のバッチ処理 (JSON)
+    body: {"recipes": [{"items": [[id, 量], ...], "servings": 人数}, ...]}
+          id は食品番号 ('01001' など) か STAPLE_FOODS の id の文字列
+          量は食品成分表の食品なら g、STAPLE_FOODS なら単位数
+    数値は NUTRIENT_COLUMNS ('columns') の順のリストで返す
+    """
+    try:
+        recipes = parse_calculation_request(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
 
-    return render_template('nutrition_calculation.html', ingredients=ingredients, staple_foods=STAPLE_FOODS, standards=STANDARDS)
+    try:
+        calculator = get_nutrition_table(os.path.join(current_app.root_path, 'data')).calculator()
+        results = calculator.evaluate(recipes, STANDARDS)
+    except Exception as e:
+        current_app.logger.error(f"Nutrition Calculate API Error: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    return jsonify({
+        'status': 'success',
+        'columns': list(NUTRIENT_COLUMNS),
+        'results': [
+            {'totals': totals, 'per_serving': per_serving, 'ratios': ratios, 'unknown': unknown}
+            for totals, per_serving, ratios, unknown in results
+        ],
+    })
@@ -1,8 +1,9 @@
 from flask import Blueprint, render_template, request, current_app
 import random
 import os
-from core.database import get_db_connection
-from services.search import search_recipes, get_recipe_details
+from core.database import get_request_connection
+from services.search import search_recipes_page, get_recipe_details, attach_nutrition
+from services.search_token import InvalidSearchToken
 
 personal_bp = Blueprint('personal', __name__)
 
@@ -17,45 +18,42 @@ def search():
     """検索処理を行い、結果を表示する"""
     random.seed(os.urandom(16))
     search_query = request.form['query']
-    search_mode = request.form.get('search_mode', 'or')
+    search_mode = request.form.get('search_mode', 'and')
+    if search_mode not in ('and', 'or'):
+        search_mode = 'and'
+    # 再現用: seed を指定すると同じランダム抽出結果になる
+    seed = request.form.get('seed', type=int)
+    token = request.form.get('token') or None
     
-    conn = None
     try:
-        conn = get_db_connection()
+        conn = get_request_connection()
         if not conn:
-            return render_template('results.html', recipes=[], query=search_query, error="データベースに接続できませんでした．")
+            return render_template('results.html', recipes=[], query=search_query, search_mode=search_mode, error="データベースに接続できませんでした．")
 
         cursor = conn.cursor(dictionary=True)
 
-        # Random Start ID (1 to 1,500,000)
-        rand_id = random.randint(1, 1500000)
-        
-        # Search 1: From rand_id
-        recipes_list_1 = search_recipes(cursor, search_query, start_id=rand_id, limit=10)
-        
-        recipes_list = recipes_list_1
-        
-        # Wrap-around if needed
-        if len(recipes_list) < 10:
-            needed = 10 - len(recipes_list)
-            recipes_list_2 = search_recipes(cursor, search_query, start_id=1, limit=needed)
-            recipes_list.extend(recipes_list_2)
+        # Uniform random sample from the whole match set when the ingredient index is loaded,
+        # otherwise a scan from a random start id with wrap-around.
+        # `token` continues the previous page where it stopped.
+        try:
+            recipes_list, next_token = search_recipes_page(cursor, search_query, limit=10, search_mode=search_mode, token=token, seed=seed)
+        except InvalidSearchToken:
+            return render_template('results.html', recipes=[], query=search_query, search_mode=search_mode, error="検索の続きを取得できませんでした．もう一度検索してください．")
+
+        # 1人分の栄養を 1 ページ分まとめて取得 (N+1 にしない)
+        recipes_list = attach_nutrition(cursor, recipes_list)
         
-        return render_template('results.html', recipes=recipes_list, query=search_query)
+        return render_template('results.html', recipes=recipes_list, query=search_query, search_mode=search_mode, next_token=next_token)
 
     except Exception as e:
         current_app.logger.error(f"Search Error: {e}")
-        return render_template('results.html', recipes=[], query=search_query, error=f"エラーが発生しました: {e}")
-    finally:
-        if conn:
-            conn.close()
+        return render_template('results.html', recipes=[], query=search_query, search_mode=search_mode, error=f"エラーが発生しました: {e}")
 
 @personal_bp.route('/recipe/<int:recipe_id>')
 def recipe_detail(recipe_id):
     """レシピ詳細を表示する"""
-    conn = None
     try:
-        conn = get_db_connection()
+        conn = get_request_connection()
         cursor = conn.cursor(dictionary=True)
         recipe = get_recipe_details(cursor, recipe_id)
         
@@ -66,9 +64,6 @@ def recipe_detail(recipe_id):
     except Exception as e:
         current_app.logger.error(f"Detail Error: {e}")
         return f"Error: {e}", 500
-    finally:
-        if conn and conn.is_connected():
-            conn.close()
 
 @personal_bp.route('/search_supplement', methods=['GET'])
 def search_supplement():
@@ -1,5 +1,5 @@
 from flask import Blueprint, render_template, request, current_app
-from core.database import get_db_connection
+from core.database import get_request_connection
 from core.utils import COOKING_TIME_MAP
 from services.search import search_standard_recipes, get_standard_recipe_details
 
@@ -17,9 +17,8 @@ def standard_search():
     search_query = request.form['query']
     search_mode = request.form.get('search_mode', 'recipe')
 
-    conn = None
     try:
-        conn = get_db_connection()
+        conn = get_request_connection()
         if not conn:
              return render_template('standard_recipes.html', query=search_query, error="データベースに接続できませんでした．", search_mode=search_mode, basic_recipes=[], cooking_time_map={})
 
@@ -32,17 +31,13 @@ def standard_search():
     except Exception as e:
         current_app.logger.error(f"Error in standard_search: {e}")
         return render_template('standard_recipes.html', query=search_query, error="検索に失敗しました", basic_recipes=[], cooking_time_map={})
-    finally:
-         if conn and conn.is_connected():
-            conn.close()
 
 
 @standard_bp.route('/standard_recipe/<int:recipe_id>')
 def standard_recipe_detail(recipe_id):
     """基準レシピ詳細を表示する"""
-    conn = None
     try:
-        conn = get_db_connection()
+        conn = get_request_connection()
         cursor = conn.cursor(dictionary=True)
         recipe = get_standard_recipe_details(cursor, recipe_id)
         
@@ -53,6 +48,3 @@ def standard_recipe_detail(recipe_id):
     except Exception as e:
         current_app.logger.error(f"Standard Detail Error: {e}")
         return f"Error: {e}", 500
-    finally:
-        if conn and conn.is_connected():
-            conn.close()
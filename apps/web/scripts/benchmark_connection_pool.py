@@ -0,0 +1,41 @@
+import time
+import statistics
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import mysql.connector
+from core.database import DB_CONFIG
+from core.pool import ConnectionPool
+
+# 1 リクエスト相当 (接続 → 軽いクエリ 1 本 → 返却) のレイテンシを
+# 毎回接続する場合とコネクションプールを使う場合で比較する
+# 使い方: python scripts/benchmark_connection_pool.py [反復回数]
+
+def request_once(get_conn):
+    conn = get_conn()
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1")
+    cursor.fetchall()
+    cursor.close()
+    conn.close()
+
+def run(label, get_conn, iterations):
+    timings = []
+    for _ in range(iterations):
+        start_time = time.perf_counter()
+        request_once(get_conn)
+        timings.append(time.perf_counter() - start_time)
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{label:<24} median {statistics.median(timings) * 1000:8.2f} ms  p95 {p95 * 1000:8.2f} ms")
+
+def benchmark(iterations):
+    run("connect per request", lambda: mysql.connector.connect(**DB_CONFIG), iterations)
+
+    pool = ConnectionPool(DB_CONFIG, size=1)
+    run("pooled", pool.acquire, iterations)
+    print(pool.stats())
+    pool.close_idle()
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,63 @@
+import time
+import random
+import statistics
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.database import get_db_connection
+from services.search import search_recipes
+from services.ingredient_index import init_ingredient_index, set_ingredient_index
+
+# NOT 検索 (除外条件) を含むクエリのレイテンシを計測する
+# 使い方: python scripts/benchmark_exclusion_search.py [--index] [反復回数]
+#   --index: インデックスのスナップショットを読み込み、SQL 経路と比較する
+
+QUERIES = [
+    "玉ねぎ -人参",
+    "豚肉 -玉ねぎ -人参 -じゃがいも",
+    "卵 -砂糖 -醤油 -塩 -牛乳",
+    "じゃがいも 人参 -玉ねぎ",
+    "じゃがいも 大根 -砂糖 -醤油",
+]
+
+MAX_RECIPE_ID = 1500000
+
+def run(cursor, label, iterations):
+    print(f"\n=== {label} ===")
+    for query in QUERIES:
+        timings = []
+        hits = 0
+        for _ in range(iterations):
+            start_id = random.randint(1, MAX_RECIPE_ID)
+            start_time = time.perf_counter()
+            recipes = search_recipes(cursor, query, start_id=start_id, limit=10)
+            timings.append(time.perf_counter() - start_time)
+            hits += len(recipes)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{query:<32} median {statistics.median(timings) * 1000:8.1f} ms  "
+              f"p95 {p95 * 1000:8.1f} ms  avg hits {hits / iterations:.1f}")
+
+def benchmark(iterations, use_index):
+    conn = get_db_connection()
+    if not conn:
+        print("Failed to connect.")
+        return
+    cursor = conn.cursor(dictionary=True)
+
+    random.seed(0)
+    set_ingredient_index(None)
+    run(cursor, "SQL (anti-join on candidate pages)", iterations)
+
+    if use_index:
+        if init_ingredient_index(mode='snapshot') is None:
+            print("\nIngredient index snapshot not found; skipped.")
+        else:
+            random.seed(0)
+            run(cursor, "In-memory index (bitmap difference)", iterations)
+
+    conn.close()
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    benchmark(int(args[0]) if args else 20, '--index' in sys.argv)
@@ -0,0 +1,45 @@
+import time
+import statistics
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.database import get_db_connection
+from core.synonyms import fold_name
+from services.standard_snapshot import load_standard_snapshot
+
+# 基礎レシピの部分一致検索 (料理名・材料名) を、全件の走査と N-gram インデックスで比較する
+# 使い方: python scripts/benchmark_ngram_index.py [反復回数] [キーワード...]
+
+DEFAULT_KEYWORDS = ['カレー', '丼', '炒め', 'ねぎ', '肉', 'ソース', 'ごま油', 'し']
+
+def measure(fn, iterations):
+    timings = []
+    for _ in range(iterations):
+        start_time = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start_time)
+    return result, statistics.median(timings) * 1000
+
+def benchmark(iterations, keywords):
+    conn = get_db_connection()
+    if not conn:
+        print("Failed to connect.")
+        return
+    cursor = conn.cursor(dictionary=True)
+    snapshot = load_standard_snapshot(cursor)
+    conn.close()
+    print(f"{len(snapshot.by_popularity)} recipe names, {len(snapshot.ingredient_names)} ingredient names\n")
+
+    print(f"{'keyword':>10} {'target':>10} {'hits':>6} {'scan ms':>9} {'index ms':>9}")
+    for keyword in keywords:
+        k = fold_name(keyword)
+        for target, strings, index in (('name', [name for _, name in snapshot.by_popularity], snapshot.name_index),
+                                       ('ingredient', snapshot.ingredient_names, snapshot.ingredient_index)):
+            expected, scan_ms = measure(lambda: {p for p, s in enumerate(strings) if k in s}, iterations)
+            found, index_ms = measure(lambda: index.search(k), iterations)
+            assert found == expected, keyword
+            print(f"{keyword:>10} {target:>10} {len(found):>6} {scan_ms:>9.3f} {index_ms:>9.3f}")
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    benchmark(iterations, sys.argv[2:] or DEFAULT_KEYWORDS)
@@ -0,0 +1,74 @@
+import time
+import json
+import random
+import statistics
+import sys
+import os
+from array import array
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.nutrition import (NUTRIENT_COLUMNS, STAPLE_FOODS, NutritionTable, get_nutrition_table,
+                                parse_calculation_request, np)
+from core.utils import STANDARDS
+
+# /api/nutrition/calculate のバッチ計算 (JSON の解釈 → 計算 → JSON の生成) の処理量を、
+# numpy の経路と Python のループで比較する (項目数 1,000 / 100,000, 1 レシピ 10 項目)
+# data/nutrition_ex.csv が無い場合は合成した食品成分表を使う
+# 使い方: python scripts/benchmark_nutrition_calculate.py [反復回数]
+
+ITEM_COUNTS = (1000, 100000)
+ITEMS_PER_RECIPE = 10
+N_SYNTHETIC_FOODS = 2500
+
+def load_table(rng):
+    data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+    try:
+        return get_nutrition_table(data_dir)
+    except OSError:
+        print("data/nutrition_ex.csv not found; using a synthetic table.")
+    ids = [f'{i:05d}' for i in range(N_SYNTHETIC_FOODS)]
+    columns = {key: array('d', (rng.uniform(0, 400) for _ in ids)) for key in NUTRIENT_COLUMNS}
+    return NutritionTable(ids, [f'食品{i}' for i in range(N_SYNTHETIC_FOODS)], columns, (0, 0))
+
+def make_body(table, n_items, rng):
+    ids = list(table.ids) + [staple['id'] for staple in STAPLE_FOODS]
+    recipes = []
+    for start in range(0, n_items, ITEMS_PER_RECIPE):
+        items = [[rng.choice(ids), round(rng.uniform(1, 300), 1)]
+                 for _ in range(min(ITEMS_PER_RECIPE, n_items - start))]
+        recipes.append({'items': items, 'servings': rng.randint(1, 4)})
+    return json.dumps({'recipes': recipes})
+
+def run(calculator, body, use_numpy):
+    recipes = parse_calculation_request(json.loads(body))
+    results = calculator.evaluate(recipes, STANDARDS, use_numpy=use_numpy)
+    return json.dumps({'columns': list(NUTRIENT_COLUMNS), 'results': [
+        {'totals': t, 'per_serving': p, 'ratios': r, 'unknown': u} for t, p, r, u in results]})
+
+def measure(fn, iterations):
+    timings = []
+    for _ in range(iterations):
+        start_time = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start_time)
+    return statistics.median(timings)
+
+def benchmark(iterations):
+    rng = random.Random(0)
+    table = load_table(rng)
+    calculator = table.calculator()
+    paths = [('python', False)] + ([('numpy', True)] if np is not None else [])
+    if np is None:
+        print("numpy is not installed; only the Python path is measured.")
+    print(f"{len(table)} foods + {len(STAPLE_FOODS)} staples\n")
+
+    print(f"{'items':>8} {'path':>7} {'total ms':>9} {'evaluate ms':>12} {'items/s':>11}")
+    for n_items in ITEM_COUNTS:
+        body = make_body(table, n_items, rng)
+        recipes = parse_calculation_request(json.loads(body))
+        for name, use_numpy in paths:
+            total = measure(lambda: run(calculator, body, use_numpy), iterations)
+            evaluate = measure(lambda: calculator.evaluate(recipes, STANDARDS, use_numpy=use_numpy), iterations)
+            print(f"{n_items:>8} {name:>7} {total * 1000:>9.2f} {evaluate * 1000:>12.2f} {n_items / total:>11,.0f}")
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,67 @@
+import time
+import random
+import statistics
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.database import get_db_connection
+from services import parallel_query
+from services.search import search_recipes, invalidate_search_cache
+from services.ingredient_index import set_ingredient_index
+
+# 同義語ごとのクエリを直列 / 並列 (scatter-gather) で実行したときのレイテンシを比較する
+# 使い方: python scripts/benchmark_parallel_search.py [反復回数] [並列数...]
+#   例: python scripts/benchmark_parallel_search.py 50 2 4 8
+
+QUERIES = [
+    ("玉ねぎ", 'and'),
+    ("玉ねぎ 人参", 'and'),
+    ("豚肉 玉ねぎ じゃがいも", 'and'),
+    ("玉ねぎ 人参 -砂糖", 'and'),
+    ("鶏肉 豚肉 牛肉", 'or'),
+]
+
+MAX_RECIPE_ID = 1500000
+
+def run(cursor, label, iterations):
+    print(f"\n=== {label} ===")
+    for query, mode in QUERIES:
+        random.seed(0)
+        timings = []
+        for _ in range(iterations):
+            # 結果キャッシュに当たらないよう毎回ずらした開始IDを使う
+            start_id = random.randint(1, MAX_RECIPE_ID)
+            start_time = time.perf_counter()
+            search_recipes(cursor, query, start_id=start_id, limit=10, search_mode=mode)
+            timings.append(time.perf_counter() - start_time)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{query + ' (' + mode + ')':<32} median {statistics.median(timings) * 1000:8.1f} ms  "
+              f"p95 {p95 * 1000:8.1f} ms")
+
+def benchmark(iterations, parallelisms):
+    conn = get_db_connection()
+    if not conn:
+        print("Failed to connect.")
+        return
+    cursor = conn.cursor(dictionary=True)
+
+    # SQL 経路のみを計測する
+    set_ingredient_index(None)
+
+    parallel_query.SEARCH_PARALLELISM = 0
+    invalidate_search_cache()
+    run(cursor, "Serial (single cursor)", iterations)
+
+    for parallelism in parallelisms:
+        parallel_query.SEARCH_PARALLELISM = parallelism
+        parallel_query._executor = None
+        invalidate_search_cache()
+        run(cursor, f"Parallel (SEARCH_PARALLELISM={parallelism})", iterations)
+
+    conn.close()
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    parallelisms = [int(p) for p in sys.argv[2:]] or [4]
+    benchmark(iterations, parallelisms)
@@ -0,0 +1,106 @@
+import time
+import random
+import statistics
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import mysql.connector
+from core.database import DB_CONFIG
+from core.statements import StatementCache, in_list
+
+# 検索でよく使う SQL を、テキストプロトコル (毎回構文解析) と
+# prepared statement (接続ごとに 1 回だけ PREPARE) で実行し、
+# クライアント側のレイテンシとサーバー側の実行時間・CPU 時間を比較する
+# 使い方: python scripts/benchmark_prepared_statements.py [反復回数]
+
+SYNONYMS = ["玉ねぎ", "たまねぎ", "玉葱", "人参", "にんじん", "じゃがいも", "豚肉", "鶏肉"]
+
+RANGE_SQL = """
+    SELECT recipe_id
+    FROM ingredients
+    WHERE name = %s
+    AND recipe_id >= %s
+    ORDER BY recipe_id ASC
+    LIMIT %s
+"""
+SYNONYM_SQL = "SELECT normalized_name FROM synonym_dictionary WHERE synonym = %s"
+STANDARD_SQL = "SELECT standard_recipe_id, count FROM standard_recipe_ingredients WHERE ingredient_name = %s"
+
+# performance_schema (MySQL 8.0.28+ で CPU_TIME あり) から現在のスレッドの累計を読む
+SERVER_STATS_SQL = """
+    SELECT SUM(SUM_TIMER_WAIT) / 1e9 AS wait_ms, SUM(SUM_CPU_TIME) / 1e9 AS cpu_ms
+    FROM performance_schema.events_statements_summary_by_thread_by_event_name
+    WHERE THREAD_ID = PS_CURRENT_THREAD_ID()
+"""
+
+def workload(rng, iterations):
+    for _ in range(iterations):
+        start_id = rng.randint(1, 1500000)
+        ids = rng.sample(range(1, 1500000), rng.randint(20, 1000))
+        names = rng.sample(SYNONYMS, rng.randint(1, 4))
+        placeholders_names, names_params = in_list(names)
+        placeholders_ids, ids_params = in_list(ids)
+        verify_sql = f"""
+            SELECT DISTINCT recipe_id
+            FROM ingredients
+            WHERE name IN ({placeholders_names})
+            AND recipe_id IN ({placeholders_ids})
+        """
+        yield RANGE_SQL, (rng.choice(SYNONYMS), start_id, 10)
+        yield SYNONYM_SQL, (rng.choice(SYNONYMS),)
+        yield STANDARD_SQL, (rng.choice(SYNONYMS),)
+        yield verify_sql, names_params + ids_params
+
+def server_stats(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(SERVER_STATS_SQL)
+        wait_ms, cpu_ms = cursor.fetchone()
+        return float(wait_ms or 0), float(cpu_ms or 0)
+    except mysql.connector.Error:
+        return None
+    finally:
+        cursor.close()
+
+def run(label, conn, execute, iterations):
+    before = server_stats(conn)
+    timings = []
+    for sql, params in workload(random.Random(0), iterations):
+        start_time = time.perf_counter()
+        execute(sql, params)
+        timings.append(time.perf_counter() - start_time)
+    after = server_stats(conn)
+
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    line = (f"{label:<12} median {statistics.median(timings) * 1000:7.3f} ms  "
+            f"p95 {p95 * 1000:7.3f} ms  total {sum(timings) * 1000:9.1f} ms")
+    if before and after:
+        line += f"  server wait {after[0] - before[0]:9.1f} ms  server cpu {after[1] - before[1]:9.1f} ms"
+    print(line)
+
+def benchmark(iterations):
+    text_conn = mysql.connector.connect(**DB_CONFIG)
+    text_cursor = text_conn.cursor(dictionary=True)
+
+    def execute_text(sql, params):
+        text_cursor.execute(sql, params)
+        return text_cursor.fetchall()
+
+    prepared_conn = mysql.connector.connect(**DB_CONFIG)
+    statements = StatementCache(prepared_conn)
+
+    # 接続直後のキャッシュの影響を揃えるため、両方で 1 周ずつ空実行する
+    for sql, params in workload(random.Random(1), 5):
+        execute_text(sql, params)
+        statements.execute(sql, params)
+
+    run("text", text_conn, execute_text, iterations)
+    run("prepared", prepared_conn, statements.execute, iterations)
+    print(statements.stats())
+
+    text_conn.close()
+    prepared_conn.close()
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
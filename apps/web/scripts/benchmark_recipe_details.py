@@ -0,0 +1,102 @@
+import time
+import statistics
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.database import get_db_connection
+from services.search import get_recipe_details
+
+# レシピ詳細の取得を、従来の 1 本の JOIN (材料 × 手順の行が返る) と
+# 3 つの結果 (ヘッダ・材料・手順) に分けた取得で比較する
+# 使い方: python scripts/benchmark_recipe_details.py [反復回数] [レシピID...]
+#   レシピIDを省略した場合は、材料と手順が多いレシピを自動で選ぶ
+
+LEGACY_JOIN_SQL = """
+    SELECT
+        r.id, r.title, r.description,
+        r.cooking_time, r.serving_for, r.published_at, r.attribute,
+        i.id AS ingredient_id,
+        i.name AS ingredient_name, i.quantity,
+        s.position, s.memo AS step_memo,
+        ist.normalized_name,
+        iu.normalized_quantity,
+        n.enerc_kcal, n.prot, n.fat, n.choavldf, n.fib, n.nacl_eq,
+        rni.serving_size,
+        rni.calories AS total_calories,
+        rni.protein AS total_protein,
+        rni.fat AS total_fat,
+        rni.carbohydrates AS total_carbohydrates,
+        rni.fiber AS total_fiber,
+        rni.salt AS total_salt
+    FROM recipes AS r
+    LEFT JOIN ingredients AS i ON r.id = i.recipe_id
+    LEFT JOIN steps AS s ON r.id = s.recipe_id
+    LEFT JOIN ingredient_structured AS ist ON i.id = ist.ingredient_id
+    LEFT JOIN ingredient_units AS iu ON i.id = iu.ingredient_id
+    LEFT JOIN nutritions AS n ON ist.normalized_name = n.name COLLATE utf8mb4_general_ci
+    LEFT JOIN recipe_nutrition_info AS rni ON r.id = rni.recipe_id
+    WHERE r.id = %s
+    ORDER BY i.id, s.position ASC
+"""
+
+class CountingCursor:
+    """fetchall() で受け取った行数を数える"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.rows = 0
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(sql, params)
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self.rows += len(rows)
+        return rows
+
+def pick_large_recipes(cursor, count=5):
+    # 先頭付近のレシピから、材料数 × 手順数が大きいものを選ぶ
+    cursor.execute("""
+        SELECT i.recipe_id, COUNT(DISTINCT i.id) * COUNT(DISTINCT s.position) AS join_rows
+        FROM ingredients AS i
+        JOIN steps AS s ON s.recipe_id = i.recipe_id
+        WHERE i.recipe_id < 20000
+        GROUP BY i.recipe_id
+        ORDER BY join_rows DESC
+        LIMIT %s
+    """, (count,))
+    return [row['recipe_id'] for row in cursor.fetchall()]
+
+def measure(cursor, recipe_id, iterations, fn):
+    counting = CountingCursor(cursor)
+    timings = []
+    for _ in range(iterations):
+        counting.rows = 0
+        start_time = time.perf_counter()
+        fn(counting, recipe_id)
+        timings.append(time.perf_counter() - start_time)
+    return counting.rows, statistics.median(timings) * 1000
+
+def legacy_details(cursor, recipe_id):
+    cursor.execute(LEGACY_JOIN_SQL, (recipe_id,))
+    return cursor.fetchall()
+
+def benchmark(iterations, recipe_ids):
+    conn = get_db_connection()
+    if not conn:
+        print("Failed to connect.")
+        return
+    cursor = conn.cursor(dictionary=True)
+
+    recipe_ids = recipe_ids or pick_large_recipes(cursor)
+    print(f"{'recipe_id':>10} {'JOIN rows':>10} {'JOIN ms':>9} {'split rows':>11} {'split ms':>9}")
+    for recipe_id in recipe_ids:
+        legacy_rows, legacy_ms = measure(cursor, recipe_id, iterations, legacy_details)
+        split_rows, split_ms = measure(cursor, recipe_id, iterations, get_recipe_details)
+        print(f"{recipe_id:>10} {legacy_rows:>10} {legacy_ms:>9.2f} {split_rows:>11} {split_ms:>9.2f}")
+
+    conn.close()
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    benchmark(iterations, [int(a) for a in sys.argv[2:]])
@@ -0,0 +1,127 @@
+import gc
+import time
+import random
+import statistics
+import tracemalloc
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.statements import query, in_list
+from core.utils import build_recipes_dict, process_recipe_rows
+from services.search import (
+    get_recipe_details_many, RECIPE_HEADER_SQL, RECIPE_INGREDIENTS_SQL, RECIPE_STEPS_SQL,
+)
+
+# レシピ詳細の組み立てを、dict の経路 (dict の行 → build_recipes_dict + process_recipe_rows) と
+# レコードの経路 (タプルの行 → core.records) で比較する
+# DB は使わず、プール接続の prepared statement と同じ形 (列名 + タプルの行) で行を返すカーソルを使う
+# 1 リクエストあたりの時間 (中央値) と、tracemalloc で測った確保量・ブロック数・ピーク、GC の回数を出す
+# 使い方: python scripts/benchmark_recipe_records.py [反復回数]
+
+# (レシピ数, 材料・手順を含むか): 詳細ページ / 検索結果 1 ページ分の栄養 / まとめて詳細
+REQUESTS = [(1, True), (10, False), (10, True), (50, True)]
+INGREDIENTS_PER_RECIPE = 12
+STEPS_PER_RECIPE = 8
+
+HEADER_COLUMNS = ('id', 'title', 'description', 'cooking_time', 'serving_for', 'published_at', 'attribute',
+                  'serving_size', 'total_calories', 'total_protein', 'total_fat', 'total_carbohydrates',
+                  'total_fiber', 'total_salt')
+INGREDIENT_COLUMNS = ('id', 'ingredient_id', 'ingredient_name', 'quantity', 'normalized_name', 'normalized_quantity',
+                      'enerc_kcal', 'prot', 'fat', 'choavldf', 'fib', 'nacl_eq')
+STEP_COLUMNS = ('id', 'position', 'step_memo')
+
+class ReplayStatements:
+    """StatementCache と同じインターフェースで、用意した行を返す"""
+
+    def __init__(self, n_recipes, rng):
+        self.results = {'header': [], 'ingredients': [], 'steps': []}
+        ingredient_id = 0
+        for recipe_id in range(1, n_recipes + 1):
+            self.results['header'].append((
+                recipe_id, f'recipe {recipe_id}', '...', rng.randint(1, 6), '2人分', None, None,
+                rng.randint(1, 4), rng.uniform(100, 1500), rng.uniform(5, 60), rng.uniform(5, 60),
+                rng.uniform(10, 200), rng.uniform(0, 15), rng.uniform(0, 6),
+            ))
+            for _ in range(INGREDIENTS_PER_RECIPE):
+                ingredient_id += 1
+                self.results['ingredients'].append((
+                    recipe_id, ingredient_id, '玉ねぎ', '1個', '玉ねぎ', rng.uniform(0, 300),
+                    rng.uniform(0, 900), rng.uniform(0, 30), rng.uniform(0, 100), rng.uniform(0, 80),
+                    rng.uniform(0, 10), rng.uniform(0, 5),
+                ))
+            for position in range(1, STEPS_PER_RECIPE + 1):
+                self.results['steps'].append((recipe_id, position, f'step {position}'))
+
+    def execute_tuples(self, sql, params=()):
+        if 'FROM steps' in sql:
+            return STEP_COLUMNS, self.results['steps']
+        if 'FROM ingredients' in sql:
+            return INGREDIENT_COLUMNS, self.results['ingredients']
+        return HEADER_COLUMNS, self.results['header']
+
+    def execute(self, sql, params=()):
+        names, rows = self.execute_tuples(sql, params)
+        return [dict(zip(names, row)) for row in rows]
+
+class ReplayCursor:
+    def __init__(self, statements):
+        self.statements = statements
+
+    def execute(self, sql, params=()):
+        # ingredient_nutrition_available() の確認: 両方の経路で同じ材料の行 (RECIPE_INGREDIENTS_SQL) を使う
+        self._rows = []
+
+    def fetchall(self):
+        return self._rows
+
+def dict_details(cursor, recipe_ids, with_ingredients):
+    """変更前の経路: dict の行を build_recipes_dict + process_recipe_rows で組み立てる"""
+    placeholders, ids_params = in_list(recipe_ids)
+    rows = query(cursor, RECIPE_HEADER_SQL.format(placeholders=placeholders), ids_params)
+    if with_ingredients:
+        where = f"i.recipe_id IN ({placeholders})"
+        rows += query(cursor, RECIPE_INGREDIENTS_SQL.format(where=where), ids_params)
+        rows += query(cursor, RECIPE_STEPS_SQL.format(placeholders=placeholders), ids_params)
+    recipes_by_id = {recipe['id']: recipe for recipe in process_recipe_rows(build_recipes_dict(rows))}
+    return [recipes_by_id[rid] for rid in recipe_ids if rid in recipes_by_id]
+
+def record_details(cursor, recipe_ids, with_ingredients):
+    return get_recipe_details_many(cursor, recipe_ids, with_ingredients=with_ingredients, with_steps=with_ingredients)
+
+def measure(fn, cursor, recipe_ids, with_ingredients, iterations):
+    timings = []
+    collections = sum(s['collections'] for s in gc.get_stats())
+    for _ in range(iterations):
+        start_time = time.perf_counter()
+        fn(cursor, recipe_ids, with_ingredients)
+        timings.append(time.perf_counter() - start_time)
+    collections = sum(s['collections'] for s in gc.get_stats()) - collections
+
+    # 結果を保持した状態での確保量 (1 リクエスト分)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = fn(cursor, recipe_ids, with_ingredients)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    allocated = sum(s.size_diff for s in stats)
+    blocks = sum(s.count_diff for s in stats)
+    del result
+    return statistics.median(timings) * 1000, allocated, blocks, peak, collections / iterations
+
+def benchmark(iterations):
+    rng = random.Random(0)
+    print(f"{'recipes':>7} {'detail':>6} {'path':>7} {'ms':>8} {'KiB':>8} {'blocks':>7} {'peak KiB':>9} {'gc/req':>7}")
+    for n_recipes, with_ingredients in REQUESTS:
+        cursor = ReplayCursor(ReplayStatements(n_recipes, rng))
+        recipe_ids = list(range(1, n_recipes + 1))
+        expected = dict_details(cursor, recipe_ids, with_ingredients)
+        assert [r._asdict() for r in record_details(cursor, recipe_ids, with_ingredients)] == expected
+        for name, fn in (('dict', dict_details), ('records', record_details)):
+            ms, allocated, blocks, peak, collections = measure(fn, cursor, recipe_ids, with_ingredients, iterations)
+            print(f"{n_recipes:>7} {'yes' if with_ingredients else 'no':>6} {name:>7} {ms:>8.3f} "
+                  f"{allocated / 1024:>8.1f} {blocks:>7} {peak / 1024:>9.1f} {collections:>7.3f}")
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
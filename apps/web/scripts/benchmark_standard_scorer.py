@@ -0,0 +1,82 @@
+import time
+import random
+import statistics
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.standard_snapshot import StandardSnapshot, load_standard_snapshot
+
+# 基礎レシピの材料検索 (AND・除外・count の合計・上位 5 件) を、
+# dict による集計と CSR 行列 (services/count_matrix.py) で比較する (キーワード 1〜6 個)
+# 既定では合成したスナップショット、--db を付けると DB の 3 表を読み込んで計測する
+# 使い方: python scripts/benchmark_standard_scorer.py [反復回数] [--db]
+
+N_RECIPES = 3000
+N_INGREDIENT_NAMES = 2000
+INGREDIENTS_PER_RECIPE = 40
+KEYWORD_COUNTS = range(1, 7)
+QUERIES_PER_COUNT = 20
+
+def synthetic_snapshot(rng):
+    recipes = [{'id': i, 'category_medium': f'料理{i}', 'recipe_count': rng.randint(1, 5000),
+                'cooking_time': 1, 'average_steps': 5} for i in range(1, N_RECIPES + 1)]
+    names = [f'材料{i}' for i in range(N_INGREDIENT_NAMES)]
+    # よく使われる材料ほど多くのレシピに出る
+    weights = [1.0 / (rank + 1) for rank in range(N_INGREDIENT_NAMES)]
+    ingredients = []
+    for recipe in recipes:
+        for name in set(rng.choices(names, weights, k=INGREDIENTS_PER_RECIPE)):
+            ingredients.append({'standard_recipe_id': recipe['id'], 'group_name': None,
+                                'ingredient_name': name, 'count': rng.randint(1, 10000)})
+    return StandardSnapshot(recipes, ingredients, [], 1, None)
+
+def make_queries(snapshot, n_keywords, rng):
+    # 共通部分が空になりにくいよう、出現の多い材料から選ぶ
+    popular = sorted(range(len(snapshot.ingredient_names)),
+                     key=lambda p: -len(snapshot.ingredients[snapshot.ingredient_names[p]]))[:30]
+    queries = []
+    for _ in range(QUERIES_PER_COUNT):
+        chosen = rng.sample(popular, n_keywords + 1)
+        queries.append(([[p] for p in chosen[:n_keywords]], [[chosen[-1]]]))
+    return queries
+
+def measure(fn, queries, iterations):
+    timings = []
+    for _ in range(iterations):
+        start_time = time.perf_counter()
+        for inclusions, exclusions in queries:
+            fn(inclusions, exclusions, 5)
+        timings.append((time.perf_counter() - start_time) / len(queries))
+    return statistics.median(timings) * 1000
+
+def benchmark(iterations, use_db):
+    rng = random.Random(0)
+    if use_db:
+        from core.database import get_db_connection
+        conn = get_db_connection()
+        if not conn:
+            print("Failed to connect.")
+            return
+        snapshot = load_standard_snapshot(conn.cursor(dictionary=True))
+        conn.close()
+    else:
+        snapshot = synthetic_snapshot(rng)
+    if snapshot.matrix is None:
+        print("numpy is not installed; only the dict path is available.")
+        return
+    print(f"{len(snapshot.rows)} recipes, {len(snapshot.ingredient_names)} ingredient names, "
+          f"{snapshot.matrix.nnz} non-zero counts\n")
+
+    print(f"{'keywords':>8} {'dict ms':>9} {'matrix ms':>10} {'speedup':>8}")
+    for n_keywords in KEYWORD_COUNTS:
+        queries = make_queries(snapshot, n_keywords, rng)
+        for inclusions, exclusions in queries:
+            assert snapshot.top_by_ingredients_dict(inclusions, exclusions, 5) == \
+                snapshot.matrix.top_k(inclusions, exclusions, 5)
+        dict_ms = measure(snapshot.top_by_ingredients_dict, queries, iterations)
+        matrix_ms = measure(snapshot.matrix.top_k, queries, iterations)
+        print(f"{n_keywords:>8} {dict_ms:>9.3f} {matrix_ms:>10.3f} {dict_ms / matrix_ms:>7.2f}x")
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != '--db']
+    benchmark(int(args[0]) if args else 20, '--db' in sys.argv)
@@ -0,0 +1,81 @@
+import time
+import random
+import statistics
+import tracemalloc
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.database import get_db_connection
+from services.summary_store import RecipeSummaryStore, RECIPE_SUMMARY_STORE_PATH
+from services.search import _query_recipe_summaries
+
+# 検索結果の一覧表示 (id, title, description, published_at) の取得を
+# SQL (WHERE id IN ... ORDER BY FIELD) とサマリーストア (mmap) で比較する
+# 使い方: python scripts/benchmark_summary_store.py [反復回数] [スナップショットのパス]
+
+BATCH_SIZES = [10, 50, 200]
+MAX_RECIPE_ID = 1500000
+
+def percentile(timings, p):
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * p))]
+
+def report(label, timings):
+    print(f"  {label:<16} median {statistics.median(timings) * 1000:8.3f} ms  "
+          f"p95 {percentile(timings, 0.95) * 1000:8.3f} ms")
+
+def benchmark(iterations, path):
+    conn = get_db_connection()
+    if not conn:
+        print("Failed to connect.")
+        return
+    cursor = conn.cursor(dictionary=True)
+
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    store = RecipeSummaryStore(path)
+    map_ms = (time.perf_counter() - start_time) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    print(f"Mapped {path}: {store.nbytes / (1024 * 1024):.1f} MB file, "
+          f"{map_ms:.2f} ms, Python heap peak {peak / 1024:.1f} KB")
+
+    random.seed(0)
+    for batch_size in BATCH_SIZES:
+        print(f"\n=== {batch_size} ids per page ===")
+        sql_timings = []
+        store_timings = []
+        mismatches = 0
+        for _ in range(iterations):
+            ids = random.sample(range(1, min(store.max_id, MAX_RECIPE_ID) + 1), batch_size)
+
+            start_time = time.perf_counter()
+            sql_rows = _query_recipe_summaries(cursor, ids)
+            sql_timings.append(time.perf_counter() - start_time)
+
+            start_time = time.perf_counter()
+            store_rows, _ = store.get_many(ids)
+            store_timings.append(time.perf_counter() - start_time)
+
+            if [r['id'] for r in sql_rows] != [r['id'] for r in store_rows]:
+                mismatches += 1
+        report("SQL", sql_timings)
+        report("summary store", store_timings)
+        if mismatches:
+            print(f"  WARNING: {mismatches} batches differ (snapshot is stale?)")
+
+    # 1 ページ分の行を作るときの Python 側の割り当て量
+    ids = random.sample(range(1, store.max_id + 1), BATCH_SIZES[-1])
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    rows, _ = store.get_many(ids)
+    _, peak = tracemalloc.get_traced_memory()
+    print(f"\nPython heap for {len(rows)} rows from store: {(peak - base) / 1024:.1f} KB")
+    tracemalloc.stop()
+
+    store.close()
+    conn.close()
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    path = sys.argv[2] if len(sys.argv) > 2 else RECIPE_SUMMARY_STORE_PATH
+    benchmark(iterations, path)
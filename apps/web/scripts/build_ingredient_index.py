@@ -0,0 +1,34 @@
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.database import get_db_connection
+from services.ingredient_index import IngredientIndex, INGREDIENT_INDEX_PATH
+
+def build_index(path):
+    conn = get_db_connection()
+    if not conn:
+        print("Failed to connect.")
+        return
+
+    cursor = conn.cursor()
+
+    print("Building ingredient index from 'ingredients' table...")
+    start_time = time.time()
+    index = IngredientIndex.build_from_db(cursor)
+    conn.close()
+
+    total_postings = sum(len(plist) for plist in index.postings.values())
+    print(f"Built {len(index)} names / {total_postings} postings in {time.time() - start_time:.2f} seconds.")
+
+    start_time = time.time()
+    index.save(path)
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    print(f"Snapshot saved to {path} ({size_mb:.1f} MB) in {time.time() - start_time:.2f} seconds.")
+
+    start_time = time.time()
+    IngredientIndex.load(path)
+    print(f"Snapshot reload check: {time.time() - start_time:.2f} seconds.")
+
+if __name__ == "__main__":
+    build_index(sys.argv[1] if len(sys.argv) > 1 else INGREDIENT_INDEX_PATH)
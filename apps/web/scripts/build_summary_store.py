@@ -0,0 +1,30 @@
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.database import get_db_connection
+from services.summary_store import RecipeSummaryStore, RECIPE_SUMMARY_STORE_PATH
+
+def build_store(path):
+    conn = get_db_connection()
+    if not conn:
+        print("Failed to connect.")
+        return
+
+    cursor = conn.cursor()
+
+    print("Building recipe summary store from 'recipes' table...")
+    start_time = time.time()
+    count = RecipeSummaryStore.build(cursor, path)
+    conn.close()
+
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    print(f"Wrote {count} recipes to {path} ({size_mb:.1f} MB) in {time.time() - start_time:.2f} seconds.")
+
+    start_time = time.time()
+    store = RecipeSummaryStore(path)
+    print(f"Snapshot map check: max_id={store.max_id} in {(time.time() - start_time) * 1000:.1f} ms.")
+    store.close()
+
+if __name__ == "__main__":
+    build_store(sys.argv[1] if len(sys.argv) > 1 else RECIPE_SUMMARY_STORE_PATH)
@@ -0,0 +1,32 @@
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.database import get_db_connection
+from services.ingredient_nutrition import refresh_ingredient_nutrition
+
+# 材料ごとの換算済み栄養値 (ingredient_nutrition) を作成・更新する
+# 使い方: python scripts/refresh_ingredient_nutrition.py [--full | --new]
+#   --full : 全件作り直して入れ替える (初回や nutritions を大きく更新した後)
+#   --new  : 作成済みの最大 ingredient_id より後の材料だけを計算する (追加分だけ, 軽い)
+#   省略時 : 全材料を計算し直し、追加・変更された材料だけを書き込み、削除された材料の行を消す
+#   例: 30 4 * * * cd /app && python scripts/refresh_ingredient_nutrition.py
+
+def refresh(full, new_only):
+    conn = get_db_connection()
+    if not conn:
+        print("Failed to connect.")
+        return
+
+    mode = 'full' if full else 'new ingredients only' if new_only else 'incremental'
+    print(f"Refreshing ingredient nutrition ({mode})...")
+    start_time = time.time()
+    try:
+        upserted, deleted = refresh_ingredient_nutrition(conn, full=full, new_only=new_only)
+        print(f"ingredient_nutrition: {upserted} rows written, {deleted} rows deleted")
+        print(f"Refreshed in {time.time() - start_time:.2f} seconds.")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    refresh('--full' in sys.argv[1:], '--new' in sys.argv[1:])
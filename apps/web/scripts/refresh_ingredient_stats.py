@@ -0,0 +1,28 @@
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.database import get_db_connection
+from services.ingredient_stats import refresh_ingredient_stats
+
+# 材料の出現頻度統計 (ingredient_stats / ingredient_group_stats) を再集計する
+# ingredients や synonym_dictionary を更新した後、または cron 等で定期的に実行する
+#   例: 0 4 * * * cd /app && python scripts/refresh_ingredient_stats.py
+
+def refresh():
+    conn = get_db_connection()
+    if not conn:
+        print("Failed to connect.")
+        return
+
+    print("Refreshing ingredient statistics...")
+    start_time = time.time()
+    try:
+        name_count, group_count = refresh_ingredient_stats(conn)
+        print(f"ingredient_stats: {name_count} names, ingredient_group_stats: {group_count} groups")
+        print(f"Refreshed in {time.time() - start_time:.2f} seconds.")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    refresh()
@@ -5,6 +5,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.database import get_db_connection
 from services.search import search_recipes
+from services.ingredient_index import init_ingredient_index
 
 def profile_slow_case():
     conn = get_db_connection()
@@ -34,4 +35,7 @@ def profile_slow_case():
     conn.close()
 
 if __name__ == "__main__":
+    # --index: スナップショットを読み込み、ビットマップエンジンで計測する
+    if '--index' in sys.argv:
+        init_ingredient_index(mode='snapshot')
     profile_slow_case()
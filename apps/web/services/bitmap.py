@@ -0,0 +1,278 @@
+from array import array
+from bisect import bisect_left
+
+# --- 圧縮ビットマップ (Roaring 方式) ---
+# recipe_id の上位 16 bit をキーにチャンクへ分割し、各チャンク (コンテナ) を
+#   - 要素数が ARRAY_MAX_SIZE 以下: 下位 16 bit のソート済み配列 array('H')
+#   - それ以上                  : 65536 bit の Python int (ビットセット)
+# で保持する。積・和・差はコンテナ単位で行い、キーが一致しないチャンクは読み飛ばす。
+# 演算結果のビットセットは疎になっても配列へ戻さない (クエリ中の一時集合のため)。
+
+ARRAY_MAX_SIZE = 4096
+CHUNK_BITS = 16
+CHUNK_SIZE = 1 << CHUNK_BITS
+LOW_MASK = CHUNK_SIZE - 1
+BITSET_BYTES = CHUNK_SIZE // 8
+
+# 1 byte 中の立っているビット位置 (ビットセットの展開用)
+_BYTE_BITS = [tuple(i for i in range(8) if b >> i & 1) for b in range(256)]
+
+
+def _bitset_from_lows(lows):
+    buf = bytearray(BITSET_BYTES)
+    for low in lows:
+        buf[low >> 3] |= 1 << (low & 7)
+    return int.from_bytes(buf, 'little')
+
+
+def _iter_bitset(bits, start_low=0):
+    data = bits.to_bytes(BITSET_BYTES, 'little')
+    first = start_low >> 3
+    for byte_pos in range(first, BITSET_BYTES):
+        byte = data[byte_pos]
+        if byte:
+            base = byte_pos << 3
+            for i in _BYTE_BITS[byte]:
+                if base + i >= start_low:
+                    yield base + i
+
+
+def _normalize(container):
+    """配列が大きくなればビットセットに切り替える。空なら None"""
+    if isinstance(container, int):
+        return container or None
+    if not container:
+        return None
+    if len(container) > ARRAY_MAX_SIZE:
+        return _bitset_from_lows(container)
+    return container
+
+
+def _as_bitset(container):
+    return container if isinstance(container, int) else _bitset_from_lows(container)
+
+
+def _container_and(a, b):
+    if isinstance(a, int) and isinstance(b, int):
+        return _normalize(a & b)
+    if isinstance(a, int):
+        a, b = b, a
+    if isinstance(b, int):
+        if len(a) > ARRAY_MAX_SIZE // 16:
+            return _normalize(_bitset_from_lows(a) & b)
+        return _normalize(array('H', (low for low in a if b >> low & 1)))
+    if len(a) > len(b):
+        a, b = b, a
+    members = set(b)
+    return _normalize(array('H', (low for low in a if low in members)))
+
+
+def _container_or(a, b):
+    if isinstance(a, int) or isinstance(b, int) or len(a) + len(b) > ARRAY_MAX_SIZE:
+        return _normalize(_as_bitset(a) | _as_bitset(b))
+    return _normalize(array('H', sorted(set(a).union(b))))
+
+
+def _container_andnot(a, b):
+    if isinstance(a, int):
+        return _normalize(a & ~_as_bitset(b))
+    if isinstance(b, int):
+        if len(a) > ARRAY_MAX_SIZE // 16:
+            return _normalize(_bitset_from_lows(a) & ~b)
+        return _normalize(array('H', (low for low in a if not b >> low & 1)))
+    removed = set(b)
+    return _normalize(array('H', (low for low in a if low not in removed)))
+
+
+def _container_len(container):
+    return container.bit_count() if isinstance(container, int) else len(container)
+
+
+def _bitset_select(bits, ranks):
+    """ビットセット中の ranks 番目 (昇順, 0 始まり) の下位 16 bit 値を返す"""
+    result = []
+    data = bits.to_bytes(BITSET_BYTES, 'little')
+    seen = 0
+    r = 0
+    for byte_pos, byte in enumerate(data):
+        if not byte:
+            continue
+        n = len(_BYTE_BITS[byte])
+        while r < len(ranks) and ranks[r] < seen + n:
+            result.append((byte_pos << 3) + _BYTE_BITS[byte][ranks[r] - seen])
+            r += 1
+        if r == len(ranks):
+            break
+        seen += n
+    return result
+
+
+def _container_iter(container, start_low=0):
+    if isinstance(container, int):
+        return _iter_bitset(container, start_low)
+    return iter(container[bisect_left(container, start_low):])
+
+
+class RoaringBitmap:
+    """
+    recipe_id 集合の圧縮表現
+    """
+
+    __slots__ = ('keys', 'containers')
+
+    def __init__(self, keys=None, containers=None):
+        self.keys = keys if keys is not None else []
+        self.containers = containers if containers is not None else []
+
+    @classmethod
+    def from_sorted(cls, ids):
+        """昇順・重複なしの ID 列 (posting list) から構築する"""
+        keys = []
+        containers = []
+        pos = 0
+        n = len(ids)
+        while pos < n:
+            key = ids[pos] >> CHUNK_BITS
+            end = bisect_left(ids, (key + 1) << CHUNK_BITS, pos)
+            lows = array('H', (x & LOW_MASK for x in ids[pos:end]))
+            keys.append(key)
+            containers.append(_normalize(lows))
+            pos = end
+        return cls(keys, containers)
+
+    @classmethod
+    def from_ids(cls, ids):
+        return cls.from_sorted(sorted(set(ids)))
+
+    def __len__(self):
+        return sum(_container_len(c) for c in self.containers)
+
+    def __bool__(self):
+        return bool(self.keys)
+
+    def __contains__(self, recipe_id):
+        key = recipe_id >> CHUNK_BITS
+        i = bisect_left(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            return False
+        container = self.containers[i]
+        low = recipe_id & LOW_MASK
+        if isinstance(container, int):
+            return bool(container >> low & 1)
+        j = bisect_left(container, low)
+        return j < len(container) and container[j] == low
+
+    def __iter__(self):
+        return self.iter_from(0)
+
+    def iter_from(self, start_id):
+        """start_id 以上の ID を昇順に返す"""
+        start_key = start_id >> CHUNK_BITS
+        i = bisect_left(self.keys, start_key)
+        for key, container in zip(self.keys[i:], self.containers[i:]):
+            base = key << CHUNK_BITS
+            start_low = start_id & LOW_MASK if key == start_key else 0
+            for low in _container_iter(container, start_low):
+                yield base + low
+
+    def take_from(self, start_id, limit):
+        """start_id 以上の ID を昇順に最大 limit 件返す"""
+        result = []
+        if limit <= 0:
+            return result
+        for recipe_id in self.iter_from(start_id):
+            result.append(recipe_id)
+            if len(result) >= limit:
+                break
+        return result
+
+    def select_many(self, ranks):
+        """
+        昇順で ranks 番目 (0 始まり) の ID をそれぞれ返す (入力と同じ順序)
+        コンテナごとの要素数を累積して該当コンテナだけを展開する
+        """
+        order = sorted(range(len(ranks)), key=lambda i: ranks[i])
+        result = [None] * len(ranks)
+        pos = 0
+        offset = 0
+        for key, container in zip(self.keys, self.containers):
+            if pos == len(order):
+                break
+            n = _container_len(container)
+            local = []
+            while pos + len(local) < len(order) and ranks[order[pos + len(local)]] < offset + n:
+                local.append(ranks[order[pos + len(local)]] - offset)
+            if local:
+                if isinstance(container, int):
+                    lows = _bitset_select(container, local)
+                else:
+                    lows = [container[r] for r in local]
+                base = key << CHUNK_BITS
+                for low in lows:
+                    result[order[pos]] = base + low
+                    pos += 1
+            offset += n
+        if pos != len(order):
+            raise IndexError("rank out of range")
+        return result
+
+    def _merge(self, other, op, keep_left, keep_right):
+        keys = []
+        containers = []
+        i = j = 0
+        a_keys, b_keys = self.keys, other.keys
+        while i < len(a_keys) and j < len(b_keys):
+            ka, kb = a_keys[i], b_keys[j]
+            if ka == kb:
+                c = op(self.containers[i], other.containers[j])
+                if c is not None:
+                    keys.append(ka)
+                    containers.append(c)
+                i += 1
+                j += 1
+            elif ka < kb:
+                if keep_left:
+                    keys.append(ka)
+                    containers.append(self.containers[i])
+                i += 1
+            else:
+                if keep_right:
+                    keys.append(kb)
+                    containers.append(other.containers[j])
+                j += 1
+        if keep_left:
+            keys.extend(a_keys[i:])
+            containers.extend(self.containers[i:])
+        if keep_right:
+            keys.extend(b_keys[j:])
+            containers.extend(other.containers[j:])
+        return RoaringBitmap(keys, containers)
+
+    def __and__(self, other):
+        return self._merge(other, _container_and, False, False)
+
+    def __or__(self, other):
+        return self._merge(other, _container_or, True, True)
+
+    def __sub__(self, other):
+        return self._merge(other, _container_andnot, True, False)
+
+    @classmethod
+    def union_all(cls, bitmaps):
+        result = cls()
+        for bm in bitmaps:
+            result = result | bm
+        return result
+
+    @classmethod
+    def intersect_all(cls, bitmaps):
+        """和集合を取った各グループの積集合 (小さい順に積を取り、空になれば打ち切る)"""
+        bitmaps = sorted(bitmaps, key=len)
+        if not bitmaps:
+            return cls()
+        result = bitmaps[0]
+        for bm in bitmaps[1:]:
+            if not result:
+                break
+            result = result & bm
+        return result
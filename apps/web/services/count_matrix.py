@@ -0,0 +1,88 @@
+try:
+    import numpy as np
+except ImportError:  # numpy は任意 (無い場合は dict での集計を使う)
+    np = None
+
+# --- 基礎レシピ × 材料の count の疎行列 (CSR) ---
+# 材料検索では、キーワードごとに {recipe_id: count} を作り、キーの共通部分・count の合計・
+# 全候補の並び替えを Python で行っていた。
+# 材料名を行、基礎レシピを列とする CSR 形式の配列 (indptr / indices / data) を事前に作り、
+#   1. キーワードに一致した行を長さ = レシピ数のベクトルに書き込む
+#   2. AND (一致の有無の積)・除外のマスク・count の合計をベクトル演算で行う
+#   3. 上位 k 件を np.argpartition で選び、その k 件だけを並び替える
+# 列はレシピ ID の昇順なので、同点は ID の小さい順になる。
+
+
+class CountMatrix:
+    """
+    行 = 材料名 (StandardSnapshot.ingredient_names の位置), 列 = 基礎レシピ (ID 昇順)
+    """
+
+    __slots__ = ('recipe_ids', 'indptr', 'indices', 'data')
+
+    def __init__(self, recipe_ids, rows):
+        """
+        recipe_ids : 列となるレシピ ID (昇順)
+        rows       : 行ごとの {recipe_id: count}
+        """
+        self.recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        column = {recipe_id: i for i, recipe_id in enumerate(recipe_ids)}
+        indptr = [0]
+        indices = []
+        data = []
+        for counts in rows:
+            for recipe_id in sorted(counts, key=column.__getitem__):
+                indices.append(column[recipe_id])
+                data.append(counts[recipe_id] or 0)
+            indptr.append(len(indices))
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.data = np.asarray(data, dtype=np.int64)
+
+    @property
+    def nnz(self):
+        return len(self.data)
+
+    def _dense(self, rows):
+        """
+        rows (行番号の並び) の count を 1 本のベクトルにまとめる
+        同じレシピが複数の行にある場合は後の行の値 (dict.update と同じ)
+        Returns: (一致したか, count)
+        """
+        n = len(self.recipe_ids)
+        matched = np.zeros(n, dtype=bool)
+        counts = np.zeros(n, dtype=np.int64)
+        for row in rows:
+            start, end = self.indptr[row], self.indptr[row + 1]
+            columns = self.indices[start:end]
+            matched[columns] = True
+            counts[columns] = self.data[start:end]
+        return matched, counts
+
+    def top_k(self, inclusions, exclusions, k):
+        """
+        inclusions : キーワードごとの行番号のリスト (すべてに一致するレシピが対象)
+        exclusions : 除外するキーワードごとの行番号のリスト
+        Returns: count の合計の降順 (同点は ID 昇順) の上位 k 件のレシピ ID
+        """
+        if not inclusions:
+            return []
+        mask = None
+        score = np.zeros(len(self.recipe_ids), dtype=np.int64)
+        for rows in inclusions:
+            matched, counts = self._dense(rows)
+            mask = matched if mask is None else mask & matched
+            score += counts
+        for rows in exclusions:
+            mask &= ~self._dense(rows)[0]
+
+        candidates = np.flatnonzero(mask)
+        if len(candidates) > k:
+            scores = score[candidates]
+            # k 番目のスコアより大きいものと、同点のうち ID の小さいもの
+            kth = -np.partition(-scores, k - 1)[k - 1]
+            candidates = np.concatenate((candidates[scores > kth], candidates[scores == kth]))[:k]
+        # 列 (ID 昇順) で並べ、スコア降順に安定ソート
+        candidates.sort()
+        order = np.argsort(-score[candidates], kind='stable')
+        return self.recipe_ids[candidates[order]].tolist()
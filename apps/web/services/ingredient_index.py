@@ -0,0 +1,308 @@
+import os
+import sys
+import time
+import logging
+import threading
+from array import array
+from bisect import bisect_left
+from services.bitmap import RoaringBitmap
+from core.synonyms import fold_name
+
+# --- 材料 → recipe_id の転置インデックス (In-process Inverted Index) ---
+# ingredients.name ごとに recipe_id の昇順配列 (posting list) を保持し、
+# search_recipes のレンジスキャンを DB に問い合わせずに解決する。
+# SQL の name = %s (列の照合順序) と同じ結果になるよう、材料名は fold_name で揃えたキーで引く
+# (大文字・小文字や全角・半角だけが違う名前は 1 つの posting list にまとめる)。
+#
+# インデックスは起動時に用意し、/api/cache/invalidate で検索キャッシュの世代が進んだときに
+# バックグラウンドで読み直す (それまでに追加されたレシピはインデックスの検索には出ない)。
+#   'snapshot' : スナップショットファイルを読み直す (scripts/build_ingredient_index.py で作り直してから世代を進める)
+#   'build'    : DB から作り直して保存する (ワーカーごとに ingredients を全件読むので、更新の多い時間帯は避ける)
+#
+# INGREDIENT_INDEX:
+#   'off'      : 使用しない (既定, 従来通り SQL で検索)
+#   'snapshot' : スナップショットファイルがあれば読み込む
+#   'build'    : スナップショットがなければ DB から構築し、保存する
+INGREDIENT_INDEX_MODE = os.environ.get('INGREDIENT_INDEX', 'off')
+INGREDIENT_INDEX_PATH = os.environ.get(
+    'INGREDIENT_INDEX_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'ingredient_index.bin')
+)
+
+# キーを fold_name で揃える前のスナップショット (IIDX1) は読み込まない
+# ('build' では作り直す。'snapshot' では scripts/build_ingredient_index.py で作り直しておく)
+SNAPSHOT_MAGIC = b'IIDX2\n'
+BUILD_FETCH_SIZE = 50000
+
+# 'I' は多くの環境で 4 byte だが、保証されないため確認する
+POSTING_TYPECODE = 'I' if array('I').itemsize == 4 else 'L'
+
+
+class IngredientIndex:
+    """
+    材料名ごとの posting list (recipe_id の昇順・重複なし配列) を保持する
+    postings のキーは fold_name(材料名)
+    """
+
+    def __init__(self, postings):
+        self.postings = postings
+        self.built_at = time.time()
+        # 圧縮ビットマップは初回アクセス時に作成してキャッシュする
+        self._bitmaps = {}
+
+    def __len__(self):
+        return len(self.postings)
+
+    def __contains__(self, name):
+        return fold_name(name) in self.postings
+
+    def get(self, name):
+        return self.postings.get(fold_name(name))
+
+    def count(self, name):
+        """材料名に紐づくレシピ数 (posting list の長さ)"""
+        plist = self.get(name)
+        return len(plist) if plist is not None else 0
+
+    def range(self, name, start_id, limit):
+        """
+        SELECT recipe_id FROM ingredients WHERE name = %s AND recipe_id >= %s
+        ORDER BY recipe_id LIMIT %s と同じ結果を返す
+        """
+        plist = self.get(name)
+        if not plist:
+            return []
+        pos = bisect_left(plist, start_id)
+        return plist[pos:pos + limit].tolist()
+
+    def contains(self, name, recipe_id):
+        plist = self.get(name)
+        if not plist:
+            return False
+        pos = bisect_left(plist, recipe_id)
+        return pos < len(plist) and plist[pos] == recipe_id
+
+    def bitmap(self, name):
+        """材料名の posting list を圧縮ビットマップとして返す"""
+        key = fold_name(name)
+        bm = self._bitmaps.get(key)
+        if bm is None:
+            bm = RoaringBitmap.from_sorted(self.postings.get(key) or ())
+            self._bitmaps[key] = bm
+        return bm
+
+    def group_bitmap(self, names):
+        """同義語グループ (いずれかを含む) の和集合"""
+        return RoaringBitmap.union_all(self.bitmap(name) for name in names)
+
+    # --- 構築・保存 ---
+
+    @classmethod
+    def build_from_db(cls, cursor):
+        """
+        ingredients テーブルから posting list を構築する
+        (name, recipe_id) の複合インデックスを使い、名前順・ID順に読み込む
+        """
+        postings = {}
+        cursor.execute("SELECT name, recipe_id FROM ingredients ORDER BY name, recipe_id")
+
+        current_name = None
+        current_list = None
+        last_id = None
+        while True:
+            rows = cursor.fetchmany(BUILD_FETCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                if isinstance(row, dict):
+                    name, recipe_id = row['name'], row['recipe_id']
+                else:
+                    name, recipe_id = row[0], row[1]
+                if name is None or recipe_id is None:
+                    continue
+                if name != current_name:
+                    current_name = name
+                    current_list = postings.get(name)
+                    if current_list is None:
+                        current_list = array(POSTING_TYPECODE)
+                        postings[name] = current_list
+                    last_id = current_list[-1] if current_list else None
+                # 同じレシピに同じ材料が複数行ある場合は 1 件にまとめる
+                if recipe_id != last_id:
+                    current_list.append(recipe_id)
+                    last_id = recipe_id
+
+        # 照合順序で同じ名前の posting list をまとめる
+        folded = {}
+        for name, plist in postings.items():
+            key = fold_name(name)
+            other = folded.get(key)
+            if other is None:
+                folded[key] = plist
+            else:
+                folded[key] = array(POSTING_TYPECODE, sorted(set(other).union(plist)))
+        return cls(folded)
+
+    def save(self, path):
+        """
+        スナップショットファイルに書き出す (一時ファイル経由で置き換え)
+        複数のワーカーが同時に保存しても混ざらないよう、一時ファイルはプロセスごとに分ける
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(sys.byteorder.encode('ascii').ljust(8, b' '))
+            f.write(len(self.postings).to_bytes(4, 'little'))
+            for name, plist in self.postings.items():
+                name_bytes = name.encode('utf-8')
+                f.write(len(name_bytes).to_bytes(4, 'little'))
+                f.write(name_bytes)
+                f.write(len(plist).to_bytes(4, 'little'))
+                plist.tofile(f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def is_snapshot(path):
+        """path が (先頭の magic が一致する) スナップショットファイルか"""
+        try:
+            with open(path, 'rb') as f:
+                return f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+        except OSError:
+            return False
+
+    @classmethod
+    def load(cls, path):
+        """スナップショットファイルから読み込む"""
+        postings = {}
+        with open(path, 'rb') as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise ValueError(f"Invalid ingredient index snapshot: {path}")
+            byteorder = f.read(8).decode('ascii').strip()
+            swap = byteorder != sys.byteorder
+            name_count = int.from_bytes(f.read(4), 'little')
+            for _ in range(name_count):
+                name_len = int.from_bytes(f.read(4), 'little')
+                name = f.read(name_len).decode('utf-8')
+                n = int.from_bytes(f.read(4), 'little')
+                plist = array(POSTING_TYPECODE)
+                plist.fromfile(f, n)
+                if swap:
+                    plist.byteswap()
+                postings[name] = plist
+        return cls(postings)
+
+
+# --- プロセス全体で共有するインデックス ---
+# 差し替えるたびにバージョンを 1 つ進める (検索結果キャッシュのキーに使う)。
+# id(index) は GC 後に同じアドレスへ作られたインデックスと区別できないため使わない。
+_INDEX = None
+_INDEX_VERSION = 0
+
+
+def get_ingredient_index():
+    """読み込み済みのインデックスを返す (未使用・未構築なら None)"""
+    return _INDEX
+
+
+def current_index_version():
+    """読み込み済みインデックスのバージョン (未使用・未構築なら 0)"""
+    return _INDEX_VERSION if _INDEX is not None else 0
+
+
+def set_ingredient_index(index):
+    global _INDEX, _INDEX_VERSION
+    _INDEX_VERSION += 1
+    _INDEX = index
+
+
+def _prepare_index(mode, path, rebuild=False):
+    """
+    スナップショットを読み込む、または ('build' で、無いか rebuild の場合) DB から構築して保存する
+    Returns: インデックス (用意できなければ None)
+    """
+    start = time.time()
+    if mode == 'build' and (rebuild or not IngredientIndex.is_snapshot(path)):
+        from core.database import get_db_connection
+        conn = get_db_connection()
+        if not conn:
+            logging.error("Ingredient index build skipped: database connection failed")
+            return None
+        try:
+            cursor = conn.cursor()
+            index = IngredientIndex.build_from_db(cursor)
+        finally:
+            conn.close()
+        logging.info(f"Ingredient index built from database: {len(index)} names ({time.time() - start:.2f}s)")
+        try:
+            # 起動時は、構築中に他のワーカーが保存を終えていれば書き直さない
+            if rebuild or not IngredientIndex.is_snapshot(path):
+                index.save(path)
+        except OSError as e:
+            logging.warning(f"Ingredient index snapshot could not be saved: {e}")
+        return index
+    if os.path.exists(path):
+        index = IngredientIndex.load(path)
+        logging.info(f"Ingredient index loaded from snapshot: {len(index)} names ({time.time() - start:.2f}s)")
+        return index
+    logging.warning(f"Ingredient index snapshot not found: {path}")
+    return None
+
+
+def init_ingredient_index(mode=None, path=None):
+    """
+    起動時にインデックスを用意する
+    失敗しても例外は送出せず、None (SQL フォールバック) のまま起動を続ける
+    """
+    mode = mode or INGREDIENT_INDEX_MODE
+    path = path or INGREDIENT_INDEX_PATH
+    _CONFIG['mode'] = mode
+    _CONFIG['path'] = path
+
+    if mode not in ('snapshot', 'build'):
+        return None
+
+    try:
+        index = _prepare_index(mode, path)
+    except Exception as e:
+        logging.error(f"Ingredient index initialization failed: {e}")
+        index = None
+
+    set_ingredient_index(index)
+    return index
+
+
+_CONFIG = {'mode': None, 'path': None}
+_REFRESH_LOCK = threading.Lock()
+
+
+def _refresh_in_background(mode, path):
+    """インデックスを用意し直して差し替える (同時に動くのは 1 スレッドだけ)"""
+    try:
+        index = _prepare_index(mode, path, rebuild=True)
+        if index is not None:
+            set_ingredient_index(index)
+    except Exception as e:
+        # 読み直せなければ、今のインデックスを使い続ける
+        logging.error(f"Ingredient index refresh failed: {e}")
+    finally:
+        _REFRESH_LOCK.release()
+
+
+def refresh_ingredient_index():
+    """
+    インデックスを使っている場合、別スレッドで読み直す (検索キャッシュの世代が進んだとき)
+    読み直している間の検索は今のインデックスを使う
+    Returns: 読み直しを始めたか
+    """
+    mode = _CONFIG['mode']
+    if _INDEX is None or mode not in ('snapshot', 'build') or not _REFRESH_LOCK.acquire(blocking=False):
+        return False
+    try:
+        threading.Thread(target=_refresh_in_background, args=(mode, _CONFIG['path']),
+                         name='ingredient-index-refresh', daemon=True).start()
+    except RuntimeError as e:
+        _REFRESH_LOCK.release()
+        logging.error(f"Ingredient index refresh could not be started: {e}")
+        return False
+    return True
@@ -0,0 +1,200 @@
+import os
+import time
+import logging
+import mysql.connector
+
+# --- 材料ごとの栄養値の事前計算 (ingredient_nutrition) ---
+# レシピ詳細では nutritions との JOIN (COLLATE 変換のためインデックスが効かない) と、
+# 100g あたりの値から分量分の値への換算を毎回行っていた。
+# 材料 (ingredient_id) ごとに換算済みの値を保存しておき、詳細表示ではそれを読むだけにする。
+# 作成・更新は scripts/refresh_ingredient_nutrition.py で行う:
+#   --full : 作業用テーブルに全件作成して RENAME TABLE で入れ替える
+#   省略時 : ingredient_id の範囲ごとに、追加・変更された行だけを書き込み、削除された材料の行を消す
+#            (nutritions や ingredient_units の変更も反映するため、毎回すべての範囲を計算し直す。
+#             書き込みは変わった行だけだが、JOIN の計算量は --full と同じ)
+#   --new  : 作成済みの最大 ingredient_id より後の材料だけを計算する (追加分だけの軽い更新。
+#            既存の材料の変更・削除は反映しない)
+INGREDIENT_NUTRITION_CHUNK_SIZE = int(os.environ.get('INGREDIENT_NUTRITION_CHUNK_SIZE', 50000))
+# 表が無いと分かった後に再確認するまでの秒数
+INGREDIENT_NUTRITION_RETRY = int(os.environ.get('INGREDIENT_NUTRITION_RETRY', 600))
+
+CREATE_INGREDIENT_NUTRITION = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        ingredient_id INT NOT NULL PRIMARY KEY,
+        recipe_id INT NOT NULL,
+        normalized_name VARCHAR(255) NULL,
+        quantity_g DOUBLE NOT NULL,
+        energy DOUBLE NOT NULL,
+        protein DOUBLE NOT NULL,
+        fat DOUBLE NOT NULL,
+        carbs DOUBLE NOT NULL,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        KEY idx_recipe_id (recipe_id)
+    ) DEFAULT CHARSET=utf8mb4
+"""
+
+# ingredient_units / nutritions (COLLATE utf8mb4_general_ci で大文字・小文字や全角・半角の違う名前にも一致する) は
+# 1 つの材料に複数行が JOIN されることがある。材料ごとに 1 行にするときは、この順で最初の行を使う
+# (レシピ詳細の従来の経路 RECIPE_INGREDIENTS_SQL も同じ順に並べ、材料ごとに最初の行を使う)。
+INGREDIENT_ROW_ORDER = """
+    (n.name = ist.normalized_name COLLATE utf8mb4_bin) DESC,
+    n.name COLLATE utf8mb4_bin,
+    iu.normalized_quantity
+"""
+
+# build_recipes_dict と同じ換算 (100g あたりの値 × 分量 / 100, 炭水化物は 利用可能炭水化物 + 食物繊維)
+# ingredient_id が主キーのため、ROW_NUMBER() で材料ごとに 1 行だけを返す
+COMPUTED_NUTRITION_SQL = f"""
+    SELECT ingredient_id, recipe_id, normalized_name, quantity_g, energy, protein, fat, carbs
+    FROM (
+        SELECT
+            i.id AS ingredient_id,
+            i.recipe_id,
+            ist.normalized_name,
+            COALESCE(iu.normalized_quantity, 0) AS quantity_g,
+            COALESCE(n.enerc_kcal, 0) / 100.0 * COALESCE(iu.normalized_quantity, 0) AS energy,
+            COALESCE(n.prot, 0) / 100.0 * COALESCE(iu.normalized_quantity, 0) AS protein,
+            COALESCE(n.fat, 0) / 100.0 * COALESCE(iu.normalized_quantity, 0) AS fat,
+            (COALESCE(n.choavldf, 0) + COALESCE(n.fib, 0)) / 100.0 * COALESCE(iu.normalized_quantity, 0) AS carbs,
+            ROW_NUMBER() OVER (PARTITION BY i.id ORDER BY {INGREDIENT_ROW_ORDER}) AS row_rank
+        FROM ingredients AS i
+        LEFT JOIN ingredient_structured AS ist ON i.id = ist.ingredient_id
+        LEFT JOIN ingredient_units AS iu ON i.id = iu.ingredient_id
+        LEFT JOIN nutritions AS n ON ist.normalized_name = n.name COLLATE utf8mb4_general_ci
+        WHERE i.id BETWEEN %s AND %s
+    ) AS ranked
+    WHERE row_rank = 1
+"""
+
+COLUMNS = ('ingredient_id', 'recipe_id', 'normalized_name', 'quantity_g', 'energy', 'protein', 'fat', 'carbs')
+
+_STATE = {
+    'available': None,
+    'checked_at': 0.0,
+}
+
+
+def _id_range(cursor):
+    cursor.execute("SELECT MIN(id), MAX(id) FROM ingredients")
+    row = cursor.fetchone()
+    if isinstance(row, dict):
+        row = tuple(row.values())
+    return row[0], row[1]
+
+
+def _chunks(min_id, max_id, chunk_size):
+    start = min_id
+    while start <= max_id:
+        yield start, min(start + chunk_size - 1, max_id)
+        start += chunk_size
+
+
+def _upsert_changed_sql(table):
+    # 未登録 (t.ingredient_id IS NULL) か、いずれかの値が異なる行だけを書き込む
+    columns = ', '.join(COLUMNS)
+    changed = ' OR '.join(f"NOT (t.{c} <=> src.{c})" for c in COLUMNS[1:])
+    updates = ', '.join(f"{c} = VALUES({c})" for c in COLUMNS[1:])
+    return f"""
+        INSERT INTO {table} ({columns})
+        SELECT src.{', src.'.join(COLUMNS)}
+        FROM ({COMPUTED_NUTRITION_SQL}) AS src
+        LEFT JOIN {table} AS t ON t.ingredient_id = src.ingredient_id
+        WHERE t.ingredient_id IS NULL OR {changed}
+        ON DUPLICATE KEY UPDATE {updates}
+    """
+
+
+def refresh_ingredient_nutrition(conn, full=False, new_only=False, chunk_size=INGREDIENT_NUTRITION_CHUNK_SIZE):
+    """
+    ingredient_nutrition を作成・更新する
+    full     : 全件作り直して入れ替える
+    new_only : 作成済みの最大 ingredient_id より後だけを計算する (削除・変更は反映しない)
+    どちらでもない場合は、すべての材料を計算し直して変わった行だけを書き込み、削除された材料の行を消す
+    Returns: (upserted_rows, deleted_rows)
+    """
+    cursor = conn.cursor()
+    cursor.execute(CREATE_INGREDIENT_NUTRITION.format(table='ingredient_nutrition'))
+
+    min_id, max_id = _id_range(cursor)
+    upserted = 0
+    deleted = 0
+
+    if new_only and not full and min_id is not None:
+        # 作成済みの最大 ingredient_id を基準 (watermark) にする
+        cursor.execute("SELECT MAX(ingredient_id) FROM ingredient_nutrition")
+        watermark = cursor.fetchone()[0]
+        if watermark is not None:
+            min_id = max(min_id, watermark + 1)
+
+    if full:
+        cursor.execute("DROP TABLE IF EXISTS ingredient_nutrition_new")
+        cursor.execute(CREATE_INGREDIENT_NUTRITION.format(table='ingredient_nutrition_new'))
+        if min_id is not None:
+            columns = ', '.join(COLUMNS)
+            for start, end in _chunks(min_id, max_id, chunk_size):
+                cursor.execute(f"INSERT INTO ingredient_nutrition_new ({columns}) {COMPUTED_NUTRITION_SQL}", (start, end))
+                upserted += cursor.rowcount
+                conn.commit()
+        cursor.execute("DROP TABLE IF EXISTS ingredient_nutrition_old")
+        cursor.execute("""
+            RENAME TABLE
+                ingredient_nutrition TO ingredient_nutrition_old,
+                ingredient_nutrition_new TO ingredient_nutrition
+        """)
+        cursor.execute("DROP TABLE IF EXISTS ingredient_nutrition_old")
+        conn.commit()
+    else:
+        if min_id is not None and min_id <= max_id:
+            upsert_sql = _upsert_changed_sql('ingredient_nutrition')
+            for start, end in _chunks(min_id, max_id, chunk_size):
+                cursor.execute(upsert_sql, (start, end))
+                upserted += cursor.rowcount
+                conn.commit()
+        if not new_only:
+            # ingredients から削除された材料の行
+            cursor.execute("""
+                DELETE t FROM ingredient_nutrition AS t
+                LEFT JOIN ingredients AS i ON i.id = t.ingredient_id
+                WHERE i.id IS NULL
+            """)
+            deleted = cursor.rowcount
+            conn.commit()
+
+    cursor.close()
+    invalidate_ingredient_nutrition()
+    return upserted, deleted
+
+
+def invalidate_ingredient_nutrition():
+    _STATE['available'] = None
+    _STATE['checked_at'] = 0.0
+
+
+def mark_ingredient_nutrition_unavailable(err):
+    """
+    使えると覚えていた ingredient_nutrition の読み込みが失敗したとき (表の削除など) に呼ぶ
+    INGREDIENT_NUTRITION_RETRY 秒後に確認し直すまで、従来の JOIN で読む
+    """
+    logging.warning(f"ingredient_nutrition query failed, falling back to the nutritions join: {err}")
+    _STATE['available'] = False
+    _STATE['checked_at'] = time.time()
+
+
+def ingredient_nutrition_available(cursor):
+    """
+    ingredient_nutrition が使えるか (プロセス内で結果を覚えておく)
+    表が無い場合は INGREDIENT_NUTRITION_RETRY 秒ごとに確認し直す
+    (使えると覚えた後に読み込みが失敗した場合は mark_ingredient_nutrition_unavailable で確認し直しに戻す)
+    """
+    available = _STATE['available']
+    if available or (available is False and time.time() - _STATE['checked_at'] < INGREDIENT_NUTRITION_RETRY):
+        return available
+    try:
+        cursor.execute("SELECT ingredient_id FROM ingredient_nutrition LIMIT 1")
+        available = bool(cursor.fetchall())
+    except mysql.connector.Error as err:
+        logging.warning(f"ingredient_nutrition is not available, falling back to the nutritions join: {err}")
+        available = False
+    _STATE['available'] = available
+    _STATE['checked_at'] = time.time()
+    return available
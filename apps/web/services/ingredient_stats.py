@@ -0,0 +1,183 @@
+import os
+import time
+import logging
+import threading
+import mysql.connector
+
+# --- 材料の出現頻度統計 (ingredient_stats) ---
+# 複数材料検索の「最も少ない材料から検索する」計画のために、
+# 材料名ごと・同義語グループ (normalized_name) ごとの行数を事前集計しておく。
+# 集計は scripts/refresh_ingredient_stats.py (定期実行) で行い、
+# アプリは起動後の初回検索時にテーブル全体をメモリに読み込む。
+# INGREDIENT_STATS_TTL を過ぎた後は、バックグラウンドのスレッドが読み直し、
+# その間の検索は読み込み済みの統計をそのまま使う (リクエストを待たせない)。
+INGREDIENT_STATS_TTL = int(os.environ.get('INGREDIENT_STATS_TTL', 3600))
+
+CREATE_INGREDIENT_STATS = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        name VARCHAR(255) NOT NULL PRIMARY KEY,
+        row_count INT UNSIGNED NOT NULL,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    ) DEFAULT CHARSET=utf8mb4
+"""
+
+CREATE_INGREDIENT_GROUP_STATS = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        normalized_name VARCHAR(255) NOT NULL PRIMARY KEY,
+        row_count INT UNSIGNED NOT NULL,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    ) DEFAULT CHARSET=utf8mb4
+"""
+
+# プロセス内キャッシュ
+_STATS = {
+    'names': {},
+    'groups': {},
+    'available': False,
+    'loaded_at': None,
+}
+
+
+def refresh_ingredient_stats(conn):
+    """
+    ingredients / synonym_dictionary から統計を再集計する
+    作業用テーブルに集計してから RENAME TABLE で入れ替えるため、
+    集計中も検索側は古い統計を参照できる
+    """
+    cursor = conn.cursor()
+
+    for table, ddl in (('ingredient_stats', CREATE_INGREDIENT_STATS),
+                       ('ingredient_group_stats', CREATE_INGREDIENT_GROUP_STATS)):
+        cursor.execute(ddl.format(table=table))
+        cursor.execute(f"DROP TABLE IF EXISTS {table}_new")
+        cursor.execute(ddl.format(table=f"{table}_new"))
+
+    # 1. 材料名ごとの行数
+    cursor.execute("""
+        INSERT INTO ingredient_stats_new (name, row_count)
+        SELECT name, COUNT(*)
+        FROM ingredients
+        WHERE name IS NOT NULL
+        GROUP BY name
+    """)
+
+    # 2. 同義語グループごとの行数 (get_synonyms と同様に normalized_name 自身も含める)
+    cursor.execute("""
+        INSERT INTO ingredient_group_stats_new (normalized_name, row_count)
+        SELECT g.normalized_name, SUM(s.row_count)
+        FROM (
+            SELECT normalized_name, synonym AS name FROM synonym_dictionary
+            UNION
+            SELECT normalized_name, normalized_name FROM synonym_dictionary
+        ) AS g
+        JOIN ingredient_stats_new AS s ON s.name = g.name
+        GROUP BY g.normalized_name
+    """)
+
+    # 前回の実行が RENAME と DROP の間で止まっていた場合に備えて先に消す
+    cursor.execute("DROP TABLE IF EXISTS ingredient_stats_old, ingredient_group_stats_old")
+    cursor.execute("""
+        RENAME TABLE
+            ingredient_stats TO ingredient_stats_old,
+            ingredient_stats_new TO ingredient_stats,
+            ingredient_group_stats TO ingredient_group_stats_old,
+            ingredient_group_stats_new TO ingredient_group_stats
+    """)
+    cursor.execute("DROP TABLE IF EXISTS ingredient_stats_old, ingredient_group_stats_old")
+    conn.commit()
+
+    cursor.execute("SELECT COUNT(*) FROM ingredient_stats")
+    name_count = cursor.fetchone()[0]
+    cursor.execute("SELECT COUNT(*) FROM ingredient_group_stats")
+    group_count = cursor.fetchone()[0]
+    cursor.close()
+
+    invalidate_ingredient_stats()
+    return name_count, group_count
+
+
+def load_ingredient_stats(cursor):
+    """統計テーブルをメモリに読み込む (テーブルが無い場合は available=False)"""
+    names = {}
+    groups = {}
+    try:
+        cursor.execute("SELECT name, row_count FROM ingredient_stats")
+        for row in cursor.fetchall():
+            names[row['name']] = row['row_count']
+        cursor.execute("SELECT normalized_name, row_count FROM ingredient_group_stats")
+        for row in cursor.fetchall():
+            groups[row['normalized_name']] = row['row_count']
+        available = bool(names)
+    except mysql.connector.Error as err:
+        logging.warning(f"ingredient_stats is not available, falling back to COUNT(*): {err}")
+        available = False
+
+    _STATS['names'] = names
+    _STATS['groups'] = groups
+    _STATS['available'] = available
+    _STATS['loaded_at'] = time.time()
+    return available
+
+
+def invalidate_ingredient_stats():
+    _STATS['loaded_at'] = None
+
+
+_REFRESH_LOCK = threading.Lock()
+
+
+def _refresh_in_background():
+    """統計を別の接続で読み直す (同時に動くのは 1 スレッドだけ)"""
+    from core.database import get_db_connection
+    try:
+        conn = get_db_connection()
+        if not conn:
+            logging.error("ingredient_stats refresh skipped: database connection failed")
+            _STATS['loaded_at'] = time.time()  # 次の TTL まで古い統計を使う
+            return
+        try:
+            load_ingredient_stats(conn.cursor(dictionary=True))
+        finally:
+            conn.close()
+    except Exception as e:
+        logging.error(f"ingredient_stats refresh failed: {e}")
+        _STATS['loaded_at'] = time.time()
+    finally:
+        _REFRESH_LOCK.release()
+
+
+def _ensure_loaded(cursor):
+    loaded_at = _STATS['loaded_at']
+    if loaded_at is None:
+        # 初回だけはリクエストの中で読み込む
+        load_ingredient_stats(cursor)
+    elif time.time() - loaded_at > INGREDIENT_STATS_TTL and _REFRESH_LOCK.acquire(blocking=False):
+        try:
+            threading.Thread(target=_refresh_in_background, name='ingredient-stats-refresh', daemon=True).start()
+        except RuntimeError as e:
+            _REFRESH_LOCK.release()
+            logging.error(f"ingredient_stats refresh could not be started: {e}")
+    return _STATS['available']
+
+
+def get_name_count(cursor, name):
+    """材料名の行数 (統計が使えない場合は None)"""
+    if not _ensure_loaded(cursor):
+        return None
+    return _STATS['names'].get(name, 0)
+
+
+def get_group_count(cursor, synonyms):
+    """
+    同義語グループの行数の見積もり (統計が使えない場合は None)
+    グループに normalized_name が含まれていれば集計済みの値を、
+    なければ材料名ごとの行数の合計を返す
+    """
+    if not _ensure_loaded(cursor):
+        return None
+    groups = _STATS['groups']
+    for syn in synonyms:
+        if syn in groups:
+            return groups[syn]
+    names = _STATS['names']
+    return sum(names.get(syn, 0) for syn in synonyms)
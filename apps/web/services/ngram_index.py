@@ -0,0 +1,96 @@
+import re
+
+# --- 部分一致 (LIKE '%kw%') 用の N-gram インデックス ---
+# 日本語の料理名・材料名は単語の区切りが無く、B-tree では '%kw%' を引けない。
+# 文字単位の 1-gram / 2-gram ごとに、その N-gram を含む文字列の位置の集合を持ち、
+# キーワードの 2-gram (1 文字なら 1-gram) の集合の共通部分を候補とする。
+# 候補は LIKE と同じ規則の正規表現で確認するため、結果は LIKE '%kw%' と一致する
+# (キーワード中の % / _ はワイルドカード、\ はエスケープ)。
+# 文字列は呼び出し側で比較用に変換 (大文字・小文字の統一など) したものを渡す。
+
+
+def _grams(text):
+    """text に含まれる 1-gram と 2-gram"""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def like_pattern(keyword):
+    """
+    LIKE '%keyword%' を (正規表現, ワイルドカードを含まない断片のリスト) にする
+    """
+    regex = []
+    fragments = ['']
+    chars = iter(keyword)
+    for ch in chars:
+        if ch == '\\':
+            ch = next(chars, '\\')
+        elif ch == '%':
+            regex.append('.*')
+            fragments.append('')
+            continue
+        elif ch == '_':
+            regex.append('.')
+            fragments.append('')
+            continue
+        regex.append(re.escape(ch))
+        fragments[-1] += ch
+    return re.compile(''.join(regex), re.DOTALL), [f for f in fragments if f]
+
+
+class NGramIndex:
+    """
+    文字列のリストに対する部分一致検索
+    位置 (strings のインデックス) の集合を返すので、並び順 (人気順など) は呼び出し側で決める
+    """
+
+    __slots__ = ('strings', 'postings')
+
+    def __init__(self, strings):
+        self.strings = tuple(strings)
+        postings = {}
+        for position, text in enumerate(self.strings):
+            for gram in _grams(text):
+                postings.setdefault(gram, []).append(position)
+        self.postings = {gram: frozenset(positions) for gram, positions in postings.items()}
+
+    def __len__(self):
+        return len(self.strings)
+
+    def _candidates(self, fragment):
+        if len(fragment) == 1:
+            return self.postings.get(fragment, frozenset())
+        lists = sorted((self.postings.get(fragment[i:i + 2], frozenset()) for i in range(len(fragment) - 1)),
+                       key=len)
+        candidates = set(lists[0])
+        for positions in lists[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(positions)
+        return candidates
+
+    def search(self, keyword):
+        """LIKE '%keyword%' に一致する文字列の位置の集合"""
+        regex, fragments = like_pattern(keyword)
+        if not fragments:
+            # ワイルドカードだけ: 長さの条件だけを確認する
+            return {p for p, text in enumerate(self.strings) if regex.search(text)}
+
+        candidates = None
+        for fragment in sorted(fragments, key=len, reverse=True):
+            positions = self._candidates(fragment)
+            candidates = set(positions) if candidates is None else candidates.intersection(positions)
+            if not candidates:
+                return set()
+        strings = self.strings
+        if len(fragments) == 1 and regex.pattern == re.escape(fragments[0]):
+            return {p for p in candidates if fragments[0] in strings[p]}
+        return {p for p in candidates if regex.search(strings[p])}
+
+    def contains(self, text):
+        """text を (ワイルドカードではなく文字どおりに) 含む文字列の位置の集合"""
+        strings = self.strings
+        if not text:
+            return set(range(len(strings)))
+        return {p for p in self._candidates(text) if text in strings[p]}
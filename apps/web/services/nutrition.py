@@ -1,6 +1,21 @@
 import os
+import sys
 import csv
+import math
+import time
+import struct
 import logging
+import bisect
+import threading
+import unicodedata
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # numpy は任意 (無い場合は Python のループで計算する)
+    np = None
+
+from services.ngram_index import NGramIndex
 
 # --- 主食（固定値）の設定 ---
 STAPLE_FOODS = [
@@ -50,37 +65,456 @@ STAPLE_FOODS = [
     }
 ]
 
-def load_nutrition_data(data_dir):
-    csv_path = os.path.join(data_dir, 'nutrition_ex.csv')
-    ingredients = []
-    
-    def safe_float(val):
-        if not val or val == '-' or val == '\\N':
-            return 0.0
-        try:
-            return float(val)
-        except ValueError:
-            return 0.0
-    
+# --- 食品成分表 (nutrition_ex.csv) のプロセス内キャッシュ ---
+# 栄養計算ページを開くたびに CSV を開いて全行を解析していたため、
+# 1 プロセスにつき 1 回だけ解析し、列ごとの配列 (NutritionTable) として保持する。
+# 使う前にファイルの (mtime, size) を確認し、変わっていれば読み直す。
+#   NUTRITION_SNAPSHOT : on (既定) / off
+#     on の場合、解析結果を CSV の隣 (nutrition_ex.csv.bin) に保存し、
+#     CSV が変わっていなければ次のワーカー起動時はそれを読む (CSV の解析を省く)
+# スナップショットの構成 (ネイティブのバイトオーダー):
+#   header : magic(8) | byteorder(1) | pad(7) | CSV の mtime_ns(i64) | CSV の size(u64) | 行数(u64) | 文字列の長さ(u64)
+#   values : f64 × 行数 × 6 (NUTRIENT_COLUMNS の順に列ごと)
+#   strings: id と name を '\0' で区切った UTF-8 (id × 行数, name × 行数 の順)
+NUTRITION_SNAPSHOT = os.environ.get('NUTRITION_SNAPSHOT', 'on') != 'off'
+
+NUTRIENT_COLUMNS = ('energy', 'protein', 'fat', 'carbs', 'fiber', 'salt')
+SNAPSHOT_MAGIC = b'NUTR1\x00\x00\x00'
+SNAPSHOT_HEADER = struct.Struct('=8sc7xqQQQ')
+
+
+def safe_float(val):
+    if not val or val == '-' or val == '\\N':
+        return 0.0
     try:
+        return float(val)
+    except ValueError:
+        return 0.0
+
+
+class NutritionTable:
+    """
+    食品成分表の列指向の表現
+        ids / names : 文字列の tuple
+        columns     : 栄養素名 -> array('d') (100g あたり)
+    """
+
+    __slots__ = ('ids', 'names', 'columns', 'signature', 'loaded_at', '_rows', '_index', '_calculator')
+
+    def __init__(self, ids, names, columns, signature):
+        self.ids = tuple(ids)
+        self.names = tuple(names)
+        self.columns = columns
+        self.signature = signature
+        self.loaded_at = time.time()
+        self._rows = None
+        self._index = None
+        self._calculator = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, i):
+        row = {'id': self.ids[i], 'name': self.names[i]}
+        for key in NUTRIENT_COLUMNS:
+            row[key] = self.columns[key][i]
+        return row
+
+    def rows(self):
+        """
+        表示用の dict のリスト (従来の load_nutrition_data の戻り値と同じ形)
+        最初に使われたときに作り、以後は同じリストを返す (呼び出し側で変更しないこと)
+        """
+        rows = self._rows
+        if rows is None:
+            rows = self._rows = [self.row(i) for i in range(len(self.ids))]
+        return rows
+
+    def index(self):
+        """検索用の NutritionIndex (最初に使われたときに作る)"""
+        index = self._index
+        if index is None:
+            index = self._index = NutritionIndex(self)
+        return index
+
+    def calculator(self):
+        """栄養計算用の NutritionCalculator (最初に使われたときに作る)"""
+        calculator = self._calculator
+        if calculator is None:
+            calculator = self._calculator = NutritionCalculator(self)
+        return calculator
+
+    @classmethod
+    def from_csv(cls, csv_path, signature):
+        ids, names = [], []
+        columns = {key: array('d') for key in NUTRIENT_COLUMNS}
+        energy, protein, fat, carbs, fiber, salt = (columns[key] for key in NUTRIENT_COLUMNS)
         with open(csv_path, 'r', encoding='utf-8') as f:
             reader = csv.reader(f)
             headers_jp = next(reader)
             headers_en = next(reader)
-            
+
             for row in reader:
-                if len(row) < 10: continue 
-                ingredients.append({
-                    'id': row[1],
-                    'name': row[3],
-                    'energy': safe_float(row[4]),
-                    'protein': safe_float(row[5]),
-                    'fat': safe_float(row[6]),
-                    'carbs': safe_float(row[7]),
-                    'fiber': safe_float(row[8]),
-                    'salt': abs(safe_float(row[9]))
-                })
-        return ingredients
+                if len(row) < 10: continue
+                ids.append(row[1])
+                names.append(row[3])
+                energy.append(safe_float(row[4]))
+                protein.append(safe_float(row[5]))
+                fat.append(safe_float(row[6]))
+                carbs.append(safe_float(row[7]))
+                fiber.append(safe_float(row[8]))
+                salt.append(abs(safe_float(row[9])))
+        return cls(ids, names, columns, signature)
+
+    def save(self, path):
+        """スナップショットを書き出す (一時ファイルに書いてから置き換える)"""
+        strings = '\0'.join(self.ids + self.names).encode('utf-8')
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, sys.byteorder[0].encode('ascii'),
+                                         self.signature[0], self.signature[1], len(self), len(strings)))
+            for key in NUTRIENT_COLUMNS:
+                self.columns[key].tofile(f)
+            f.write(strings)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, signature):
+        """
+        スナップショットを読む
+        CSV の (mtime, size) が保存時と異なる・形式が違う場合は None
+        """
+        with open(path, 'rb') as f:
+            header = f.read(SNAPSHOT_HEADER.size)
+            if len(header) != SNAPSHOT_HEADER.size:
+                return None
+            magic, byteorder, mtime_ns, size, n_rows, strings_size = SNAPSHOT_HEADER.unpack(header)
+            if (magic != SNAPSHOT_MAGIC or byteorder.decode('ascii') != sys.byteorder[0]
+                    or (mtime_ns, size) != signature):
+                return None
+            columns = {}
+            for key in NUTRIENT_COLUMNS:
+                values = array('d')
+                values.fromfile(f, n_rows)
+                columns[key] = values
+            strings = f.read(strings_size).decode('utf-8')
+        parts = strings.split('\0') if n_rows else []
+        if len(parts) != n_rows * 2:
+            return None
+        return cls(parts[:n_rows], parts[n_rows:], columns, signature)
+
+
+# --- 食品の検索・並び替え・ページ分割 (/api/nutrition/ingredients) ---
+# 栄養計算ページは全件 (約 2,500 行) を HTML に埋め込み、DataTables で絞り込んでいた。
+# 表ごとに比較用の名前 (fold_kana) の索引を持ち、検索・並び替え・ページ分割をサーバ側で行う。
+#   前方一致 : 比較用の名前を並べたリストを bisect で引く
+#   部分一致 : 比較用の名前の NGramIndex
+# 並び順は列ごとに初回に作って保持する (同じ値は CSV の順)。
+SEARCH_FIELDS = ('id', 'name') + NUTRIENT_COLUMNS
+SEARCH_MAX_LIMIT = 100
+
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+
+
+def fold_kana(text):
+    """比較用の文字列 (NFKC・小文字・カタカナをひらがなに)"""
+    return unicodedata.normalize('NFKC', text).lower().translate(_KATAKANA_TO_HIRAGANA)
+
+
+class NutritionIndex:
+    """NutritionTable の名前の索引と列ごとの並び順"""
+
+    __slots__ = ('table', 'folded', 'prefix_keys', 'ngram', '_orders')
+
+    def __init__(self, table):
+        self.table = table
+        self.folded = tuple(fold_kana(name) for name in table.names)
+        self.prefix_keys = sorted((name, i) for i, name in enumerate(self.folded))
+        self.ngram = NGramIndex(self.folded)
+        self._orders = {}
+
+    def match(self, query, mode='substring'):
+        """
+        query に一致する行の位置の集合 (query が空なら None = 全件)
+        mode: 'substring' (部分一致) / 'prefix' (前方一致)
+        """
+        q = fold_kana(query).strip()
+        if not q:
+            return None
+        if mode == 'prefix':
+            keys = self.prefix_keys
+            positions = set()
+            for i in range(bisect.bisect_left(keys, (q,)), len(keys)):
+                name, position = keys[i]
+                if not name.startswith(q):
+                    break
+                positions.add(position)
+            return positions
+        return self.ngram.contains(q)
+
+    def order(self, sort='id', descending=False):
+        """sort 列で並べた行の位置のリスト ('id' は CSV の順)"""
+        key = (sort, descending)
+        positions = self._orders.get(key)
+        if positions is None:
+            n = len(self.table)
+            if sort == 'id':
+                positions = list(range(n - 1, -1, -1) if descending else range(n))
+            else:
+                values = self.folded if sort == 'name' else self.table.columns[sort]
+                # reverse=True でも同じ値は元の順 (CSV の順) のまま
+                positions = sorted(range(n), key=values.__getitem__, reverse=descending)
+            self._orders[key] = positions
+        return positions
+
+
+def search_nutrition(table, query='', mode='substring', sort='id', descending=False,
+                     offset=0, limit=20, fields=None):
+    """
+    食品成分表の検索 (一致・並び替え・ページ分割)
+    fields: 返す項目 (SEARCH_FIELDS の部分集合, None なら全部)
+    Returns: (一致した件数, 該当ページの dict のリスト)
+    """
+    if sort not in SEARCH_FIELDS:
+        raise ValueError(f"unknown sort field: {sort}")
+    if mode not in ('substring', 'prefix'):
+        raise ValueError(f"unknown match mode: {mode}")
+    fields = tuple(fields) if fields else SEARCH_FIELDS
+    unknown = [f for f in fields if f not in SEARCH_FIELDS]
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    offset = max(0, offset)
+    limit = max(0, min(limit, SEARCH_MAX_LIMIT))
+
+    index = table.index()
+    matched = index.match(query, mode)
+    positions = index.order(sort, descending)
+    if matched is None:
+        total = len(positions)
+        page = positions[offset:offset + limit]
+    else:
+        total = len(matched)
+        page = []
+        if offset < total:
+            skipped = 0
+            for position in positions:
+                if position in matched:
+                    if skipped < offset:
+                        skipped += 1
+                        continue
+                    page.append(position)
+                    if len(page) >= limit:
+                        break
+
+    sources = {'id': table.ids, 'name': table.names}
+    sources.update(table.columns)
+    columns = [(f, sources[f]) for f in fields]
+    return total, [{f: values[i] for f, values in columns} for i in page]
+
+
+# --- 栄養計算のバッチ処理 (/api/nutrition/calculate) ---
+# 食品 (食品成分表の id, または STAPLE_FOODS の id) と量のリストを、1 回の呼び出しで
+# 多数まとめて計算する。食品成分表の値は 100g あたり、主食は 1 単位あたりなので、
+# 行ごとの係数 (0.01 / 1) を持ち、量 × 係数 × 行の値を合計する。
+# numpy がある場合は全レシピの全項目を 1 本の配列にし、
+#   値 = 行列[位置] × (量 × 係数)、合計 = レシピ番号ごとの np.bincount
+# で計算する。無い場合は同じ計算を Python のループで行う。
+#   NUTRITION_CALC_MAX_ITEMS : 1 リクエストあたりの項目数の上限 (既定 100000)
+NUTRITION_CALC_MAX_ITEMS = int(os.environ.get('NUTRITION_CALC_MAX_ITEMS', '100000'))
+
+
+class NutritionCalculator:
+    """食品成分表 + STAPLE_FOODS の値と、id から行への対応"""
+
+    __slots__ = ('positions', 'rows', 'scale', 'values')
+
+    def __init__(self, table, staples=STAPLE_FOODS):
+        n = len(table)
+        positions = {}
+        for i, food_id in enumerate(table.ids):
+            positions.setdefault(food_id, i)
+        for i, staple in enumerate(staples):
+            positions[staple['id']] = n + i
+        self.positions = positions
+        # 行ごとの (係数 × 値) を NUTRIENT_COLUMNS の順に
+        self.scale = [0.01] * n + [1.0] * len(staples)
+        self.rows = [tuple(table.columns[key][i] for key in NUTRIENT_COLUMNS) for i in range(n)]
+        self.rows += [tuple(float(staple[key]) for key in NUTRIENT_COLUMNS) for staple in staples]
+        self.values = np.array(self.rows, dtype=np.float64).reshape(-1, len(NUTRIENT_COLUMNS)) if np is not None else None
+
+    def evaluate(self, recipes, standards, use_numpy=True):
+        """
+        recipes  : (項目のリスト, 人数) のリスト。項目は (id, 量) で、量は食品成分表なら g、主食なら単位数
+        standards: 栄養素名 -> 基準値 (割合の分母)
+        Returns: (合計, 1人前, 基準値に対する割合[%], 見つからなかった id) をレシピごとに並べたリスト
+                 数値は NUTRIENT_COLUMNS の順のリスト
+        """
+        positions = self.positions
+        scale = self.scale
+        recipe_numbers, rows, weights = [], [], []
+        unknown = [[] for _ in recipes]
+        for number, (items, _) in enumerate(recipes):
+            for food_id, amount in items:
+                row = positions.get(food_id)
+                if row is None:
+                    unknown[number].append(food_id)
+                    continue
+                recipe_numbers.append(number)
+                rows.append(row)
+                weights.append(amount * scale[row])
+        servings = [serving for _, serving in recipes]
+        standard = [standards.get(key) or 0 for key in NUTRIENT_COLUMNS]
+
+        if use_numpy and self.values is not None:
+            totals, per_serving, ratios = self._evaluate_numpy(len(recipes), recipe_numbers, rows, weights,
+                                                               servings, standard)
+        else:
+            totals, per_serving, ratios = self._evaluate_python(len(recipes), recipe_numbers, rows, weights,
+                                                                servings, standard)
+        return list(zip(totals, per_serving, ratios, unknown))
+
+    def _evaluate_numpy(self, n_recipes, recipe_numbers, rows, weights, servings, standard):
+        recipe_numbers = np.asarray(recipe_numbers, dtype=np.int64)
+        contributions = self.values[np.asarray(rows, dtype=np.int64)] * np.asarray(weights, dtype=np.float64)[:, None]
+        totals = np.empty((n_recipes, len(NUTRIENT_COLUMNS)))
+        for c in range(len(NUTRIENT_COLUMNS)):
+            totals[:, c] = np.bincount(recipe_numbers, weights=contributions[:, c], minlength=n_recipes)
+        per_serving = totals / np.asarray(servings, dtype=np.float64)[:, None]
+        standard = np.asarray(standard, dtype=np.float64)
+        ratios = np.divide(per_serving * 100, standard, out=np.zeros_like(per_serving), where=standard > 0)
+        return (np.round(totals, 2).tolist(), np.round(per_serving, 2).tolist(), np.round(ratios, 1).tolist())
+
+    def _evaluate_python(self, n_recipes, recipe_numbers, rows, weights, servings, standard):
+        values = self.rows
+        width = len(NUTRIENT_COLUMNS)
+        totals = [[0.0] * width for _ in range(n_recipes)]
+        for number, row, weight in zip(recipe_numbers, rows, weights):
+            total = totals[number]
+            for c, value in enumerate(values[row]):
+                total[c] += value * weight
+        per_serving = [[value / serving for value in total] for total, serving in zip(totals, servings)]
+        ratios = [[value * 100 / std if std > 0 else 0.0 for value, std in zip(row, standard)] for row in per_serving]
+        return ([[round(v, 2) for v in row] for row in totals],
+                [[round(v, 2) for v in row] for row in per_serving],
+                [[round(v, 1) for v in row] for row in ratios])
+
+
+def parse_calculation_request(data):
+    """
+    /api/nutrition/calculate の JSON を NutritionCalculator.evaluate の引数の形にする
+    data: {"recipes": [{"items": [[id, 量], ...] または [{"id": id, "amount": 量}, ...], "servings": 人数}, ...]}
+    id は CSV の食品番号 ('01001' など) か STAPLE_FOODS の id の文字列
+    (数値の 1001 は '01001' と一致しないため、文字列以外は受け付けない)
+    形式が不正な場合は ValueError
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('recipes'), list):
+        raise ValueError("'recipes' must be a list")
+    recipes = []
+    n_items = 0
+    for number, recipe in enumerate(data['recipes']):
+        if not isinstance(recipe, dict) or not isinstance(recipe.get('items'), list):
+            raise ValueError(f"recipes[{number}]: 'items' must be a list")
+        servings = recipe.get('servings', 1)
+        if isinstance(servings, bool) or not isinstance(servings, (int, float)) or not 0 < servings < math.inf:
+            raise ValueError(f"recipes[{number}]: 'servings' must be a positive number")
+        items = []
+        for item in recipe['items']:
+            if isinstance(item, dict):
+                food_id, amount = item.get('id'), item.get('amount')
+            elif isinstance(item, list) and len(item) == 2:
+                food_id, amount = item
+            else:
+                raise ValueError(f"recipes[{number}]: items must be [id, amount] or {{id, amount}}")
+            if not isinstance(food_id, str):
+                raise ValueError(f"recipes[{number}]: id {food_id!r} must be a string (e.g. '01001')")
+            if isinstance(amount, bool) or not isinstance(amount, (int, float)) or not 0 <= amount < math.inf:
+                raise ValueError(f"recipes[{number}]: amount of {food_id!r} must be a non-negative number")
+            items.append((food_id, float(amount)))
+        n_items += len(items)
+        if n_items > NUTRITION_CALC_MAX_ITEMS:
+            raise ValueError(f"too many items (max {NUTRITION_CALC_MAX_ITEMS})")
+        recipes.append((items, float(servings)))
+    return recipes
+
+
+_TABLES = {}
+_LOCK = threading.Lock()
+_STATS = {
+    'hits': 0,
+    'reloads': 0,
+    'csv_parses': 0,
+    'snapshot_loads': 0,
+    'snapshot_writes': 0,
+    'errors': 0,
+}
+
+
+def _file_signature(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _load_table(csv_path, signature):
+    # called with _LOCK held
+    snapshot_path = csv_path + '.bin'
+    if NUTRITION_SNAPSHOT and os.path.exists(snapshot_path):
+        try:
+            table = NutritionTable.load(snapshot_path, signature)
+        except (OSError, EOFError, ValueError) as e:
+            logging.warning(f"Nutrition snapshot could not be read: {e}")
+            table = None
+        if table is not None:
+            _STATS['snapshot_loads'] += 1
+            return table
+
+    start = time.time()
+    table = NutritionTable.from_csv(csv_path, signature)
+    _STATS['csv_parses'] += 1
+    logging.info(f"Nutrition table parsed: {len(table)} rows ({time.time() - start:.3f}s)")
+    if NUTRITION_SNAPSHOT:
+        try:
+            table.save(snapshot_path)
+            _STATS['snapshot_writes'] += 1
+        except OSError as e:
+            logging.warning(f"Nutrition snapshot could not be saved: {e}")
+    return table
+
+
+def get_nutrition_table(data_dir):
+    """
+    data_dir/nutrition_ex.csv の NutritionTable を返す
+    CSV の (mtime, size) が前回と同じならキャッシュを返し、変わっていれば読み直す
+    """
+    csv_path = os.path.join(data_dir, 'nutrition_ex.csv')
+    signature = _file_signature(csv_path)
+    table = _TABLES.get(csv_path)
+    if table is not None and table.signature == signature:
+        _STATS['hits'] += 1
+        return table
+
+    with _LOCK:
+        table = _TABLES.get(csv_path)
+        if table is not None and table.signature == signature:
+            _STATS['hits'] += 1
+            return table
+        if table is not None:
+            _STATS['reloads'] += 1
+        table = _load_table(csv_path, signature)
+        _TABLES[csv_path] = table
+        return table
+
+
+def get_nutrition_cache_stats():
+    stats = dict(_STATS)
+    stats['tables'] = {path: {'rows': len(table), 'loaded_at': table.loaded_at} for path, table in _TABLES.items()}
+    return stats
+
+
+def load_nutrition_data(data_dir):
+    """食品成分表を dict のリストで返す (読み込みに失敗した場合は空のリスト)"""
+    try:
+        return get_nutrition_table(data_dir).rows()
     except Exception as e:
+        _STATS['errors'] += 1
         logging.error(f"Error reading csv: {e}")
         return []
@@ -0,0 +1,108 @@
+import os
+import re
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, TimeoutError as FutureTimeout
+import mysql.connector
+from core.database import get_pooled_connection
+from core.statements import query
+
+# --- 同義語ごとのクエリの並列実行 (scatter-gather) ---
+# 同義語が多い材料では、同義語ごとの範囲スキャンを 1 本のカーソルで順に実行すると
+# 往復時間の合計がそのままレイテンシになる。
+# SEARCH_PARALLELISM > 1 の場合は、スレッドプールからプール接続を使って同時に投げ、
+# 結果をクエリの順に返す。
+#   SEARCH_PARALLELISM      : 同時に実行するクエリ数の上限 (0/1 = 従来どおり直列)
+#   SEARCH_QUERY_TIMEOUT_MS : 1 クエリの制限時間 (MAX_EXECUTION_TIME ヒント)
+# 制限時間切れ (サーバーが MAX_EXECUTION_TIME で打ち切ったエラー)・プール枯渇などで失敗したクエリと、
+# 制限時間内にスレッドの空きが無く始まらなかったクエリは、呼び出し元のカーソルで直列に実行する
+# (結果が欠けることはなく、遅くなるだけ)。
+# 実行中のクエリは future.cancel() では止まらないため、同じクエリを直列で重ねて投げず、
+# サーバー側で打ち切られるのを待つ (DB が遅いときに負荷を倍にしない)。
+# 接続はリクエスト用と同じプール (core.pool) から借りるため、
+# DB_POOL_SIZE は SEARCH_PARALLELISM + 1 以上にしておく。
+SEARCH_PARALLELISM = int(os.environ.get('SEARCH_PARALLELISM', 0))
+SEARCH_QUERY_TIMEOUT_MS = int(os.environ.get('SEARCH_QUERY_TIMEOUT_MS', 2000))
+# 制限時間に加えて待つ秒数 (ネットワークの往復など)
+DEADLINE_GRACE_SECONDS = 1.0
+
+
+class ParallelQueryTimeout(mysql.connector.Error):
+    """サーバー側の制限時間を過ぎてもクエリが終わらなかった"""
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+_SELECT_RE = re.compile(r'^\s*SELECT\b', re.IGNORECASE)
+
+
+def parallel_enabled():
+    return SEARCH_PARALLELISM > 1
+
+
+def _get_executor():
+    """ワーカープロセスごとのスレッドプール (fork 後は作り直す)"""
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(max_workers=SEARCH_PARALLELISM,
+                                               thread_name_prefix='search-query')
+                _executor_pid = pid
+    return _executor
+
+
+def with_deadline(sql, timeout_ms):
+    """SELECT に MAX_EXECUTION_TIME ヒントを付ける (MySQL 5.7.8+)"""
+    return _SELECT_RE.sub(f"SELECT /*+ MAX_EXECUTION_TIME({int(timeout_ms)}) */", sql, count=1)
+
+
+def _run_on_pooled_connection(sql, params, timeout_ms):
+    # 空きが無ければ待たずに直列実行に回す
+    conn = get_pooled_connection(timeout=0)
+    try:
+        cursor = conn.cursor(dictionary=True)
+        rows = query(cursor, with_deadline(sql, timeout_ms), params)
+        cursor.close()
+        return rows
+    finally:
+        conn.close()
+
+
+def run_queries(cursor, queries, timeout_ms=None):
+    """
+    (sql, params) のリストを実行し、それぞれの fetchall() の結果をクエリの順に返す
+    並列実行が無効、またはクエリが 1 本だけの場合は cursor で直列に実行する
+    """
+    if not parallel_enabled() or len(queries) < 2:
+        return [query(cursor, sql, params) for sql, params in queries]
+
+    timeout_ms = timeout_ms or SEARCH_QUERY_TIMEOUT_MS
+    executor = _get_executor()
+    futures = [executor.submit(_run_on_pooled_connection, sql, params, timeout_ms)
+               for sql, params in queries]
+    # サーバー側の制限時間 + 余裕分だけ待つ
+    grace = timeout_ms / 1000 + DEADLINE_GRACE_SECONDS
+    wait(futures, timeout=grace)
+    # スレッドの空きが無く始まらなかったクエリは取り消す (実行中・完了済みのものは取り消せない)
+    cancelled = [future.cancel() for future in futures]
+
+    results = []
+    for (sql, params), future, was_cancelled in zip(queries, futures, cancelled):
+        rows = None
+        if was_cancelled:
+            logging.warning("Parallel search query did not start before the deadline, running serially")
+        else:
+            # 実行中ならサーバー側で打ち切られる (エラーになる) まで待つ
+            try:
+                rows = future.result(timeout=grace)
+            except FutureTimeout:
+                raise ParallelQueryTimeout("Parallel search query did not finish after the server-side deadline")
+            except (mysql.connector.Error, OSError) as err:
+                logging.warning(f"Parallel search query failed, retrying serially: {err}")
+        if rows is None:
+            rows = query(cursor, sql, params)
+        results.append(rows)
+    return results
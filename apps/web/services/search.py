@@ -1,18 +1,165 @@
+import os
+import time
+import heapq
 import random
+import logging
 import unicodedata
+from bisect import bisect_left
+from itertools import islice
+import mysql.connector
 from core.database import get_synonyms, unify_keywords
-from core.utils import build_recipes_dict, process_recipe_rows, COOKING_TIME_MAP
+from core.statements import query, query_tuples, in_list
+from core.utils import COOKING_TIME_MAP
+from core.records import Step, make_recipe, make_ingredient, make_precomputed_ingredient
+from services.ingredient_index import get_ingredient_index, current_index_version, refresh_ingredient_index
+from services.summary_store import get_summary_store
+from services.standard_snapshot import get_standard_snapshot
+from services.ingredient_nutrition import (
+    ingredient_nutrition_available, mark_ingredient_nutrition_unavailable, INGREDIENT_ROW_ORDER,
+)
+from services.bitmap import RoaringBitmap
+from services.ingredient_stats import get_group_count
+from services.cache import LRUCache
+from services.parallel_query import parallel_enabled, run_queries
+from core.synonyms import on_synonym_reload
+from services.search_token import encode_search_token, decode_search_token, InvalidSearchToken
+
+# OR / 単一材料検索のストリームで 2 ページ目以降に読む最大件数
+MERGE_MAX_PAGE_SIZE = 1000
+
+# --- 検索結果キャッシュ ---
+# キー: 正規化したクエリ・検索モード・(パーソナル検索は) 開始IDのバケット
+# 値  : 結果の ID リストと表示用の行
+# 転置インデックスが差し替わるとキーが変わり、同義語辞書の再読み込み時は全破棄する
+# キャッシュはワーカーごとにあるため、/api/cache/invalidate は search_cache_generation 表の
+# 世代 (全ワーカー共通) を 1 つ進める。各ワーカーは SEARCH_CACHE_CHECK_INTERVAL 秒ごとに世代を読み、
+# キーに含める (変わっていれば自分のキャッシュを破棄し、材料の転置インデックスも読み直す)。
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', 1024))
+RESULT_CACHE_TTL = int(os.environ.get('RESULT_CACHE_TTL', 600))
+# ランダム開始IDはこの幅のバケットの先頭に揃える (キャッシュが効くように)
+# 最初のページは MAX_RECIPE_ID / START_ID_BUCKET_SIZE 通り (既定値で 150 通り) しか無い。
+# 小さくすると表示のばらつきが増える代わりにキャッシュのヒット率が下がる (1 でバケットなし)
+START_ID_BUCKET_SIZE = max(1, int(os.environ.get('START_ID_BUCKET_SIZE', 10000)))
+MAX_RECIPE_ID = int(os.environ.get('MAX_RECIPE_ID', 1500000))
+SEARCH_CACHE_CHECK_INTERVAL = int(os.environ.get('SEARCH_CACHE_CHECK_INTERVAL', 10))
+
+CREATE_CACHE_GENERATION = """
+    CREATE TABLE IF NOT EXISTS search_cache_generation (
+        id TINYINT UNSIGNED NOT NULL PRIMARY KEY,
+        generation BIGINT UNSIGNED NOT NULL,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    ) DEFAULT CHARSET=utf8mb4
+"""
+
+_personal_result_cache = LRUCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+_standard_result_cache = LRUCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+# ランダム抽出用の一致集合 (圧縮ビットマップ)
+_match_set_cache = LRUCache(maxsize=256, ttl=RESULT_CACHE_TTL)
+# 一致件数がこれ以下ならシャッフル、超える場合は逐次抽出でランダムな順位を作る
+# (方式は件数だけで決まるため、同じ seed ならページをまたいでも同じ並びになる)
+SAMPLE_SHUFFLE_MAX = 2000
+
+
+def _canonical_query(search_query):
+    """空白の種類・語順・重複に依存しないクエリ表現"""
+    keywords = search_query.replace('　', ' ').split()
+    return ' '.join(sorted(set(keywords)))
+
+
+_generation = {'value': 0, 'checked_at': 0.0}
+
+
+def _read_cache_generation(cursor):
+    try:
+        rows = query_tuples(cursor, "SELECT generation FROM search_cache_generation WHERE id = %s", (1,))
+    except mysql.connector.Error as err:
+        # 一度も無効化していない (表が無い) 場合
+        logging.debug(f"search_cache_generation is not available: {err}")
+        return 0
+    return rows[0][0] if rows else 0
+
+
+def _cache_generation(cursor):
+    """全ワーカー共通のキャッシュの世代 (確認間隔の間は前回の値)"""
+    now = time.time()
+    if now - _generation['checked_at'] > SEARCH_CACHE_CHECK_INTERVAL:
+        _generation['checked_at'] = now
+        generation = _read_cache_generation(cursor)
+        if generation != _generation['value']:
+            _clear_search_caches()
+            _generation['value'] = generation
+            # 追加されたレシピを反映するため、材料の転置インデックスも読み直す
+            refresh_ingredient_index()
+    return _generation['value']
+
+
+def _data_version(cursor):
+    return (current_index_version(), _cache_generation(cursor))
+
+
+def random_start_id(rng=None):
+    """ランダムな検索開始ID (バケットの先頭)"""
+    bucket = (rng or random).randint(0, max(0, (MAX_RECIPE_ID - 1) // START_ID_BUCKET_SIZE))
+    return bucket * START_ID_BUCKET_SIZE + 1
+
+
+def _clear_search_caches():
+    _personal_result_cache.clear()
+    _standard_result_cache.clear()
+    _match_set_cache.clear()
+
+
+def invalidate_search_cache(conn=None):
+    """
+    検索結果キャッシュを破棄する (テーブル更新後など)
+    conn を渡すと共通の世代を進め、全ワーカーのキャッシュを破棄する
+    (このワーカーはすぐに、他のワーカーは SEARCH_CACHE_CHECK_INTERVAL 秒以内)。
+    conn が無い場合はこのワーカーのキャッシュだけを破棄する
+    Returns: 現在の世代
+    """
+    if conn is None:
+        _clear_search_caches()
+        return _generation['value']
+    cursor = conn.cursor()
+    cursor.execute(CREATE_CACHE_GENERATION)
+    cursor.execute("""
+        INSERT INTO search_cache_generation (id, generation) VALUES (1, 1)
+        ON DUPLICATE KEY UPDATE generation = generation + 1
+    """)
+    conn.commit()
+    cursor.execute("SELECT generation FROM search_cache_generation WHERE id = 1")
+    generation = cursor.fetchone()[0]
+    cursor.close()
+    _clear_search_caches()
+    _generation['value'] = generation
+    _generation['checked_at'] = time.time()
+    refresh_ingredient_index()
+    return generation
+
+
+@on_synonym_reload
+def _invalidate_on_synonym_reload(model):
+    # 同義語辞書はワーカーごとに読み直すので、このワーカーのキャッシュだけを破棄する
+    _clear_search_caches()
+
+
+def get_search_cache_stats():
+    return {
+        'personal': _personal_result_cache.stats(),
+        'standard': _standard_result_cache.stats(),
+        'match_set': _match_set_cache.stats(),
+    }
 
 def _parse_query(cursor, search_query):
     normalized_query = search_query.replace('　', ' ')
     keywords = normalized_query.split()
 
     if not keywords:
-        return []
+        return [], []
 
     # 1. Ingredient Search Setup
     raw_inclusions = [k for k in keywords if not k.startswith('-')]
-    # exclusions = [k[1:] for k in keywords if k.startswith('-') and len(k) > 1] 
+    raw_exclusions = [k[1:] for k in keywords if k.startswith('-') and len(k) > 1]
 
     # Unify inclusions
     unified_inclusions = unify_keywords(cursor, raw_inclusions)
@@ -23,203 +170,753 @@ def _parse_query(cursor, search_query):
         syns = get_synonyms(cursor, inc)
         inclusions.append(syns)
     
-    return inclusions
+    # Expand exclusions with synonyms (flattened: any of them excludes the recipe)
+    exclusions = []
+    for exc in raw_exclusions:
+        for syn in get_synonyms(cursor, exc):
+            if syn not in exclusions:
+                exclusions.append(syn)
+    
+    return inclusions, exclusions
+
+_SYNONYM_RANGE_SQL = """
+        SELECT recipe_id
+        FROM ingredients
+        WHERE name = %s
+        AND recipe_id >= %s
+        ORDER BY recipe_id ASC
+        LIMIT %s
+    """
+
+
+def _iter_synonym_ids(cursor, index, syn, start_id, first_page, prefetched=None):
+    """
+    1つの同義語の recipe_id を start_id 以上から昇順に返すストリーム
+    インデックスがあれば posting list を、なければ SQL のレンジスキャンをページ単位で読む
+    prefetched: 並列実行で取得済みの 1 ページ目 (recipe_id のリスト)
+    """
+    if index is not None:
+        plist = index.get(syn)
+        if plist:
+            yield from islice(plist, bisect_left(plist, start_id), None)
+        return
+
+    # Use covering index (name, recipe_id)
+    # This is an instant Range Scan.
+    current_start_id = start_id
+    page_size = first_page
+    while True:
+        if prefetched is not None:
+            ids, prefetched = prefetched, None
+        else:
+            ids = [row['recipe_id'] for row in query(cursor, _SYNONYM_RANGE_SQL, (syn, current_start_id, page_size))]
+        yield from ids
+        if len(ids) < page_size:
+            return
+        current_start_id = ids[-1] + 1
+        # Later pages are only needed for rare synonyms / heavy exclusions
+        page_size = min(MERGE_MAX_PAGE_SIZE, page_size * 2)
+
+
+def _merge_synonym_streams(cursor, index, synonyms, exclusions, start_id, limit, end_id=None):
+    """
+    同義語ごとの昇順ストリームをヒープで k-way マージし、
+    重複と除外対象を取り除きながら limit 件に達した時点で打ち切る
+    Returns: (found_ids, resume_id)  resume_id は続きの開始ID (最後まで読んだ場合は None)
+    """
+    first_pages = [None] * len(synonyms)
+    if index is None and parallel_enabled():
+        # heapq.merge reads the head of every stream first: fetch those pages concurrently
+        results = run_queries(cursor, [(_SYNONYM_RANGE_SQL, (syn, start_id, limit)) for syn in synonyms])
+        first_pages = [[row['recipe_id'] for row in rows] for rows in results]
+    streams = [_iter_synonym_ids(cursor, index, syn, start_id, limit, prefetched)
+               for syn, prefetched in zip(synonyms, first_pages)]
+    merged = heapq.merge(*streams)
+
+    excluded_bitmap = index.group_bitmap(exclusions) if (index is not None and exclusions) else None
+
+    found_ids = []
+    last_id = None
+    pending = []
+    # SQL の除外確認は limit 件から始め、一致が足りない間は倍にする
+    # (残り件数に合わせると、埋まりかけたところで 1 件ごとの往復になる)
+    batch_size = limit
+    for rid in merged:
+        if rid == last_id:
+            continue
+        if end_id is not None and rid >= end_id:
+            break
+        last_id = rid
+        if excluded_bitmap is not None:
+            if rid not in excluded_bitmap:
+                found_ids.append(rid)
+        elif exclusions:
+            # SQL path: anti-join in batches
+            pending.append(rid)
+            if len(pending) >= batch_size:
+                found_ids.extend(_drop_excluded(cursor, pending, exclusions))
+                pending = []
+                batch_size = max(limit, min(MERGE_MAX_PAGE_SIZE, batch_size * 2))
+        else:
+            found_ids.append(rid)
+        if len(found_ids) >= limit:
+            # バッチで limit を超えた分は次のページで読み直す
+            return found_ids[:limit], found_ids[limit - 1] + 1
+
+    if pending:
+        found_ids.extend(_drop_excluded(cursor, pending, exclusions))
+        if len(found_ids) > limit:
+            return found_ids[:limit], found_ids[limit - 1] + 1
+    return found_ids, None
 
-def search_recipes(cursor, search_query, start_id=1, limit=10):
+
+def _drop_excluded(cursor, candidate_ids, exclusions):
+    placeholders_ids, ids_params = in_list(candidate_ids)
+    placeholders_names, names_params = in_list(exclusions)
+    sql = f"""
+        SELECT DISTINCT recipe_id 
+        FROM ingredients 
+        WHERE name IN ({placeholders_names}) 
+        AND recipe_id IN ({placeholders_ids})
+    """
+    excluded = {row['recipe_id'] for row in query(cursor, sql, names_params + ids_params)}
+    return [rid for rid in candidate_ids if rid not in excluded]
+
+
+def search_recipes(cursor, search_query, start_id=1, limit=10, search_mode='and'):
     """
     一般レシピの検索処理 (Ingredient Search with Cursor Pagination)
-    Returns: list of dicts (id, title, description, published_at), total_hit_check (bool)
+    search_mode: 'and' (すべての材料を含む) / 'or' (いずれかの材料を含む)
+    Returns: list of dicts (id, title, description, published_at)
+    """
+    candidate_recipes, resume_id = _find_recipes(cursor, search_query, start_id, limit, search_mode)
+    return candidate_recipes
+
+
+def _find_recipes(cursor, search_query, start_id, limit, search_mode, end_id=None):
+    """
+    start_id 以上 (end_id 未満) の一致レシピを最大 limit 件取得する
+    Returns: (rows, resume_id)
+    """
+    # Only bucket-aligned, unbounded scans (see random_start_id) are cached
+    cache_key = None
+    if end_id is None and (start_id - 1) % START_ID_BUCKET_SIZE == 0:
+        cache_key = (_canonical_query(search_query), search_mode,
+                     (start_id - 1) // START_ID_BUCKET_SIZE, limit, _data_version(cursor))
+        cached = _personal_result_cache.get(cache_key)
+        if cached is not None:
+            found_ids, rows, resume_id = cached
+            return list(rows), resume_id
+
+    found_ids, resume_id = _find_recipe_ids(cursor, search_query, start_id, limit, search_mode, end_id)
+    candidate_recipes = _fetch_recipe_summaries(cursor, found_ids)
+
+    if cache_key is not None:
+        _personal_result_cache.set(cache_key, (tuple(found_ids), tuple(candidate_recipes), resume_id))
+    return candidate_recipes, resume_id
+
+
+def _find_recipe_ids(cursor, search_query, start_id, limit, search_mode, end_id=None):
+    """
+    Returns: (found_ids, resume_id)
+    resume_id は次に検索を再開する ID (end_id または末尾まで調べ終えた場合は None)
     """
     # Use helper
-    inclusions = _parse_query(cursor, search_query)
+    inclusions, exclusions = _parse_query(cursor, search_query)
     
-    candidate_recipes = []
+    # In-process inverted index (None when disabled -> SQL fallback)
+    index = get_ingredient_index()
     
-    if inclusions:
-        # Build Query with Cursor (recipe_id >= start_id)
-        
-        # Deferred Join Optimization:
-        # 1. Fetch recipe_ids from ingredients table (using covering index)
-        # 2. Fetch recipe details for those IDs
+    if not inclusions:
+        return [], None
+
+    # Build Query with Cursor (recipe_id >= start_id)
+    
+    # Deferred Join Optimization:
+    # 1. Fetch recipe_ids from ingredients table (using covering index)
+    # 2. Fetch recipe details for those IDs
+    
+    if search_mode == 'or' or len(inclusions) == 1:
+        # OR search / Single Ingredient Group
+        # Every synonym of every keyword is an ascending recipe_id stream.
+        # IN (...) prevents using index for sorting, so merge the streams
+        # incrementally (k-way heap merge) and stop at `limit` distinct ids.
+        all_synonyms_flat = list(dict.fromkeys(syn for group in inclusions for syn in group))
+        return _merge_synonym_streams(cursor, index, all_synonyms_flat, exclusions, start_id, limit, end_id)
         
+    if index is not None:
+        # Compressed Bitmap Engine:
+        # Union synonyms per group, then intersect all groups (smallest first).
+        # Exact match set, no scan cap.
+        match_bitmap = RoaringBitmap.intersect_all(index.group_bitmap(group) for group in inclusions)
+        if exclusions and match_bitmap:
+            # Anti-join: remove recipes containing any excluded synonym
+            match_bitmap = match_bitmap - index.group_bitmap(exclusions)
         found_ids = []
+        for rid in match_bitmap.iter_from(start_id):
+            if end_id is not None and rid >= end_id:
+                break
+            found_ids.append(rid)
+            if len(found_ids) >= limit:
+                return found_ids, rid + 1
+        return found_ids, None
         
-        if len(inclusions) == 1:
-            # Single Ingredient Group
-            all_synonyms_flat = inclusions[0]
-            
-            # Scatter-Gather Optimization:
-            # IN (...) prevents using index for sorting.
-            # Run separate query for each synonym and merge.
-            
-            gathered_ids = []
-            
-            for syn in all_synonyms_flat:
-                # Use covering index (name, recipe_id)
-                # This is an instant Range Scan.
-                sql = """
-                    SELECT recipe_id
-                    FROM ingredients
-                    WHERE name = %s
-                    AND recipe_id >= %s
-                    ORDER BY recipe_id ASC
-                    LIMIT %s
-                """
-                # Fetch limit*2 to be safe for deduplication later, though usually 10 is enough per synonym.
-                cursor.execute(sql, (syn, start_id, limit))
-                gathered_ids.extend([row['recipe_id'] for row in cursor.fetchall()])
-            
-            # Sort and Deduplicate
-            gathered_ids.sort()
-            found_ids = list(dict.fromkeys(gathered_ids))[:limit]
-            
+    # Unified Paged Strategy (Paged Driver + Vectorized Verification)
+    
+    # 1. Rarest First Selection
+    # Precomputed ingredient_stats first (O(1) per group), COUNT(*) only as fallback.
+    sorted_inclusions = []
+    for group in inclusions:
+        total_est = get_group_count(cursor, group)
+        if total_est is None:
+            total_est = 0
+            for syn in group:
+                for row in query(cursor, "SELECT count(*) as cnt FROM ingredients WHERE name = %s", (syn,)):
+                    total_est += row['cnt']
+        sorted_inclusions.append({'group': group, 'count': total_est})
+    
+    sorted_inclusions.sort(key=lambda x: x['count'])
+    
+    driver_synonyms = sorted_inclusions[0]['group']
+    other_groups = [item['group'] for item in sorted_inclusions[1:]]
+    
+    # Helper: Verify batch
+    def verify_query(candidate_ids, group_synonyms):
+        # IN lists are padded to power-of-two sizes so the statement can be reused
+        placeholders_ids, ids_params = in_list(candidate_ids)
+        placeholders_names, names_params = in_list(group_synonyms)
+        sql = f"""
+            SELECT DISTINCT recipe_id 
+            FROM ingredients 
+            WHERE name IN ({placeholders_names}) 
+            AND recipe_id IN ({placeholders_ids})
+        """
+        return sql, names_params + ids_params
+
+    def verify_batch(candidate_ids, group_synonyms):
+        if not candidate_ids:
+            return set()
+        sql, params = verify_query(candidate_ids, group_synonyms)
+        return {row['recipe_id'] for row in query(cursor, sql, params)}
+
+    parallel = parallel_enabled()
+
+    found_ids = []
+    current_start_id = start_id
+    max_scan_candidates = 10000 
+    scanned_count = 0
+    FETCH_BATCH_SIZE = 1000
+    exhausted = False
+    
+    while len(found_ids) < limit and scanned_count < max_scan_candidates:
+        candidates = []
+        driver_queries = [(_SYNONYM_RANGE_SQL, (syn, current_start_id, FETCH_BATCH_SIZE))
+                          for syn in driver_synonyms]
+        for rows in run_queries(cursor, driver_queries):
+            candidates.extend([row['recipe_id'] for row in rows])
+        
+        candidates = sorted(list(set(candidates)))
+        candidates = candidates[:FETCH_BATCH_SIZE] # Ensure we adhere to batch size logic
+        
+        reached_end = False
+        if end_id is not None and candidates and candidates[-1] >= end_id:
+            candidates = [c for c in candidates if c < end_id]
+            reached_end = True
+        
+        if not candidates:
+            exhausted = True
+            break
+        
+        last_candidate_id = candidates[-1]
+        scanned_count += len(candidates)
+        
+        current_matches = set(candidates)
+        if parallel:
+            # Scatter: verify every group (and the exclusions) against the same
+            # candidates at once, then gather by intersection / difference.
+            verify_groups = other_groups + ([exclusions] if exclusions else [])
+            results = run_queries(cursor, [verify_query(candidates, grp) for grp in verify_groups])
+            for grp, rows in zip(verify_groups, results):
+                matched = {row['recipe_id'] for row in rows}
+                if grp is exclusions:
+                    current_matches -= matched
+                else:
+                    current_matches &= matched
         else:
-            # Unified Paged Strategy (Paged Driver + Vectorized Verification)
-            
-            # 1. Rarest First Selection
-            sorted_inclusions = []
-            for group in inclusions:
-                total_est = 0
-                for syn in group:
-                    cursor.execute("SELECT count(*) as cnt FROM ingredients WHERE name = %s", (syn,))
-                    row = cursor.fetchone()
-                    if row:
-                        total_est += row['cnt']
-                sorted_inclusions.append({'group': group, 'count': total_est})
-            
-            sorted_inclusions.sort(key=lambda x: x['count'])
-            
-            driver_synonyms = sorted_inclusions[0]['group']
-            other_groups = [item['group'] for item in sorted_inclusions[1:]]
-            
-            # Helper: Verify batch
-            def verify_batch(candidate_ids, group_synonyms):
-                if not candidate_ids:
-                    return set()
-                placeholders_ids = ', '.join(['%s'] * len(candidate_ids))
-                placeholders_names = ', '.join(['%s'] * len(group_synonyms))
-                sql = f"""
-                    SELECT DISTINCT recipe_id 
-                    FROM ingredients 
-                    WHERE name IN ({placeholders_names}) 
-                    AND recipe_id IN ({placeholders_ids})
-                """
-                params = group_synonyms + candidate_ids
-                cursor.execute(sql, params)
-                return {row['recipe_id'] for row in cursor.fetchall()}
-
-            found_ids = []
-            current_start_id = start_id
-            max_scan_candidates = 10000 
-            scanned_count = 0
-            FETCH_BATCH_SIZE = 1000
-            
-            while len(found_ids) < limit and scanned_count < max_scan_candidates:
-                candidates = []
-                for syn in driver_synonyms:
-                    sql = """
-                        SELECT recipe_id
-                        FROM ingredients
-                        WHERE name = %s
-                        AND recipe_id >= %s
-                        ORDER BY recipe_id ASC
-                        LIMIT %s
-                    """
-                    cursor.execute(sql, (syn, current_start_id, FETCH_BATCH_SIZE))
-                    candidates.extend([row['recipe_id'] for row in cursor.fetchall()])
-                
-                if not candidates:
+            for grp in other_groups:
+                if not current_matches:
                     break
-                    
-                candidates = sorted(list(set(candidates)))
-                candidates = candidates[:FETCH_BATCH_SIZE] # Ensure we adhere to batch size logic
-                
-                last_candidate_id = candidates[-1]
-                scanned_count += len(candidates)
-                
-                current_matches = set(candidates)
-                for grp in other_groups:
-                    if not current_matches:
-                        break
-                    current_matches &= verify_batch(list(current_matches), grp)
+                current_matches &= verify_batch(list(current_matches), grp)
+
+            # Anti-join against excluded synonyms
+            if exclusions and current_matches:
+                current_matches -= verify_batch(list(current_matches), exclusions)
+        
+        for mid in sorted(list(current_matches)):
+            if mid not in found_ids:
+                found_ids.append(mid)
+            if len(found_ids) >= limit:
+                break
                 
-                for mid in sorted(list(current_matches)):
-                    if mid not in found_ids:
-                        found_ids.append(mid)
-                    if len(found_ids) >= limit:
-                        break
-                        
-                current_start_id = last_candidate_id + 1
-            
-        if not found_ids:
-            return []
-            
-        placeholders_ids = ', '.join(['%s'] * len(found_ids))
-        sql_details = f"""
-            SELECT id, title, description, published_at 
-            FROM recipes 
-            WHERE id IN ({placeholders_ids})
-            ORDER BY FIELD(id, {placeholders_ids})
-        """
-        cursor.execute(sql_details, found_ids + found_ids) 
-        candidate_recipes = cursor.fetchall()
+        current_start_id = last_candidate_id + 1
+        if reached_end:
+            exhausted = True
+            break
+    
+    if len(found_ids) >= limit:
+        return found_ids, found_ids[-1] + 1
+    if exhausted:
+        return found_ids, None
+    # Scan cap reached: resume after the last scanned candidate
+    return found_ids, current_start_id
 
-    return candidate_recipes
 
+def _fetch_recipe_summaries(cursor, found_ids):
+    """ID の順序を保ったまま一覧表示用の行 (id, title, description, published_at) を取得する"""
+    if not found_ids:
+        return []
 
-def get_recipe_details(cursor, recipe_id):
+    # サマリーストア (mmap) があれば SQL を使わずに返す
+    store = get_summary_store()
+    if store is not None:
+        rows, missing = store.get_many(found_ids)
+        if not missing:
+            return rows
+        # スナップショット作成後に追加されたレシピだけ SQL で補う
+        fetched = {row['id']: row for row in _query_recipe_summaries(cursor, missing)}
+        by_id = {row['id']: row for row in rows}
+        by_id.update(fetched)
+        return [by_id[rid] for rid in found_ids if rid in by_id]
+
+    return _query_recipe_summaries(cursor, found_ids)
+
+
+def _query_recipe_summaries(cursor, found_ids):
+    placeholders_ids, ids_params = in_list(found_ids)
+    sql_details = f"""
+        SELECT id, title, description, published_at 
+        FROM recipes 
+        WHERE id IN ({placeholders_ids})
+        ORDER BY FIELD(id, {placeholders_ids})
     """
-    特定レシピの詳細情報を取得する
+    return query(cursor, sql_details, ids_params + ids_params)
+
+
+def _match_bitmap(cursor, index, search_query, search_mode):
     """
-    sql_get_details = """
-        SELECT
-            r.id, r.title, r.description,
-            r.cooking_time, r.serving_for, r.published_at, r.attribute,
-            i.id AS ingredient_id,
-            i.name AS ingredient_name, i.quantity,
-            s.position, s.memo AS step_memo,
-            
-            ist.normalized_name,
-            iu.normalized_quantity,
-            n.enerc_kcal, n.prot, n.fat, n.choavldf, n.fib, n.nacl_eq,
-
-            rni.serving_size,
-            rni.calories AS total_calories,
-            rni.protein AS total_protein,
-            rni.fat AS total_fat,
-            rni.carbohydrates AS total_carbohydrates,
-            rni.fiber AS total_fiber,
-            rni.salt AS total_salt
-        FROM recipes AS r
-        LEFT JOIN ingredients AS i ON r.id = i.recipe_id
-        LEFT JOIN steps AS s ON r.id = s.recipe_id
-        LEFT JOIN ingredient_structured AS ist ON i.id = ist.ingredient_id
-        LEFT JOIN ingredient_units AS iu ON i.id = iu.ingredient_id
-        LEFT JOIN nutritions AS n ON ist.normalized_name = n.name COLLATE utf8mb4_general_ci
-        LEFT JOIN recipe_nutrition_info AS rni ON r.id = rni.recipe_id
-        WHERE r.id = %s
-        ORDER BY i.id, s.position ASC;
+    クエリに一致するレシピ全体の集合 (インデックス使用時のみ)
+    同じクエリが続くことが多いため、インデックスごとに LRU キャッシュする
     """
-    
-    cursor.execute(sql_get_details, (recipe_id,))
-    rows = cursor.fetchall()
-    
-    if not rows:
+    cache_key = (_canonical_query(search_query), search_mode, _data_version(cursor))
+    match_bitmap = _match_set_cache.get(cache_key)
+    if match_bitmap is not None:
+        return match_bitmap
+
+    inclusions, exclusions = _parse_query(cursor, search_query)
+    if not inclusions:
+        match_bitmap = RoaringBitmap()
+    elif search_mode == 'or':
+        match_bitmap = RoaringBitmap.union_all(index.group_bitmap(group) for group in inclusions)
+    else:
+        match_bitmap = RoaringBitmap.intersect_all(index.group_bitmap(group) for group in inclusions)
+    if exclusions and match_bitmap:
+        match_bitmap = match_bitmap - index.group_bitmap(exclusions)
+
+    _match_set_cache.set(cache_key, match_bitmap)
+    return match_bitmap
+
+
+def _sample_ranks(n, seed, offset, k):
+    """
+    seed で決まる 0..n-1 のランダムな並びのうち offset 番目から k 個を返す
+    (offset を進めても前のページと重複しない)
+    """
+    rng = random.Random(seed)
+    if n <= SAMPLE_SHUFFLE_MAX:
+        order = list(range(n))
+        rng.shuffle(order)
+        return order[offset:offset + k]
+
+    # Large match sets: draw without replacement one by one (same sequence for the same seed)
+    drawn = []
+    seen = set()
+    end = min(n, offset + k)
+    while len(drawn) < end:
+        r = rng.randrange(n)
+        if r not in seen:
+            seen.add(r)
+            drawn.append(r)
+    return drawn[offset:end]
+
+
+def _sample_recipe_ids(cursor, search_query, k, search_mode, seed, offset=0):
+    """Returns: (sampled_ids, match_count)  インデックスが無い場合は None"""
+    index = get_ingredient_index()
+    if index is None:
         return None
 
-    recipes_dict = build_recipes_dict(rows)
-    recipes_list = process_recipe_rows(recipes_dict)
+    match_bitmap = _match_bitmap(cursor, index, search_query, search_mode)
+    n = len(match_bitmap)
+    if n == 0 or offset >= n:
+        return [], n
+
+    ranks = _sample_ranks(n, seed, offset, k)
+    return match_bitmap.select_many(ranks), n
+
+
+def sample_recipes(cursor, search_query, k=10, search_mode='and', seed=None):
+    """
+    一致するレシピ全体から k 件を一様ランダムに (重複なく) 選ぶ
+    一致集合の件数 n から順位を k 個抽出し、ビットマップの select で ID に変換する
+    seed を指定すると同じ結果を再現できる
+    インデックスが無い場合は None を返す (呼び出し側で従来の方法にフォールバック)
+    """
+    if seed is None:
+        seed = random.getrandbits(32)
+    sampled = _sample_recipe_ids(cursor, search_query, k, search_mode, seed)
+    if sampled is None:
+        return None
+    sampled_ids, match_count = sampled
+    return _fetch_recipe_summaries(cursor, sampled_ids)
+
+
+def search_recipes_page(cursor, search_query, limit=10, search_mode='and', token=None, seed=None):
+    """
+    パーソナル検索の 1 ページ分を取得する
+    token (前のページの next_token) を渡すと、その続きから検索を再開する
+    Returns: (recipes, next_token)  続きが無い場合 next_token は None
+
+    トークンの状態:
+        インデックス使用時 : ランダム抽出の seed と取得済み件数
+        SQL フォールバック : 次の開始ID (p)・最初の開始ID (o)・折り返し済みか (w)
+    """
+    query_key = _canonical_query(search_query)
+
+    if token:
+        state = decode_search_token(token)
+        if state.get('q') != query_key or state.get('m') != search_mode:
+            raise InvalidSearchToken("token does not match the query")
+    else:
+        rng = random.Random(seed) if seed is not None else random
+        if get_ingredient_index() is not None:
+            state = {'k': 'sample', 's': rng.getrandbits(32), 'n': 0}
+        else:
+            origin = random_start_id(rng)
+            state = {'k': 'scan', 'o': origin, 'p': origin, 'w': 0}
+        state['q'] = query_key
+        state['m'] = search_mode
+
+    if state.get('k') == 'sample':
+        sampled = _sample_recipe_ids(cursor, search_query, limit, search_mode, state['s'], state['n'])
+        if sampled is None:
+            return [], None
+        sampled_ids, match_count = sampled
+        recipes = _fetch_recipe_summaries(cursor, sampled_ids)
+        offset = state['n'] + len(sampled_ids)
+        if offset >= match_count:
+            return recipes, None
+        return recipes, encode_search_token(dict(state, n=offset))
+
+    origin, position, wrapped = state['o'], state['p'], bool(state['w'])
+    if not wrapped:
+        # Scan [position, end)
+        recipes, resume_id = _find_recipes(cursor, search_query, position, limit, search_mode)
+        if resume_id is None:
+            # Wrap-around: continue with [1, origin)
+            wrapped = True
+            resume_id = 1
+            needed = limit - len(recipes)
+            if needed > 0 and origin > 1:
+                more, resume_id = _find_recipes(cursor, search_query, 1, needed, search_mode, end_id=origin)
+                recipes.extend(more)
+            elif origin <= 1:
+                resume_id = None
+    else:
+        recipes, resume_id = _find_recipes(cursor, search_query, position, limit, search_mode, end_id=origin)
+
+    if resume_id is None:
+        return recipes, None
+    return recipes, encode_search_token(dict(state, p=resume_id, w=int(wrapped)))
+
+
+# --- レシピ詳細 ---
+# 材料 × 手順の JOIN は行数が掛け算で増える (材料 15 × 手順 10 = 150 行) ため、
+# ヘッダ (レシピ + 栄養合計)・材料 (+ 栄養成分)・手順の 3 つの結果に分けて取得する (転送行数は 1 + 材料数 + 手順数)。
+# 行はタプルで受け取り、core.records のレコード (Recipe / Ingredient / Step / Nutrition) に直接詰める。
+# 各 SQL の列の順番は下の関数での展開の順番と対応している。
+RECIPE_HEADER_SQL = """
+    SELECT
+        r.id, r.title, r.description,
+        r.cooking_time, r.serving_for, r.published_at, r.attribute,
+        rni.serving_size,
+        rni.calories AS total_calories,
+        rni.protein AS total_protein,
+        rni.fat AS total_fat,
+        rni.carbohydrates AS total_carbohydrates,
+        rni.fiber AS total_fiber,
+        rni.salt AS total_salt
+    FROM recipes AS r
+    LEFT JOIN recipe_nutrition_info AS rni ON r.id = rni.recipe_id
+    WHERE r.id IN ({placeholders})
+"""
+
+# 材料 + 栄養成分 (nutritions を JOIN して換算する従来の経路)
+# nutritions などの JOIN で 1 つの材料に複数行が返ることがあるため、材料ごとに
+# INGREDIENT_ROW_ORDER の最初の行だけを使う (ingredient_nutrition の事前計算と同じ行)
+RECIPE_INGREDIENTS_SQL = f"""
+    SELECT
+        i.recipe_id AS id,
+        i.id AS ingredient_id,
+        i.name AS ingredient_name, i.quantity,
+        ist.normalized_name,
+        iu.normalized_quantity,
+        n.enerc_kcal, n.prot, n.fat, n.choavldf, n.fib, n.nacl_eq
+    FROM ingredients AS i
+    LEFT JOIN ingredient_structured AS ist ON i.id = ist.ingredient_id
+    LEFT JOIN ingredient_units AS iu ON i.id = iu.ingredient_id
+    LEFT JOIN nutritions AS n ON ist.normalized_name = n.name COLLATE utf8mb4_general_ci
+    WHERE {{where}}
+    ORDER BY i.recipe_id, i.id, {INGREDIENT_ROW_ORDER}
+"""
+
+# 材料 + 事前計算済みの栄養値 (ingredient_nutrition, see services/ingredient_nutrition.py)
+RECIPE_INGREDIENTS_MATERIALIZED_SQL = """
+    SELECT
+        i.recipe_id AS id,
+        i.id AS ingredient_id,
+        i.name AS ingredient_name, i.quantity,
+        inu.ingredient_id AS materialized_id,
+        inu.normalized_name,
+        inu.quantity_g AS normalized_quantity,
+        inu.energy AS ing_energy,
+        inu.protein AS ing_protein,
+        inu.fat AS ing_fat,
+        inu.carbs AS ing_carbs
+    FROM ingredients AS i
+    LEFT JOIN ingredient_nutrition AS inu ON inu.ingredient_id = i.id
+    WHERE i.recipe_id IN ({placeholders})
+    ORDER BY i.recipe_id, i.id
+"""
+
+RECIPE_STEPS_SQL = """
+    SELECT recipe_id AS id, position, memo AS step_memo
+    FROM steps
+    WHERE recipe_id IN ({placeholders})
+    ORDER BY recipe_id, position ASC
+"""
+
+
+def _fetch_recipe_records(cursor, recipe_ids, with_ingredients=True, with_steps=True):
+    """ヘッダ → 材料 → 手順の順に取得して {recipe_id: Recipe} を返す"""
+    placeholders, ids_params = in_list(recipe_ids)
+    recipes = {}
+    for (recipe_id, title, description, cooking_time, serving_for, _published_at, _attribute,
+         serving_size, energy, protein, fat, carbs, fiber, salt) in query_tuples(
+            cursor, RECIPE_HEADER_SQL.format(placeholders=placeholders), ids_params):
+        recipes[recipe_id] = make_recipe(recipe_id, title, description, cooking_time, serving_for,
+                                         serving_size, energy, protein, fat, carbs, fiber, salt)
+    if not recipes:
+        return recipes
+
+    if with_ingredients:
+        _add_ingredients(cursor, recipes, placeholders, ids_params)
+
+    if with_steps:
+        last = None
+        for recipe_id, position, memo in query_tuples(
+                cursor, RECIPE_STEPS_SQL.format(placeholders=placeholders), ids_params):
+            # position 順に並んでいるので、同じ position の重複は隣り合う
+            if memo and position is not None and (recipe_id, position) != last:
+                recipes[recipe_id].steps.append(Step(memo))
+                last = (recipe_id, position)
+    return recipes
+
+
+def _legacy_ingredient(row):
+    # RECIPE_INGREDIENTS_SQL の 1 行
+    (_recipe_id, _ingredient_id, name, quantity, normalized_name, quantity_g,
+     enerc_kcal, prot, fat, choavldf, fib, _nacl_eq) = row
+    return make_ingredient(name, quantity, normalized_name, quantity_g, enerc_kcal, prot, fat, choavldf, fib)
+
+
+def _first_ingredient_rows(rows):
+    # RECIPE_INGREDIENTS_SQL の行から、材料ごとに最初の行だけを返す (同じ材料の行は隣り合う)
+    last = None
+    for row in rows:
+        if row[1] != last:
+            last = row[1]
+            yield row
+
+
+def _add_ingredients(cursor, recipes, placeholders, ids_params):
+    """
+    材料を recipe_id, ingredient_id 順に各レシピへ追加する
+    ingredient_nutrition があれば換算済みの値を読み、まだ計算されていない材料だけ従来の JOIN で補う
+    """
+    rows = None
+    if ingredient_nutrition_available(cursor):
+        try:
+            rows = query_tuples(cursor, RECIPE_INGREDIENTS_MATERIALIZED_SQL.format(placeholders=placeholders),
+                                ids_params)
+        except mysql.connector.Error as err:
+            # 確認した後に表が削除された場合など
+            mark_ingredient_nutrition_unavailable(err)
+
+    if rows is None:
+        where = f"i.recipe_id IN ({placeholders})"
+        rows = query_tuples(cursor, RECIPE_INGREDIENTS_SQL.format(where=where), ids_params)
+        for row in _first_ingredient_rows(rows):
+            recipes[row[0]].ingredients.append(_legacy_ingredient(row))
+        return
+
+    fallback = {}
+    missing_ids = [row[1] for row in rows if row[4] is None]
+    if missing_ids:
+        placeholders_missing, missing_params = in_list(missing_ids)
+        where = f"i.id IN ({placeholders_missing})"
+        rows_missing = query_tuples(cursor, RECIPE_INGREDIENTS_SQL.format(where=where), missing_params)
+        fallback = {row[1]: _legacy_ingredient(row) for row in _first_ingredient_rows(rows_missing)}
+
+    for (recipe_id, ingredient_id, name, quantity, materialized_id, normalized_name, quantity_g,
+         energy, protein, fat, carbs) in rows:
+        if materialized_id is not None:
+            ingredient = make_precomputed_ingredient(name, quantity, normalized_name, quantity_g,
+                                                     energy, protein, fat, carbs)
+        else:
+            ingredient = fallback.get(ingredient_id) or make_ingredient(
+                name, quantity, normalized_name, quantity_g, None, None, None, None, None)
+        recipes[recipe_id].ingredients.append(ingredient)
+
+
+def get_recipe_details_many(cursor, recipe_ids, with_ingredients=True, with_steps=True):
+    """
+    複数レシピの詳細情報を (件数によらず) 最大 3 クエリで取得する
+    with_ingredients / with_steps を False にすると、その部分は取得しない
+    (栄養の合計・1人分の値はヘッダだけで計算できる)
+    Returns: recipe_ids の順の Recipe のリスト (存在しない ID は含まない)
+    """
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    if not recipe_ids:
+        return []
+
+    recipes_by_id = _fetch_recipe_records(cursor, recipe_ids, with_ingredients, with_steps)
+    return [recipes_by_id[rid] for rid in recipe_ids if rid in recipes_by_id]
+
+
+def get_recipe_details(cursor, recipe_id):
+    """
+    特定レシピの詳細情報を取得する
+    """
+    recipes_list = get_recipe_details_many(cursor, [recipe_id])
     
     if recipes_list:
         return recipes_list[0]
     return None
 
 
+def attach_nutrition(cursor, recipes):
+    """
+    検索結果の各行に 1人分の栄養 (nutrition_per_serving / nutrition_ratios) を付けた新しいリストを返す
+    1 ページ分をまとめて 1 クエリで取得する (キャッシュ中の行は変更しない)
+    """
+    if not recipes:
+        return []
+    details = get_recipe_details_many(cursor, [r['id'] for r in recipes],
+                                      with_ingredients=False, with_steps=False)
+    details_by_id = {d['id']: d for d in details}
+    enriched = []
+    for recipe in recipes:
+        detail = details_by_id.get(recipe['id'])
+        if detail is None:
+            enriched.append(dict(recipe))
+            continue
+        enriched.append(dict(
+            recipe,
+            serving_size=detail.serving_size,
+            nutrition_per_serving=detail.nutrition_per_serving,
+            nutrition_ratios=detail.nutrition_ratios,
+        ))
+    return enriched
+
+
 
 def search_standard_recipes(cursor, search_query, search_mode='recipe'):
     """
     基礎レシピの検索処理 (Optimized)
     """
+    # スナップショット (STANDARD_SNAPSHOT=on) があれば DB を使わずに検索する
+    snapshot = get_standard_snapshot(cursor)
+    cache_key = (_canonical_query(search_query), search_mode, _data_version(cursor),
+                 snapshot.version if snapshot is not None else 0)
+    cached = _standard_result_cache.get(cache_key)
+    if cached is not None:
+        return list(cached)
+
+    if snapshot is not None:
+        final_recipes_list = _search_standard_snapshot(cursor, snapshot, search_query, search_mode)
+    else:
+        final_recipes_list = _search_standard_recipes(cursor, search_query, search_mode)
+
+    _standard_result_cache.set(cache_key, tuple(final_recipes_list))
+    return final_recipes_list
+
+
+def _search_standard_snapshot(cursor, snapshot, search_query, search_mode):
+    """_search_standard_recipes と同じ結果をスナップショットから返す"""
+    keywords = search_query.replace('　', ' ').split()
+    raw_inclusions = [k for k in keywords if not k.startswith('-')]
+    exclusions = [k[1:] for k in keywords if k.startswith('-') and len(k) > 1]
+
+    if search_mode != 'ingredient':
+        if not raw_inclusions and not exclusions:
+            return []
+        target_ids = snapshot.search_by_name(raw_inclusions, exclusions, limit=5)
+        return [snapshot.summary(recipe_id) for recipe_id in target_ids]
+
+    if not raw_inclusions:
+        return []
+
+    from core.database import get_normalized_names
+
+    normalized = get_normalized_names(cursor, raw_inclusions + exclusions)
+
+    def rows(keyword):
+        normalized_name = normalized.get(keyword)
+        if normalized_name:
+            return snapshot.ingredient_rows(normalized_name)
+        return snapshot.ingredient_rows_like(keyword)
+
+    target_ids = snapshot.top_by_ingredients([rows(keyword) for keyword in raw_inclusions],
+                                             [rows(keyword) for keyword in exclusions], limit=5)
+    return [snapshot.summary(recipe_id) for recipe_id in target_ids]
+
+
+def _standard_keyword_matches(cursor, keywords):
+    """
+    キーワードごとの {standard_recipe_id: count} を 1 クエリ (UNION ALL) で取得する
+    辞書にある材料は ingredient_name = normalized_name、無ければ ingredient_name LIKE '%keyword%'
+    """
+    from core.database import get_normalized_names
+
+    normalized = get_normalized_names(cursor, keywords)
+    branches = []
+    params = []
+    for i, keyword in enumerate(keywords):
+        normalized_name = normalized.get(keyword)
+        if normalized_name:
+            branches.append(f"SELECT {i} AS k, standard_recipe_id, count FROM standard_recipe_ingredients WHERE ingredient_name = %s")
+            params.append(normalized_name)
+        else:
+            branches.append(f"SELECT {i} AS k, standard_recipe_id, count FROM standard_recipe_ingredients WHERE ingredient_name LIKE %s")
+            params.append(f"%{keyword}%")
+
+    matches = [{} for _ in keywords]
+    for row in query(cursor, ' UNION ALL '.join(branches), params):
+        matches[row['k']][row['standard_recipe_id']] = row['count']
+    return matches
+
+
+def _search_standard_recipes(cursor, search_query, search_mode):
     normalized_query = search_query.replace('　', ' ')
     keywords = normalized_query.split()
 
@@ -242,22 +939,14 @@ def search_standard_recipes(cursor, search_query, search_mode='recipe'):
         # 3. Sum counts for score.
         # 4. Sort and take top 5 IDs.
         
-        from core.database import get_normalized_name
-        
         # List of {recipe_id: count} dicts for each keyword
+        # (正規化と一致行の取得は、除外キーワードの分もまとめて最大 2 クエリ)
         keyword_matches = []
         
         if raw_inclusions:
-            for keyword in raw_inclusions:
-                normalized_name = get_normalized_name(cursor, keyword)
-                if normalized_name:
-                    cursor.execute("SELECT standard_recipe_id, count FROM standard_recipe_ingredients WHERE ingredient_name = %s", (normalized_name,))
-                else:
-                    cursor.execute("SELECT standard_recipe_id, count FROM standard_recipe_ingredients WHERE ingredient_name LIKE %s", (f"%{keyword}%",))
-                
-                # Store as map: {id: count}
-                matches = {row['standard_recipe_id']: row['count'] for row in cursor.fetchall()}
-                keyword_matches.append(matches)
+            all_matches = _standard_keyword_matches(cursor, raw_inclusions + exclusions)
+            keyword_matches = all_matches[:len(raw_inclusions)]
+            exclusion_matches = all_matches[len(raw_inclusions):]
             
             if not keyword_matches:
                 return []
@@ -285,14 +974,8 @@ def search_standard_recipes(cursor, search_query, search_mode='recipe'):
             # Exclusion Logic
             if exclusions:
                 excluded_ids = set()
-                for keyword in exclusions:
-                    normalized_name = get_normalized_name(cursor, keyword)
-                    if normalized_name:
-                            cursor.execute("SELECT DISTINCT standard_recipe_id FROM standard_recipe_ingredients WHERE ingredient_name = %s", (normalized_name,))
-                    else:
-                            cursor.execute("SELECT DISTINCT standard_recipe_id FROM standard_recipe_ingredients WHERE ingredient_name LIKE %s", (f"%{keyword}%",))
-                    for row in cursor.fetchall():
-                        excluded_ids.add(row['standard_recipe_id'])
+                for matches in exclusion_matches:
+                    excluded_ids.update(matches)
                 
                 scored_recipes = [r for r in scored_recipes if r['id'] not in excluded_ids]
 
@@ -407,6 +1090,10 @@ def get_standard_recipe_details(cursor, recipe_id):
     """
     基準レシピの詳細情報を取得する
     """
+    snapshot = get_standard_snapshot(cursor)
+    if snapshot is not None:
+        return snapshot.detail(recipe_id)
+
     # 1. Recipe Basic Info
     cursor.execute("SELECT * FROM standard_recipes WHERE id = %s", (recipe_id,))
     recipe = cursor.fetchone()
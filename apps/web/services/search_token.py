@@ -0,0 +1,116 @@
+import os
+import hmac
+import json
+import base64
+import hashlib
+import logging
+import secrets
+
+# --- 検索の続き (次ページ) を表すトークン ---
+# 状態を JSON にして base64url で符号化し、HMAC-SHA256 で署名する。
+# gunicorn の各ワーカーで同じ鍵を使う必要があるため、SEARCH_TOKEN_SECRET を設定する。
+# 未設定 (または .env.example のままの change_me) の場合は、ランダムな鍵を
+# SEARCH_TOKEN_SECRET_PATH に 1 度だけ作り、全ワーカーでそれを読む (警告を出す)。
+SEARCH_TOKEN_SECRET_PATH = os.environ.get(
+    'SEARCH_TOKEN_SECRET_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'search_token.key')
+)
+PLACEHOLDER_SECRETS = ('', 'change_me')
+GENERATED_KEY_BYTES = 32
+
+
+def _read_key(path):
+    try:
+        with open(path, 'rb') as f:
+            key = f.read()
+    except FileNotFoundError:
+        return None
+    return key if len(key) >= GENERATED_KEY_BYTES else None
+
+
+def _generated_key(path):
+    """
+    path の鍵を返す (無ければランダムな鍵を作る)
+    一時ファイルに書いてから os.link で置くため、同時に起動したワーカーも同じ鍵を読む
+    """
+    key = _read_key(path)
+    if key is not None:
+        return key
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(secrets.token_bytes(GENERATED_KEY_BYTES))
+        try:
+            os.link(tmp_path, path)
+            logging.warning(f"SEARCH_TOKEN_SECRET is not set; generated a random key at {path}")
+        except FileExistsError:
+            pass  # 他のワーカーが先に作った
+    finally:
+        os.unlink(tmp_path)
+    key = _read_key(path)
+    if key is None:
+        raise OSError(f"search token key is unreadable: {path}")
+    return key
+
+
+def load_search_token_key(secret=None, path=None):
+    """署名鍵 (DB の接続情報などからは導出しない)"""
+    secret = os.environ.get('SEARCH_TOKEN_SECRET', '') if secret is None else secret
+    if secret not in PLACEHOLDER_SECRETS:
+        return secret.encode('utf-8')
+    path = path or SEARCH_TOKEN_SECRET_PATH
+    try:
+        return _generated_key(path)
+    except OSError as e:
+        # 鍵を共有できないので、トークンはこのワーカーでしか検証できない
+        logging.error(f"SEARCH_TOKEN_SECRET is not set and {path} could not be used ({e}); "
+                      f"tokens are only valid in this worker")
+        return secrets.token_bytes(GENERATED_KEY_BYTES)
+
+
+SEARCH_TOKEN_KEY = load_search_token_key()
+
+SIGNATURE_BYTES = 16
+
+
+class InvalidSearchToken(ValueError):
+    """改ざん・破損したトークン"""
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _sign(payload):
+    return hmac.new(SEARCH_TOKEN_KEY, payload, hashlib.sha256).digest()[:SIGNATURE_BYTES]
+
+
+def encode_search_token(state):
+    payload = json.dumps(state, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return f"{_b64encode(payload)}.{_b64encode(_sign(payload))}"
+
+
+def decode_search_token(token):
+    try:
+        payload_text, signature_text = token.split('.', 1)
+        payload = _b64decode(payload_text)
+        signature = _b64decode(signature_text)
+    except (ValueError, AttributeError) as e:
+        raise InvalidSearchToken("malformed token") from e
+
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise InvalidSearchToken("bad signature")
+
+    try:
+        state = json.loads(payload.decode('utf-8'))
+    except ValueError as e:
+        raise InvalidSearchToken("malformed payload") from e
+    if not isinstance(state, dict):
+        raise InvalidSearchToken("malformed payload")
+    return state
@@ -0,0 +1,287 @@
+import os
+import time
+import logging
+import threading
+import heapq
+import mysql.connector
+from core.statements import query
+from core.synonyms import fold_name
+from services.ngram_index import NGramIndex
+from services import count_matrix
+
+# --- 基礎レシピのインメモリスナップショット ---
+# standard_recipes / standard_recipe_ingredients / standard_recipe_steps は小さく読み取り専用のため、
+# 全件をプロセス内に読み込み、基礎レシピの検索 (料理名・材料) と詳細ページを DB に問い合わせずに返す。
+#   料理名     : recipe_count 降順に並べた (id, 料理名) の配列と、料理名の N-gram インデックス
+#   材料       : 材料名 -> {standard_recipe_id: count} (疎なマップ) と、材料名の N-gram インデックス
+#   材料・手順 : レシピごとにグループ化・並び替え済みの構造を保持する
+# STANDARD_SNAPSHOT_CHECK_INTERVAL 秒ごとに 3 表の CHECKSUM を確認し、変化していれば新しい
+# スナップショットを作って参照を差し替える (読み込み中も古いスナップショットで応答する)。
+#   STANDARD_SNAPSHOT : off (既定, 従来どおり SQL) / on
+# MySQL の LIKE / = (utf8mb4_general_ci) に合わせ、名前は fold_name で揃えて比較する
+# (大文字・小文字と全角・半角を区別しない)。
+STANDARD_SNAPSHOT_MODE = os.environ.get('STANDARD_SNAPSHOT', 'off')
+STANDARD_SNAPSHOT_CHECK_INTERVAL = int(os.environ.get('STANDARD_SNAPSHOT_CHECK_INTERVAL', 300))
+
+STANDARD_TABLES = ('standard_recipes', 'standard_recipe_ingredients', 'standard_recipe_steps')
+
+
+def group_ingredients(rows):
+    """
+    (group_name, ingredient_name, count) の行 (count 降順) をテンプレート用の構造にする
+    { 'グループ名': {'all': [合計], '材料名': [count], ...} } (グループは合計の降順)
+    """
+    ingredients_data = {}
+    for group, name, count in rows:
+        group = group or 'その他'
+        if name == 'all':
+            continue
+        if group not in ingredients_data:
+            ingredients_data[group] = {'all': [0]}
+        if name not in ingredients_data[group]:
+            ingredients_data[group][name] = [0]
+        ingredients_data[group][name][0] = count
+        ingredients_data[group]['all'][0] += count
+    return dict(sorted(ingredients_data.items(), key=lambda item: item[1]['all'][0], reverse=True))
+
+
+class StandardSnapshot:
+    """
+    基礎レシピ 3 表の読み取り専用スナップショット
+        rows          : id -> standard_recipes の行
+        by_popularity : (id, 料理名 (fold_name 済み)) の tuple (recipe_count 降順, 同数は id 昇順)
+        name_index    : by_popularity の料理名の NGramIndex (位置 = 人気順の順位)
+        ingredients   : 材料名 (fold_name 済み) -> {id: count}
+        ingredient_names / ingredient_positions / ingredient_index :
+                        ingredients のキーの tuple・キー -> 位置・NGramIndex
+        matrix        : 材料名 × レシピの CountMatrix (numpy が無い場合は None)
+        grouped       : id -> グループ化済みの材料
+        steps         : id -> [{'food_name', 'action', 'count'}, ...] (count 降順)
+    """
+
+    __slots__ = ('version', 'signature', 'loaded_at', 'rows', 'by_popularity', 'name_index',
+                 'ingredients', 'ingredient_names', 'ingredient_positions', 'ingredient_index', 'matrix', 'grouped', 'steps')
+
+    def __init__(self, recipe_rows, ingredient_rows, step_rows, version, signature):
+        rows = {row['id']: row for row in recipe_rows}
+        popular = sorted(rows.values(), key=lambda row: (-(row['recipe_count'] or 0), row['id']))
+
+        ingredients = {}
+        per_recipe = {}
+        # count 降順 (詳細ページの ORDER BY count DESC と同じ)
+        for row in sorted(ingredient_rows, key=lambda row: -(row['count'] or 0)):
+            recipe_id = row['standard_recipe_id']
+            name = row['ingredient_name']
+            if name is None:
+                continue
+            # 同じレシピに同名の材料が複数ある場合 (グループ違い) は count の大きい方
+            ingredients.setdefault(fold_name(name), {}).setdefault(recipe_id, row['count'])
+            per_recipe.setdefault(recipe_id, []).append((row['group_name'], name, row['count']))
+
+        steps = {}
+        for row in sorted(step_rows, key=lambda row: -(row['count'] or 0)):
+            steps.setdefault(row['standard_recipe_id'], []).append({
+                'food_name': row['food_name'],
+                'action': row['action'],
+                'count': row['count']
+            })
+
+        self.version = version
+        self.signature = signature
+        self.loaded_at = time.time()
+        self.rows = rows
+        self.by_popularity = tuple(
+            (row['id'], fold_name(row['category_medium'])) for row in popular if row['category_medium'] is not None
+        )
+        self.name_index = NGramIndex(name for _, name in self.by_popularity)
+        self.ingredients = ingredients
+        self.ingredient_names = tuple(ingredients)
+        self.ingredient_positions = {name: i for i, name in enumerate(self.ingredient_names)}
+        self.ingredient_index = NGramIndex(self.ingredient_names)
+        self.matrix = None
+        if count_matrix.np is not None:
+            self.matrix = count_matrix.CountMatrix(sorted(rows), (ingredients[name] for name in self.ingredient_names))
+        self.grouped = {recipe_id: group_ingredients(items) for recipe_id, items in per_recipe.items()}
+        self.steps = steps
+
+    def __len__(self):
+        return len(self.rows)
+
+    def search_by_name(self, inclusions, exclusions, limit=5):
+        """
+        category_medium LIKE '%kw%' (すべて) AND NOT LIKE '%ex%' (すべて)
+        ORDER BY recipe_count DESC LIMIT limit と同じ
+        """
+        positions = None
+        for keyword in inclusions:
+            matched = self.name_index.search(fold_name(keyword))
+            positions = matched if positions is None else positions & matched
+            if not positions:
+                return []
+        if positions is None:
+            # 除外だけの検索: 人気順に先頭から確認する
+            excluded = set()
+            for keyword in exclusions:
+                excluded |= self.name_index.search(fold_name(keyword))
+            found = []
+            for position, (recipe_id, _) in enumerate(self.by_popularity):
+                if position not in excluded:
+                    found.append(recipe_id)
+                    if len(found) >= limit:
+                        break
+            return found
+        for keyword in exclusions:
+            positions -= self.name_index.search(fold_name(keyword))
+        # 位置 = 人気順の順位
+        return [self.by_popularity[p][0] for p in heapq.nsmallest(limit, positions)]
+
+    def ingredient_rows(self, name):
+        """ingredient_name = name に一致する材料名の位置 (ingredient_names のインデックス) のリスト"""
+        position = self.ingredient_positions.get(fold_name(name))
+        return [] if position is None else [position]
+
+    def ingredient_rows_like(self, keyword):
+        """ingredient_name LIKE '%keyword%' に一致する材料名の位置のリスト (昇順)"""
+        return sorted(self.ingredient_index.search(fold_name(keyword)))
+
+    def ingredient_counts(self, rows):
+        """材料名の位置のリストに一致する {id: count} (同じレシピは後の材料名の値)"""
+        matches = {}
+        names = self.ingredient_names
+        for position in rows:
+            matches.update(self.ingredients[names[position]])
+        return matches
+
+    def top_by_ingredients(self, inclusions, exclusions, limit=5):
+        """
+        inclusions / exclusions : キーワードごとの材料名の位置のリスト
+        すべての inclusions に一致し exclusions に一致しないレシピを、一致した count の合計の降順
+        (同点は ID 順) に limit 件返す
+        """
+        if self.matrix is not None:
+            return self.matrix.top_k(inclusions, exclusions, limit)
+        return self.top_by_ingredients_dict(inclusions, exclusions, limit)
+
+    def top_by_ingredients_dict(self, inclusions, exclusions, limit=5):
+        """top_by_ingredients の dict による集計 (numpy が無い場合)"""
+        if not inclusions:
+            return []
+        keyword_matches = [self.ingredient_counts(rows) for rows in inclusions]
+        common_ids = set(keyword_matches[0])
+        for other_match in keyword_matches[1:]:
+            common_ids.intersection_update(other_match)
+        for rows in exclusions:
+            common_ids.difference_update(self.ingredient_counts(rows))
+        scored = sorted(common_ids, key=lambda r_id: (-sum(m[r_id] for m in keyword_matches), r_id))
+        return scored[:limit]
+
+    def summary(self, recipe_id):
+        """検索結果の 1 件 (料理名, 表示用の dict)"""
+        row = self.rows[recipe_id]
+        return (row['category_medium'], {
+            'id': row['id'],
+            'name': row['category_medium'],
+            'recipe_count': row['recipe_count'],
+            'cooking_time': [row['cooking_time']],
+            'steps': {'average_steps': row['average_steps']},
+            'standard_steps': self.steps.get(recipe_id, []),
+            'ingredient': self.grouped.get(recipe_id, {})
+        })
+
+    def detail(self, recipe_id):
+        """get_standard_recipe_details と同じ形の dict (該当なしは None)"""
+        row = self.rows.get(recipe_id)
+        if row is None:
+            return None
+        recipe = dict(row)
+        recipe['steps'] = {'average_steps': row['average_steps']}
+        recipe['cooking_time'] = [row['cooking_time']]
+        recipe['ingredient'] = self.grouped.get(recipe_id, {})
+        recipe['standard_steps'] = self.steps.get(recipe_id, [])
+        return recipe
+
+
+_SNAPSHOT = None
+_LAST_CHECK = 0.0
+_LOCK = threading.Lock()
+
+
+def _fetch_signature(cursor):
+    cursor.execute(f"CHECKSUM TABLE {', '.join(STANDARD_TABLES)}")
+    return tuple(tuple(row.values()) if isinstance(row, dict) else tuple(row) for row in cursor.fetchall())
+
+
+def load_standard_snapshot(cursor):
+    """3 表を全件読み込み、新しいスナップショットに差し替える"""
+    global _SNAPSHOT, _LAST_CHECK
+    start = time.time()
+    signature = _fetch_signature(cursor)
+    snapshot = StandardSnapshot(
+        query(cursor, "SELECT * FROM standard_recipes"),
+        query(cursor, "SELECT standard_recipe_id, group_name, ingredient_name, count FROM standard_recipe_ingredients"),
+        query(cursor, "SELECT standard_recipe_id, food_name, action, count FROM standard_recipe_steps"),
+        (_SNAPSHOT.version + 1) if _SNAPSHOT else 1,
+        signature,
+    )
+    _SNAPSHOT = snapshot
+    _LAST_CHECK = time.time()
+    logging.info(f"Standard recipe snapshot v{snapshot.version} loaded: {len(snapshot)} recipes, "
+                 f"{len(snapshot.ingredients)} ingredient names ({time.time() - start:.2f}s)")
+    return snapshot
+
+
+def get_standard_snapshot(cursor):
+    """
+    現在のスナップショットを返す (STANDARD_SNAPSHOT=off・読み込み失敗時は None)
+    未読み込み、または確認間隔を過ぎて 3 表が変化していれば読み直す
+    """
+    global _LAST_CHECK
+    if STANDARD_SNAPSHOT_MODE != 'on':
+        return None
+
+    snapshot = _SNAPSHOT
+    now = time.time()
+    # 読み込みに失敗した場合も、次の確認までは SQL で応答する
+    if now - _LAST_CHECK <= STANDARD_SNAPSHOT_CHECK_INTERVAL:
+        return snapshot
+
+    # 読み込みは 1 スレッドだけが行い、他のスレッドは古いスナップショット (無ければ SQL) で応答する
+    if not _LOCK.acquire(blocking=False):
+        return snapshot
+    try:
+        _LAST_CHECK = now
+        if snapshot is None or _fetch_signature(cursor) != snapshot.signature:
+            snapshot = load_standard_snapshot(cursor)
+    except mysql.connector.Error as err:
+        logging.error(f"Standard recipe snapshot could not be loaded: {err}")
+    finally:
+        _LOCK.release()
+    return snapshot
+
+
+def current_standard_version():
+    """読み込み済みスナップショットのバージョン (未読み込み・無効時は 0)"""
+    snapshot = _SNAPSHOT
+    return snapshot.version if snapshot is not None else 0
+
+
+def init_standard_snapshot():
+    """
+    起動時にスナップショットを読み込む
+    失敗しても例外は送出せず、最初の検索時に読み込み直す
+    """
+    if STANDARD_SNAPSHOT_MODE != 'on':
+        return None
+    from core.database import get_db_connection
+    conn = get_db_connection()
+    if not conn:
+        logging.error("Standard recipe snapshot skipped: database connection failed")
+        return None
+    try:
+        cursor = conn.cursor(dictionary=True)
+        return load_standard_snapshot(cursor)
+    except mysql.connector.Error as err:
+        logging.error(f"Standard recipe snapshot could not be loaded: {err}")
+        return None
+    finally:
+        conn.close()
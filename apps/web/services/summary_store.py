@@ -0,0 +1,225 @@
+import os
+import mmap
+import time
+import sys
+import struct
+import logging
+import datetime
+from array import array
+
+# --- レシピ一覧表示用のサマリーストア ---
+# 検索結果の表示に必要な (title, description, published_at) を
+# recipe_id で直接引ける列指向のスナップショットファイルに書き出し、mmap で参照する。
+#
+# Python オブジェクトを作らずに済むため、数百万件でもメモリはほぼファイルサイズ分
+# (しかも OS のページキャッシュとしてワーカー間で共有される) に収まる。
+#
+# ファイル構成 (ネイティブのバイトオーダー、header の byteorder で確認する):
+#   header : magic(8) | byteorder(1) | pad(7) | max_id(u64) | blob_offset(u64)
+#   offsets: u32 × ((max_id + 1) × 3 + 1)
+#            recipe_id ごとに [title, description, published_at] の blob 内の開始位置。
+#            フィールドの終了位置は次のフィールドの開始位置 (連続して格納する)
+#   flags  : u8 × (max_id + 1)  bit0: レシピが存在する / bit1-3: 各フィールドが NULL
+#   blob   : UTF-8 文字列を recipe_id 順に連結したもの
+#            published_at は ISO 形式で格納し、読み出し時に SQL と同じ datetime (date) に戻す
+# 欠番の ID は 3 フィールドとも長さ 0 になる。
+RECIPE_SUMMARY_STORE = os.environ.get('RECIPE_SUMMARY_STORE', 'off')
+RECIPE_SUMMARY_STORE_PATH = os.environ.get(
+    'RECIPE_SUMMARY_STORE_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'recipe_summaries.bin')
+)
+
+SUMMARY_MAGIC = b'RSUM1\x00\x00\x00'
+HEADER = struct.Struct('=8sc7xQQ')
+MAX_BLOB_SIZE = 0xFFFFFFFF
+FIELDS = 3
+BUILD_FETCH_SIZE = 20000
+
+# offsets は u32。'I' は多くの環境で 4 byte だが、保証されないため確認する
+OFFSET_TYPECODE = 'I' if array('I').itemsize == 4 else 'L'
+OFFSET_SIZE = 4
+
+
+class RecipeSummaryStore:
+    """
+    mmap したスナップショットから recipe_id -> サマリー行を O(1) で返す
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, byteorder, self.max_id, self._blob_offset = HEADER.unpack_from(self._mm, 0)
+        if magic != SUMMARY_MAGIC or byteorder.decode('ascii') != sys.byteorder[0]:
+            self.close()
+            raise ValueError(f"Invalid recipe summary snapshot: {path}")
+        n_offsets = (self.max_id + 1) * FIELDS + 1
+        offsets_start = HEADER.size
+        offsets_end = offsets_start + n_offsets * OFFSET_SIZE
+        self._offsets = memoryview(self._mm)[offsets_start:offsets_end].cast(OFFSET_TYPECODE)
+        self._flags = memoryview(self._mm)[offsets_end:offsets_end + self.max_id + 1]
+        self.loaded_at = time.time()
+
+    @property
+    def nbytes(self):
+        return len(self._mm)
+
+    def close(self):
+        # memoryview を先に解放しないと mmap を閉じられない
+        for name in ('_offsets', '_flags'):
+            view = getattr(self, name, None)
+            if view is not None:
+                view.release()
+        self._mm.close()
+        self._file.close()
+
+    def __contains__(self, recipe_id):
+        return 0 <= recipe_id <= self.max_id and bool(self._flags[recipe_id] & 1)
+
+    def _field(self, recipe_id, field):
+        if self._flags[recipe_id] & (2 << field):
+            return None
+        pos = recipe_id * FIELDS + field
+        start = self._blob_offset + self._offsets[pos]
+        end = self._blob_offset + self._offsets[pos + 1]
+        return self._mm[start:end].decode('utf-8')
+
+    def _published_at(self, recipe_id):
+        value = self._field(recipe_id, 2)
+        if value is None:
+            return None
+        # DATE 列なら 'YYYY-MM-DD' のみ
+        if len(value) == 10:
+            return datetime.date.fromisoformat(value)
+        return datetime.datetime.fromisoformat(value)
+
+    def get(self, recipe_id):
+        """SELECT id, title, description, published_at FROM recipes WHERE id = %s と同じ形の行"""
+        if recipe_id not in self:
+            return None
+        return {
+            'id': recipe_id,
+            'title': self._field(recipe_id, 0),
+            'description': self._field(recipe_id, 1),
+            'published_at': self._published_at(recipe_id),
+        }
+
+    def get_many(self, recipe_ids):
+        """
+        ID の順序を保ったまま行を返す
+        ストアに無い ID があれば missing として返す (SQL で補う)
+        """
+        rows = []
+        missing = []
+        for rid in recipe_ids:
+            row = self.get(rid)
+            if row is None:
+                missing.append(rid)
+            else:
+                rows.append(row)
+        return rows, missing
+
+    # --- 構築 ---
+
+    @staticmethod
+    def build(cursor, path):
+        """
+        recipes テーブルからスナップショットを作成する
+        1 回目の走査で最大IDを求め、2 回目の走査で ID 順に書き出す
+        Returns: 書き出したレシピ数
+        """
+        cursor.execute("SELECT MAX(id) AS max_id FROM recipes")
+        row = cursor.fetchone()
+        max_id = (row['max_id'] if isinstance(row, dict) else row[0]) or 0
+
+        n_offsets = (max_id + 1) * FIELDS + 1
+        offsets = array(OFFSET_TYPECODE, bytes(OFFSET_SIZE * n_offsets))
+        flags = bytearray(max_id + 1)
+
+        tmp_path = f"{path}.tmp"
+        blob_path = f"{path}.blob.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        count = 0
+        blob_size = 0
+        next_id = 0
+        with open(blob_path, 'wb') as blob:
+            cursor.execute("SELECT id, title, description, published_at FROM recipes ORDER BY id")
+            while True:
+                rows = cursor.fetchmany(BUILD_FETCH_SIZE)
+                if not rows:
+                    break
+                for row in rows:
+                    if isinstance(row, dict):
+                        rid, title, description, published_at = row['id'], row['title'], row['description'], row['published_at']
+                    else:
+                        rid, title, description, published_at = row
+                    # 欠番の ID は長さ 0 のフィールドで埋める
+                    for missing_id in range(next_id, rid):
+                        for f in range(FIELDS):
+                            offsets[missing_id * FIELDS + f] = blob_size
+                    flag = 1
+                    for f, value in enumerate((title, description, published_at)):
+                        offsets[rid * FIELDS + f] = blob_size
+                        if value is None:
+                            flag |= 2 << f
+                        else:
+                            # datetime / date の str() は ISO 形式
+                            data = str(value).encode('utf-8')
+                            blob.write(data)
+                            blob_size += len(data)
+                    if blob_size > MAX_BLOB_SIZE:
+                        raise ValueError("recipe summaries exceed 4GB; offsets do not fit in u32")
+                    flags[rid] = flag
+                    next_id = rid + 1
+                    count += 1
+        for missing_id in range(next_id, max_id + 1):
+            for f in range(FIELDS):
+                offsets[missing_id * FIELDS + f] = blob_size
+        offsets[-1] = blob_size
+
+        blob_offset = HEADER.size + n_offsets * OFFSET_SIZE + len(flags)
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(SUMMARY_MAGIC, sys.byteorder[0].encode('ascii'), max_id, blob_offset))
+            offsets.tofile(f)
+            f.write(flags)
+            with open(blob_path, 'rb') as blob:
+                while True:
+                    chunk = blob.read(1 << 20)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+        os.remove(blob_path)
+        os.replace(tmp_path, path)
+        return count
+
+
+# --- プロセス全体で共有するストア ---
+_STORE = None
+
+
+def get_summary_store():
+    """読み込み済みのストアを返す (未使用なら None)"""
+    return _STORE
+
+
+def init_summary_store(mode=None, path=None):
+    """
+    起動時にスナップショットを mmap する
+    ファイルが無い・壊れている場合は None (SQL で取得) のまま起動を続ける
+    """
+    global _STORE
+    mode = mode or RECIPE_SUMMARY_STORE
+    path = path or RECIPE_SUMMARY_STORE_PATH
+    if mode != 'mmap':
+        return None
+
+    try:
+        store = RecipeSummaryStore(path)
+        logging.info(f"Recipe summary store mapped: {path} (max_id={store.max_id})")
+    except (OSError, ValueError) as e:
+        logging.warning(f"Recipe summary store is not available: {e}")
+        store = None
+
+    _STORE = store
+    return store
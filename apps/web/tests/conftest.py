@@ -0,0 +1,8 @@
+import os
+import sys
+
+# apps/web をパスに追加する (scripts/ と同じく core / services をそのまま import する)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# テスト中に data/search_token.key を作らないよう、固定の署名鍵を使う
+os.environ.setdefault('SEARCH_TOKEN_SECRET', 'test-secret')
@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from services.bitmap import RoaringBitmap, ARRAY_MAX_SIZE, CHUNK_SIZE
+
+
+def random_ids(rng, n_chunks=4):
+    """疎なチャンク (配列) と密なチャンク (ビットセット) が混ざる ID の集合"""
+    ids = set()
+    for key in rng.sample(range(8), n_chunks):
+        size = rng.choice([0, 1, 50, ARRAY_MAX_SIZE, ARRAY_MAX_SIZE + 1, 20000])
+        ids.update(key * CHUNK_SIZE + low for low in rng.sample(range(CHUNK_SIZE), size))
+    return ids
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_set_operations_match_python_sets(seed):
+    rng = random.Random(seed)
+    a, b, c = random_ids(rng), random_ids(rng), random_ids(rng)
+    bm_a, bm_b, bm_c = (RoaringBitmap.from_ids(s) for s in (a, b, c))
+
+    assert list(bm_a) == sorted(a)
+    assert len(bm_a) == len(a)
+    assert list(bm_a & bm_b) == sorted(a & b)
+    assert list(bm_a | bm_b) == sorted(a | b)
+    assert list(bm_a - bm_b) == sorted(a - b)
+    assert list(RoaringBitmap.union_all([bm_a, bm_b, bm_c])) == sorted(a | b | c)
+    assert list(RoaringBitmap.intersect_all([bm_a | bm_c, bm_b | bm_c])) == sorted((a | c) & (b | c))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_lookup_and_paging_match_sorted_list(seed):
+    rng = random.Random(seed)
+    ids = sorted(random_ids(rng))
+    bm = RoaringBitmap.from_sorted(ids)
+
+    for probe in rng.sample(range(8 * CHUNK_SIZE), 200):
+        assert (probe in bm) == (probe in set(ids))
+        expected = [i for i in ids if i >= probe]
+        assert bm.take_from(probe, 25) == expected[:25]
+
+    if ids:
+        ranks = rng.sample(range(len(ids)), min(50, len(ids)))
+        assert bm.select_many(ranks) == [ids[r] for r in ranks]
+        with pytest.raises(IndexError):
+            bm.select_many([len(ids)])
+
+
+def test_empty():
+    empty = RoaringBitmap()
+    assert not empty and len(empty) == 0
+    assert list(empty & RoaringBitmap.from_ids([1, 2])) == []
+    assert RoaringBitmap.intersect_all([]).take_from(0, 10) == []
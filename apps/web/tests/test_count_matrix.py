@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from services.count_matrix import CountMatrix
+
+
+def reference_top_k(rows, inclusions, exclusions, k):
+    """StandardSnapshot.top_by_ingredients_dict と同じ集計 (後の行の count が優先)"""
+    def counts(row_numbers):
+        merged = {}
+        for row in row_numbers:
+            merged.update(rows[row])
+        return merged
+
+    if not inclusions:
+        return []
+    matches = [counts(r) for r in inclusions]
+    common = set(matches[0])
+    for match in matches[1:]:
+        common &= set(match)
+    for r in exclusions:
+        common -= set(counts(r))
+    return sorted(common, key=lambda rid: (-sum(m[rid] for m in matches), rid))[:k]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_top_k_matches_dict_scoring(seed):
+    rng = random.Random(seed)
+    recipe_ids = sorted(rng.sample(range(1, 500), 120))
+    # count の幅を狭くして同点を多くする
+    rows = [{rid: rng.randint(0, 3) for rid in rng.sample(recipe_ids, rng.randint(0, 60))} for _ in range(30)]
+    matrix = CountMatrix(recipe_ids, rows)
+    assert matrix.nnz == sum(len(r) for r in rows)
+
+    for _ in range(30):
+        inclusions = [rng.sample(range(30), rng.randint(1, 3)) for _ in range(rng.randint(0, 3))]
+        exclusions = [rng.sample(range(30), 1) for _ in range(rng.randint(0, 2))]
+        k = rng.choice([1, 5, 50])
+        assert matrix.top_k(inclusions, exclusions, k) == reference_top_k(rows, inclusions, exclusions, k)
@@ -0,0 +1,64 @@
+import sqlite3
+
+import pytest
+
+from services import ingredient_index
+from services.ingredient_index import IngredientIndex
+
+ROWS = [(1, 'Bacon'), (3, 'ＢＡＣＯＮ'), (2, 'bacon'), (3, 'bacon'), (2, '玉ねぎ'), (5, 'ﾄﾏﾄ'), (4, 'トマト')]
+
+
+def build(rows):
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE ingredients (recipe_id INTEGER, name TEXT)")
+    conn.executemany("INSERT INTO ingredients VALUES (?, ?)", rows)
+    return IngredientIndex.build_from_db(conn.cursor())
+
+
+def test_case_and_width_variants_share_a_posting_list():
+    # SQL の name = %s (照合順序で大文字・小文字や全角・半角を区別しない) と同じ結果
+    index = build(ROWS)
+    assert list(index.get('BACON')) == [1, 2, 3]
+    assert index.range('ｂａｃｏｎ', 2, 10) == [2, 3]
+    assert index.count('Bacon') == 3
+    assert index.contains('bacon', 1) and not index.contains('bacon', 4)
+    assert list(index.bitmap('トマト')) == [4, 5]
+    assert 'ﾄﾏﾄ' in index and 'ほうれん草' not in index
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / 'index.bin')
+    build(ROWS).save(path)
+    assert IngredientIndex.is_snapshot(path)
+    loaded = IngredientIndex.load(path)
+    assert list(loaded.get('BACON')) == [1, 2, 3]
+
+    # キーを揃える前の形式は読み込まない
+    with open(path, 'wb') as f:
+        f.write(b'IIDX1\n')
+    assert not IngredientIndex.is_snapshot(path)
+
+
+def test_refresh_reloads_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingredient_index, '_CONFIG', {'mode': None, 'path': None})
+    path = str(tmp_path / 'index.bin')
+    build(ROWS).save(path)
+    assert ingredient_index.init_ingredient_index(mode='snapshot', path=path) is not None
+    version = ingredient_index.current_index_version()
+
+    # スナップショットを作り直した後、世代が進んだときの読み直し
+    build(ROWS + [(9, 'bacon')]).save(path)
+    try:
+        assert ingredient_index.refresh_ingredient_index()
+        # 読み直しのスレッドが終わるまで待つ
+        assert ingredient_index._REFRESH_LOCK.acquire(timeout=5)
+        ingredient_index._REFRESH_LOCK.release()
+        assert list(ingredient_index.get_ingredient_index().get('Bacon')) == [1, 2, 3, 9]
+        assert ingredient_index.current_index_version() > version
+    finally:
+        ingredient_index.set_ingredient_index(None)
+
+
+def test_refresh_without_index_does_nothing():
+    ingredient_index.set_ingredient_index(None)
+    assert not ingredient_index.refresh_ingredient_index()
@@ -0,0 +1,48 @@
+import random
+import sqlite3
+
+import pytest
+
+from services.ngram_index import NGramIndex
+
+STRINGS = ['玉ねぎ', 'たまねぎ', '新玉ねぎ', '豚バラ肉', '豚ひき肉', 'ひき肉', '鶏もも肉', 'ごま油', 'ごま',
+           'カレー粉', 'カレールー', '100%果汁', 'a_b', 'a\\b', 'abc', '', 'し', 'しょうゆ', 'しお']
+KEYWORDS = ['肉', 'ひき', '玉ねぎ', 'ねぎ', 'ご_', '%', '_', '__', '豚%肉', 'カレー', '100\\%', 'a\\_b',
+            'a\\\\b', 'x', 'し', 'しょ', '%お', 'ゆ%']
+
+
+@pytest.fixture(scope='module')
+def db():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("PRAGMA case_sensitive_like = ON")
+    conn.execute("CREATE TABLE t (pos INTEGER, s TEXT)")
+    conn.executemany("INSERT INTO t VALUES (?, ?)", list(enumerate(STRINGS)))
+    yield conn
+    conn.close()
+
+
+def like(db, keyword):
+    rows = db.execute("SELECT pos FROM t WHERE s LIKE ? ESCAPE '\\'", (f'%{keyword}%',))
+    return {pos for pos, in rows}
+
+
+@pytest.mark.parametrize('keyword', KEYWORDS)
+def test_search_matches_sql_like(db, keyword):
+    assert NGramIndex(STRINGS).search(keyword) == like(db, keyword)
+
+
+def test_random_keywords_match_sql_like(db):
+    rng = random.Random(0)
+    index = NGramIndex(STRINGS)
+    alphabet = ''.join(set(''.join(STRINGS))) + '%_'
+    for _ in range(500):
+        keyword = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 3)))
+        if keyword.endswith('\\'):
+            continue
+        assert index.search(keyword) == like(db, keyword), keyword
+
+
+@pytest.mark.parametrize('text', ['肉', '%', '_', 'a_b', 'ねぎ', '', 'zz'])
+def test_contains_is_literal(text):
+    index = NGramIndex(STRINGS)
+    assert index.contains(text) == {p for p, s in enumerate(STRINGS) if text in s}
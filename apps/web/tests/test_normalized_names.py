@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip('mysql.connector')
+pytest.importorskip('flask')
+
+from core import database
+from core.synonyms import SynonymModel, fold_name
+
+# (synonym, normalized_name) を id 順に
+ROWS = [('Bacon', 'ベーコン'), ('ベーコン', 'ベーコン'), ('ｱｽﾊﾟﾗ', 'アスパラガス'), ('玉ねぎ', '玉ねぎ'),
+        ('トマト', 'トマト'), ('とまと', 'トマト')]
+KEYWORDS = ['ＢＡＣＯＮ', 'bacon', 'アスパラ', '玉ねぎ', 'ほうれん草', 'ﾄﾏﾄ']
+EXPECTED = {'ＢＡＣＯＮ': 'ベーコン', 'bacon': 'ベーコン', 'アスパラ': 'アスパラガス',
+            '玉ねぎ': '玉ねぎ', 'ほうれん草': None, 'ﾄﾏﾄ': 'トマト'}
+
+
+class CollatingCursor:
+    """synonym_dictionary への = / IN を、大文字・小文字や全角・半角を区別しない照合順序で評価するカーソル"""
+
+    def __init__(self):
+        self.rows = []
+
+    def execute(self, sql, params=()):
+        keys = {fold_name(p) for p in params}
+        where = sql.split('WHERE', 1)[1]
+        columns = [i for i, c in enumerate(('synonym', 'normalized_name'))
+                   if f'{c} IN' in where or f'{c} =' in where]
+        self.rows = [{'synonym': row[0], 'normalized_name': row[1]} for row in ROWS
+                     if any(fold_name(row[i]) in keys for i in columns)]
+
+    def fetchall(self):
+        return self.rows
+
+
+@pytest.fixture(params=['sql', 'model'])
+def cursor(request, monkeypatch):
+    model = SynonymModel(ROWS, 1, None) if request.param == 'model' else None
+    monkeypatch.setattr(database, 'get_synonym_model', lambda cursor: model)
+    return CollatingCursor()
+
+
+def test_normalized_names_match_collation_variants(cursor):
+    assert database.get_normalized_names(cursor, KEYWORDS) == EXPECTED
+
+
+def test_synonyms_match_collation_variants(cursor):
+    assert sorted(database.get_synonyms(cursor, 'ﾄﾏﾄ')) == sorted(['ﾄﾏﾄ', 'トマト', 'とまと'])
+    assert sorted(database.get_synonyms(cursor, 'BACON')) == sorted(['BACON', 'Bacon', 'ベーコン'])
+
+
+def test_unify_keywords_matches_collation_variants(cursor):
+    assert database.unify_keywords(cursor, ['ﾄﾏﾄ', 'とまと', 'ＢＡＣＯＮ', '人参']) == ['トマト', 'Bacon', '人参']
@@ -0,0 +1,136 @@
+import csv
+import random
+from array import array
+
+import pytest
+
+from services import nutrition
+from services.nutrition import (NUTRIENT_COLUMNS, STAPLE_FOODS, NutritionTable, fold_kana, search_nutrition,
+                                parse_calculation_request)
+
+STANDARDS = {'energy': 734, 'protein': 31, 'fat': 21, 'carbs': 106, 'fiber': 7, 'salt': 2.5}
+NAMES = ['ぶた　［大型種肉］　ロース', 'ブタ　ばら', 'ｶﾚｰ粉', 'こめ　［水稲めし］', 'コメ油', 'にんじん',
+         'ニンジン　ゆで', '牛肉', '鶏肉', 'ＡＢＣ', 'abc']
+
+
+def make_table(n_copies=3, seed=0):
+    rng = random.Random(seed)
+    names = NAMES * n_copies
+    ids = [f'{i:05d}' for i in range(len(names))]
+    # 同じ値を多くして並び替えの同点を確認する
+    columns = {key: array('d', (float(rng.randint(0, 5)) for _ in names)) for key in NUTRIENT_COLUMNS}
+    return NutritionTable(ids, names, columns, (0, 0))
+
+
+def test_fold_kana():
+    assert fold_kana('ブタ') == fold_kana('ぶた') == fold_kana('ﾌﾞﾀ')
+    assert fold_kana('ＡＢＣ') == 'abc'
+
+
+@pytest.mark.parametrize('query', ['', 'ぶた', 'ﾌﾞﾀ', 'かれー', 'コメ', 'ＡＢ', 'にんじん', '肉', 'zz', '  '])
+@pytest.mark.parametrize('mode', ['substring', 'prefix'])
+def test_search_matches_brute_force(query, mode):
+    table = make_table()
+    rows = table.rows()
+    q = fold_kana(query).strip()
+
+    def matches(i):
+        name = fold_kana(rows[i]['name'])
+        return not q or (name.startswith(q) if mode == 'prefix' else q in name)
+
+    for sort in nutrition.SEARCH_FIELDS:
+        for descending in (False, True):
+            if sort == 'id':
+                order = sorted(range(len(rows)), reverse=descending)
+            else:
+                key = (lambda i: fold_kana(rows[i]['name'])) if sort == 'name' else (lambda i: rows[i][sort])
+                order = sorted(range(len(rows)), key=key, reverse=descending)
+            expected = [rows[i] for i in order if matches(i)]
+            for offset, limit in ((0, 20), (3, 5), (30, 100)):
+                total, items = search_nutrition(table, query, mode, sort, descending, offset, limit)
+                assert total == len(expected)
+                assert items == expected[offset:offset + limit]
+
+
+def test_search_field_selection_and_errors():
+    table = make_table()
+    _, items = search_nutrition(table, 'ぶた', fields=['name', 'salt'], limit=2)
+    assert [sorted(item) for item in items] == [['name', 'salt']] * 2
+    with pytest.raises(ValueError):
+        search_nutrition(table, sort='unknown')
+    with pytest.raises(ValueError):
+        search_nutrition(table, fields=['unknown'])
+
+
+def reference_totals(table, items):
+    by_id = {row['id']: row for row in reversed(table.rows())}
+    staples = {staple['id']: staple for staple in STAPLE_FOODS}
+    totals = [0.0] * len(NUTRIENT_COLUMNS)
+    for food_id, amount in items:
+        if food_id in by_id:
+            totals = [t + by_id[food_id][key] * amount / 100 for t, key in zip(totals, NUTRIENT_COLUMNS)]
+        elif food_id in staples:
+            totals = [t + staples[food_id][key] * amount for t, key in zip(totals, NUTRIENT_COLUMNS)]
+    return totals
+
+
+@pytest.mark.parametrize('use_numpy', [False, True])
+def test_calculator_matches_reference(use_numpy):
+    if use_numpy:
+        pytest.importorskip('numpy')
+    table = make_table()
+    rng = random.Random(1)
+    ids = list(table.ids) + [staple['id'] for staple in STAPLE_FOODS] + ['missing']
+    recipes = [([(rng.choice(ids), rng.uniform(0, 300)) for _ in range(rng.randint(0, 8))], rng.choice([1.0, 2.0, 3.5]))
+               for _ in range(100)]
+
+    results = table.calculator().evaluate(recipes, STANDARDS, use_numpy=use_numpy)
+    assert len(results) == len(recipes)
+    for (items, servings), (totals, per_serving, ratios, unknown) in zip(recipes, results):
+        expected = reference_totals(table, items)
+        assert totals == pytest.approx([round(v, 2) for v in expected], abs=0.011)
+        assert per_serving == pytest.approx([round(v / servings, 2) for v in expected], abs=0.011)
+        assert ratios == pytest.approx([round(v / servings * 100 / STANDARDS[key], 1)
+                                        for v, key in zip(expected, NUTRIENT_COLUMNS)], abs=0.11)
+        assert unknown == [food_id for food_id, _ in items if food_id == 'missing']
+
+
+@pytest.mark.parametrize('body', [
+    None,
+    {'recipes': 1},
+    {'recipes': [{'items': [['a', -1]]}]},
+    {'recipes': [{'items': [['a', float('nan')]]}]},
+    {'recipes': [{'items': [['a', 1]], 'servings': 0}]},
+    {'recipes': [{'items': [['a']]}]},
+    # 数値の id は '01001' のような食品番号と一致しない
+    {'recipes': [{'items': [[1001, 100]]}]},
+    {'recipes': [{'items': [{'amount': 100}]}]},
+])
+def test_invalid_calculation_requests(body):
+    with pytest.raises(ValueError):
+        parse_calculation_request(body)
+
+
+def test_table_cache_and_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(nutrition, '_TABLES', {})
+    monkeypatch.setattr(nutrition, 'NUTRITION_SNAPSHOT', True)
+    csv_path = tmp_path / 'nutrition_ex.csv'
+    with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['群', '食品番号', '索引', '食品名', 'エネルギー', 'たんぱく質', '脂質', '炭水化物', '食物繊維', '食塩'])
+        writer.writerow(['g', 'id', 'idx', 'name', 'e', 'p', 'f', 'c', 'fib', 'salt'])
+        writer.writerow([1, '00001', 1, 'こめ', '342', '6.1', '0.9', 'Tr', '-', '\\N'])
+        writer.writerow([1, '00002', 2, 'しお', '0', '0', '0', '0', '0', '-99.5'])
+
+    table = nutrition.get_nutrition_table(str(tmp_path))
+    assert nutrition.get_nutrition_table(str(tmp_path)) is table
+    assert table.rows()[0] == {'id': '00001', 'name': 'こめ', 'energy': 342.0, 'protein': 6.1, 'fat': 0.9,
+                               'carbs': 0.0, 'fiber': 0.0, 'salt': 0.0}
+    assert table.rows()[1]['salt'] == 99.5
+
+    # 別のワーカーはスナップショットから同じ表を読む
+    monkeypatch.setattr(nutrition, '_TABLES', {})
+    snapshot_loads = nutrition._STATS['snapshot_loads']
+    loaded = nutrition.get_nutrition_table(str(tmp_path))
+    assert nutrition._STATS['snapshot_loads'] == snapshot_loads + 1
+    assert loaded is not table and loaded.rows() == table.rows()
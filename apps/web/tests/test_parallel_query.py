@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('mysql.connector')
+pytest.importorskip('flask')
+
+import mysql.connector
+from services import parallel_query
+
+
+class SerialCursor:
+    """呼び出し元のカーソル (直列で実行したクエリを記録する)"""
+
+    def __init__(self):
+        self.executed = []
+
+    def execute(self, sql, params=()):
+        self.executed.append(sql)
+
+    def fetchall(self):
+        return [{'serial': self.executed[-1]}]
+
+
+@pytest.fixture
+def pooled(monkeypatch):
+    """_run_on_pooled_connection を sql ごとの動作に差し替える"""
+    behaviours = {}
+    started = []
+
+    def run(sql, params, timeout_ms):
+        started.append(sql)
+        return behaviours[sql]()
+
+    monkeypatch.setattr(parallel_query, 'SEARCH_PARALLELISM', 2)
+    monkeypatch.setattr(parallel_query, '_executor', None)
+    monkeypatch.setattr(parallel_query, 'DEADLINE_GRACE_SECONDS', 0.1)
+    monkeypatch.setattr(parallel_query, '_run_on_pooled_connection', run)
+    yield behaviours, started
+    parallel_query._executor.shutdown(wait=True)
+
+
+def slow(seconds, rows):
+    def run():
+        time.sleep(seconds)
+        return rows
+    return run
+
+
+def failing():
+    raise mysql.connector.Error('Query execution was interrupted, maximum statement execution time exceeded')
+
+
+def test_running_query_is_not_rerun(pooled):
+    # 制限時間を過ぎても実行中のクエリは、直列で重ねて投げずに終わるのを待つ
+    behaviours, started = pooled
+    behaviours.update({'a': slow(0.15, [{'id': 1}]), 'b': slow(0, [{'id': 2}])})
+    cursor = SerialCursor()
+    assert parallel_query.run_queries(cursor, [('a', ()), ('b', ())], timeout_ms=10) == [[{'id': 1}], [{'id': 2}]]
+    assert cursor.executed == []
+
+
+def test_failed_query_runs_serially(pooled):
+    behaviours, started = pooled
+    behaviours.update({'a': failing, 'b': slow(0, [{'id': 2}])})
+    cursor = SerialCursor()
+    assert parallel_query.run_queries(cursor, [('a', ()), ('b', ())], timeout_ms=10) == [[{'serial': 'a'}], [{'id': 2}]]
+    assert cursor.executed == ['a']
+
+
+def test_query_that_never_started_runs_serially(pooled):
+    # スレッド 2 本がふさがっている間に制限時間が過ぎた 3 本目
+    behaviours, started = pooled
+    behaviours.update({'a': slow(0.18, []), 'b': slow(0.18, []), 'c': slow(0, [{'id': 3}])})
+    cursor = SerialCursor()
+    results = parallel_query.run_queries(cursor, [('a', ()), ('b', ()), ('c', ())], timeout_ms=10)
+    assert results == [[], [], [{'serial': 'c'}]]
+    assert cursor.executed == ['c'] and 'c' not in started
+
+
+def test_query_past_the_server_deadline_raises(pooled):
+    behaviours, started = pooled
+    release = threading.Event()
+    behaviours.update({'a': lambda: release.wait(2) and [], 'b': slow(0, [])})
+    cursor = SerialCursor()
+    try:
+        with pytest.raises(parallel_query.ParallelQueryTimeout):
+            parallel_query.run_queries(cursor, [('a', ()), ('b', ())], timeout_ms=10)
+    finally:
+        release.set()
+    assert cursor.executed == []
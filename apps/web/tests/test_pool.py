@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('mysql.connector')
+
+import mysql.connector
+from core.pool import ConnectionPool, PooledConnection
+
+
+class FakeRaw:
+    """ping に ping_seconds かかり、dead なら失敗する接続"""
+
+    def __init__(self, name, ping_seconds=0.0, dead=False):
+        self.name = name
+        self.ping_seconds = ping_seconds
+        self.dead = dead
+        self.closed = False
+        self.in_transaction = False
+
+    def ping(self, reconnect=False):
+        time.sleep(self.ping_seconds)
+        if self.dead:
+            raise mysql.connector.Error('gone away')
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(idle_raws, size=3):
+    # ping_after=0: 貸し出しのたびに ping で確認する
+    pool = ConnectionPool({}, size=size, timeout=2, ping_after=0)
+    pool._connect = lambda: PooledConnection(pool, FakeRaw('new'), time.monotonic())
+    for raw in idle_raws:
+        conn = PooledConnection(pool, raw, time.monotonic())
+        conn.last_used -= 1
+        pool._idle.append(conn)
+        pool._total += 1
+    return pool
+
+
+def test_slow_ping_does_not_block_other_acquires():
+    pool = make_pool([FakeRaw('fast'), FakeRaw('slow', ping_seconds=0.5)])
+    slow = []
+    thread = threading.Thread(target=lambda: slow.append(pool.acquire()))
+    thread.start()
+    time.sleep(0.05)  # 1 本目が 'slow' を取り出して ping している間に借りる
+
+    started = time.monotonic()
+    conn = pool.acquire()
+    assert conn.raw.name == 'fast'
+    assert time.monotonic() - started < 0.3
+    conn.close()
+    assert pool.stats()['idle'] == 1  # ping 中でも返却できる
+
+    thread.join()
+    assert slow[0].raw.name == 'slow'
+
+
+def test_dead_connection_is_replaced():
+    dead = FakeRaw('dead', dead=True)
+    pool = make_pool([dead], size=1)
+    conn = pool.acquire()
+    assert conn.raw.name == 'new'
+    assert dead.closed
+    stats = pool.stats()
+    assert stats['ping_failures'] == 1 and stats['open'] == 1
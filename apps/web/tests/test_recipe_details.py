@@ -0,0 +1,92 @@
+import pytest
+
+pytest.importorskip('mysql.connector')
+pytest.importorskip('flask')
+
+from services import search, ingredient_nutrition
+from services.ingredient_nutrition import invalidate_ingredient_nutrition
+
+HEADER = (1, 'カレー', '', 1, '2人分', None, None, 2, 800.0, 20.0, 30.0, 100.0, 5.0, 3.0)
+
+# RECIPE_INGREDIENTS_SQL の行: 豚肉は nutritions の 2 行 (大文字・小文字違いなど) と JOIN され、2 行返る
+# (INGREDIENT_ROW_ORDER の順なので、使うべき行が先)
+LEGACY_ROWS = [
+    (1, 10, '豚肉', '200g', '豚肉', 200.0, 250.0, 20.0, 20.0, 0.0, 0.0, 0.1),
+    (1, 10, '豚肉', '200g', '豚肉', 200.0, 999.0, 99.0, 99.0, 99.0, 0.0, 0.0),
+    (1, 11, '玉ねぎ', '1個', '玉ねぎ', 100.0, 40.0, 1.0, 0.0, 8.0, 2.0, 0.0),
+]
+
+
+class FakeCursor:
+    def __init__(self, materialized_rows=None):
+        self.materialized_rows = materialized_rows
+        self.dropped = False  # 確認の後に ingredient_nutrition が削除された
+        self.executed = []
+        self.rows = []
+
+    def execute(self, sql, params=()):
+        self.executed.append(sql)
+        if 'FROM ingredient_nutrition LIMIT 1' in sql:
+            if self.materialized_rows is None:
+                raise search.mysql.connector.Error('no table')
+            self.rows = [(1,)]
+        elif 'FROM recipes' in sql:
+            self.rows = [HEADER]
+        elif 'ingredient_nutrition AS inu' in sql:
+            if self.dropped:
+                raise search.mysql.connector.Error("Table 'ingredient_nutrition' doesn't exist")
+            self.rows = self.materialized_rows
+        elif 'FROM ingredients AS i' in sql:
+            self.rows = [row for row in LEGACY_ROWS if row[1] in params or row[0] in params]
+        else:
+            self.rows = []
+
+    def fetchall(self):
+        return self.rows
+
+
+@pytest.fixture(autouse=True)
+def reset_state():
+    invalidate_ingredient_nutrition()
+    yield
+    invalidate_ingredient_nutrition()
+
+
+def assert_single_ingredients(recipe):
+    assert [i.name for i in recipe.ingredients] == ['豚肉', '玉ねぎ']
+    assert sum(i.nutrition.energy for i in recipe.ingredients) == pytest.approx(500.0 + 40.0)
+    assert sum(i.nutrition.carbs for i in recipe.ingredients) == pytest.approx(10.0)
+
+
+def test_legacy_join_keeps_first_row_per_ingredient():
+    recipes = search.get_recipe_details_many(FakeCursor(), [1], with_steps=False)
+    assert_single_ingredients(recipes[0])
+
+
+def test_fallback_for_missing_materialized_rows_keeps_first_row():
+    # 豚肉はまだ ingredient_nutrition に無いので、従来の JOIN で補う
+    materialized = [
+        (1, 10, '豚肉', '200g', None, None, None, None, None, None, None),
+        (1, 11, '玉ねぎ', '1個', 11, '玉ねぎ', 100.0, 40.0, 1.0, 0.0, 10.0),
+    ]
+    recipes = search.get_recipe_details_many(FakeCursor(materialized), [1], with_steps=False)
+    assert_single_ingredients(recipes[0])
+
+
+def test_dropped_table_falls_back_until_rechecked(monkeypatch):
+    cursor = FakeCursor([])
+    assert search.get_recipe_details_many(cursor, [1], with_steps=False)[0].ingredients == []
+
+    # 使えると覚えた後に表が無くなっても、従来の JOIN で読む
+    cursor.materialized_rows = None
+    cursor.dropped = True
+    assert_single_ingredients(search.get_recipe_details_many(cursor, [1], with_steps=False)[0])
+    # 確認し直すまでは ingredient_nutrition を読みにいかない
+    cursor.executed = []
+    assert_single_ingredients(search.get_recipe_details_many(cursor, [1], with_steps=False)[0])
+    assert not any('ingredient_nutrition' in sql for sql in cursor.executed)
+
+    monkeypatch.setattr(ingredient_nutrition, 'INGREDIENT_NUTRITION_RETRY', 0)
+    cursor.executed = []
+    assert_single_ingredients(search.get_recipe_details_many(cursor, [1], with_steps=False)[0])
+    assert any('FROM ingredient_nutrition LIMIT 1' in sql for sql in cursor.executed)
@@ -0,0 +1,98 @@
+import pytest
+
+pytest.importorskip('mysql.connector')
+pytest.importorskip('flask')
+
+from services import search
+from services.ingredient_index import IngredientIndex, set_ingredient_index
+
+
+class GenerationTable:
+    """search_cache_generation 表 (全ワーカー共通) の代わり"""
+
+    def __init__(self):
+        self.generation = None
+
+    def cursor(self, **kwargs):
+        return GenerationCursor(self)
+
+    def commit(self):
+        pass
+
+
+class GenerationCursor:
+    def __init__(self, table):
+        self.table = table
+        self.result = []
+
+    def execute(self, sql, params=None):
+        if sql.lstrip().startswith('INSERT'):
+            self.table.generation = (self.table.generation or 0) + 1
+        if sql.lstrip().startswith('SELECT'):
+            self.result = [(self.table.generation,)] if self.table.generation is not None else []
+
+    def fetchall(self):
+        return self.result
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def db(monkeypatch):
+    table = GenerationTable()
+    calls = []
+
+    def find_recipe_ids(cursor, search_query, start_id, limit, search_mode, end_id=None):
+        calls.append(search_query)
+        return [start_id], start_id + 1
+
+    monkeypatch.setattr(search, '_find_recipe_ids', find_recipe_ids)
+    monkeypatch.setattr(search, '_fetch_recipe_summaries', lambda cursor, ids: [{'id': i} for i in ids])
+    monkeypatch.setattr(search, 'SEARCH_CACHE_CHECK_INTERVAL', -1)  # 毎回世代を確認する
+    monkeypatch.setattr(search, '_generation', {'value': 0, 'checked_at': 0.0})
+    search.invalidate_search_cache()
+    yield table, calls
+    set_ingredient_index(None)
+    search.invalidate_search_cache()
+
+
+def find(table):
+    return search._find_recipes(table.cursor(), '卵', 1, 10, 'and')
+
+
+def test_other_worker_invalidation_is_seen(db):
+    table, calls = db
+    find(table)
+    find(table)
+    assert len(calls) == 1
+
+    # 他のワーカーが /api/cache/invalidate を呼んだ (共通の世代だけが進む)
+    table.generation = 7
+    find(table)
+    assert len(calls) == 2
+    find(table)
+    assert len(calls) == 2
+
+
+def test_invalidate_bumps_the_shared_generation(db):
+    table, calls = db
+    find(table)
+    assert search.invalidate_search_cache(table) == 1
+    assert search.invalidate_search_cache(table) == 2
+    find(table)
+    assert len(calls) == 2
+
+
+def test_replacing_the_index_at_the_same_address_misses(db):
+    table, calls = db
+    index = IngredientIndex({})
+    set_ingredient_index(index)
+    find(table)
+    # 同じオブジェクト (同じ id()) で差し替えてもキーが変わる
+    set_ingredient_index(index)
+    find(table)
+    assert len(calls) == 2
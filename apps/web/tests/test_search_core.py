@@ -0,0 +1,131 @@
+import random
+import sqlite3
+import time
+
+import pytest
+
+pytest.importorskip('mysql.connector')
+pytest.importorskip('flask')
+
+from core import synonyms
+from services import search, parallel_query
+from services.ingredient_index import IngredientIndex, set_ingredient_index
+
+# 材料 → その材料を含むレシピの割合 (e はほぼすべてのレシピに含まれる: 除外の多いクエリ用)
+FREQUENCIES = {'玉ねぎ': 0.3, 'たまねぎ': 0.05, '豚肉': 0.2, 'ポーク': 0.03, '卵': 0.4,
+               'にんじん': 0.02, 'f': 0.5, 'e': 0.99}
+SYNONYM_ROWS = [('玉ねぎ', '玉ねぎ'), ('たまねぎ', '玉ねぎ'), ('豚肉', '豚肉'), ('ポーク', '豚肉')]
+N_RECIPES = 3000
+
+rng = random.Random(0)
+INGREDIENT_ROWS = [(recipe_id, name) for recipe_id in range(1, N_RECIPES + 1)
+                   for name, p in FREQUENCIES.items() if rng.random() < p]
+# 同じレシピに同じ材料が 2 行ある場合
+INGREDIENT_ROWS += INGREDIENT_ROWS[::50]
+POSTINGS = {}
+for recipe_id, name in INGREDIENT_ROWS:
+    POSTINGS.setdefault(name, set()).add(recipe_id)
+
+QUERIES = ['玉ねぎ', 'たまねぎ 豚肉', '玉ねぎ たまねぎ 卵', '豚肉 卵 にんじん', '卵 -豚肉',
+           '玉ねぎ 卵 -にんじん', 'にんじん ほうれん草', 'f -e', 'ほうれん草']
+
+
+def reference(search_query, search_mode, start_id, end_id=None):
+    """同義語を展開した集合演算で求めた、start_id 以上 (end_id 未満) の一致レシピ"""
+    groups = {norm: {syn for syn, n in SYNONYM_ROWS if n == norm} for _, norm in SYNONYM_ROWS}
+    synonyms_of = {syn: groups[norm] for syn, norm in SYNONYM_ROWS}
+
+    def recipes(keyword):
+        return set().union(*(POSTINGS.get(name, set()) for name in synonyms_of.get(keyword, {keyword})))
+
+    keywords = search_query.split()
+    inclusions = {frozenset(synonyms_of.get(k, {k})): recipes(k) for k in keywords if not k.startswith('-')}
+    excluded = set().union(*(recipes(k[1:]) for k in keywords if k.startswith('-')))
+    matched = set.union(*inclusions.values()) if search_mode == 'or' else set.intersection(*inclusions.values())
+    return sorted(rid for rid in matched - excluded if rid >= start_id and (end_id is None or rid < end_id))
+
+
+class SqliteCursor:
+    """%s のプレースホルダを sqlite3 に渡し、行を dict で返すカーソル"""
+
+    def __init__(self, conn):
+        self._cursor = conn.cursor()
+        self.executed = []
+
+    def execute(self, sql, params=()):
+        self.executed.append(sql)
+        self._cursor.execute(sql.replace('%s', '?'), tuple(params))
+
+    def fetchall(self):
+        names = [d[0] for d in self._cursor.description]
+        return [dict(zip(names, row)) for row in self._cursor.fetchall()]
+
+
+@pytest.fixture(scope='module')
+def db():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE ingredients (id INTEGER PRIMARY KEY, recipe_id INTEGER, name TEXT)")
+    conn.execute("CREATE INDEX idx_name_recipe ON ingredients (name, recipe_id)")
+    conn.executemany("INSERT INTO ingredients (recipe_id, name) VALUES (?, ?)", INGREDIENT_ROWS)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture(scope='module')
+def index(db):
+    return IngredientIndex.build_from_db(db.cursor())
+
+
+@pytest.fixture(params=['index', 'sql'])
+def engine(request, db, index, monkeypatch):
+    model = synonyms.SynonymModel(SYNONYM_ROWS, 1, None)
+    monkeypatch.setattr(synonyms, 'SYNONYM_CACHE_ENABLED', True)
+    monkeypatch.setattr(synonyms, '_MODEL', model)
+    monkeypatch.setattr(synonyms, '_LAST_CHECK', time.time())
+    monkeypatch.setattr(synonyms, 'SYNONYM_CHECK_INTERVAL', float('inf'))
+    monkeypatch.setattr(search, 'get_group_count', lambda cursor, group: None)  # COUNT(*) で見積もる
+    monkeypatch.setattr(parallel_query, 'SEARCH_PARALLELISM', 0)
+    set_ingredient_index(index if request.param == 'index' else None)
+    yield SqliteCursor(db)
+    set_ingredient_index(None)
+
+
+def find_all(cursor, search_query, search_mode, start_id, limit, end_id=None):
+    """resume_id で最後までページを送り、各ページを返す"""
+    pages = []
+    while start_id is not None:
+        found_ids, start_id = search._find_recipe_ids(cursor, search_query, start_id, limit, search_mode, end_id)
+        assert len(found_ids) <= limit
+        pages.append(found_ids)
+        assert len(pages) <= N_RECIPES
+    return pages
+
+
+@pytest.mark.parametrize('search_mode', ['and', 'or'])
+@pytest.mark.parametrize('search_query', QUERIES)
+@pytest.mark.parametrize('start_id, limit', [(1, 10), (777, 1), (777, 50), (2900, 10)])
+def test_pages_match_reference(engine, search_query, search_mode, start_id, limit):
+    expected = reference(search_query, search_mode, start_id)
+    pages = find_all(engine, search_query, search_mode, start_id, limit)
+    assert pages[0] == expected[:limit]
+    assert [rid for page in pages for rid in page] == expected
+
+
+@pytest.mark.parametrize('search_mode', ['and', 'or'])
+@pytest.mark.parametrize('search_query', ['玉ねぎ', 'たまねぎ 豚肉', '卵 -豚肉', 'f -e'])
+def test_end_id_bounds_the_scan(engine, search_query, search_mode):
+    expected = reference(search_query, search_mode, 500, end_id=1200)
+    pages = find_all(engine, search_query, search_mode, 500, 10, end_id=1200)
+    assert [rid for page in pages for rid in page] == expected
+
+
+def test_no_inclusions(engine):
+    assert search._find_recipe_ids(engine, '-卵', 1, 10, 'and') == ([], None)
+
+
+@pytest.mark.parametrize('search_mode', ['and', 'or'])
+def test_sparse_exclusion_batches_grow(engine, search_mode):
+    # ほとんどの候補が除外される場合も、除外確認は候補 1 件ごとの往復にならない
+    found_ids, _ = search._find_recipe_ids(engine, 'f -e', 1, 10, search_mode)
+    assert found_ids == reference('f -e', search_mode, 1)[:10]
+    assert sum('recipe_id IN' in sql for sql in engine.executed) <= 10
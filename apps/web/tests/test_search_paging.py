@@ -0,0 +1,97 @@
+import random
+from array import array
+
+import pytest
+
+pytest.importorskip('mysql.connector')
+pytest.importorskip('flask')
+
+from services import search
+from services.ingredient_index import IngredientIndex, POSTING_TYPECODE, set_ingredient_index
+from services.search_token import InvalidSearchToken
+
+# 材料 → レシピ ID (同義語は使わず、キーワード 1 つ = 材料 1 つ)
+rng = random.Random(0)
+POSTINGS = {name: sorted(rng.sample(range(1, 3000), size))
+            for name, size in (('玉ねぎ', 900), ('豚肉', 600), ('卵', 1200), ('にんじん', 80))}
+
+
+def reference_match(search_query, search_mode):
+    keywords = search_query.split()
+    inclusions = [set(POSTINGS.get(k, ())) for k in keywords if not k.startswith('-')]
+    exclusions = set().union(*(POSTINGS.get(k[1:], ()) for k in keywords if k.startswith('-')))
+    if not inclusions:
+        return set()
+    matched = set.union(*inclusions) if search_mode == 'or' else set.intersection(*inclusions)
+    return matched - exclusions
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    def parse_query(cursor, search_query):
+        keywords = search_query.split()
+        return ([[k] for k in keywords if not k.startswith('-')],
+                [k[1:] for k in keywords if k.startswith('-')])
+
+    def find_recipe_ids(cursor, search_query, start_id, limit, search_mode, end_id=None):
+        ids = sorted(i for i in reference_match(search_query, search_mode)
+                     if i >= start_id and (end_id is None or i < end_id))
+        page = ids[:limit]
+        return page, (page[-1] + 1 if len(ids) > limit else None)
+
+    monkeypatch.setattr(search, '_parse_query', parse_query)
+    monkeypatch.setattr(search, '_find_recipe_ids', find_recipe_ids)
+    monkeypatch.setattr(search, '_fetch_recipe_summaries', lambda cursor, ids: [{'id': i} for i in ids])
+    monkeypatch.setattr(search, 'MAX_RECIPE_ID', 3000)
+    monkeypatch.setattr(search, 'START_ID_BUCKET_SIZE', 500)
+    monkeypatch.setattr(search, 'SEARCH_CACHE_CHECK_INTERVAL', float('inf'))  # 世代の表は読まない
+    search.invalidate_search_cache()
+    yield
+    set_ingredient_index(None)
+    search.invalidate_search_cache()
+
+
+def collect_pages(search_query, search_mode, seed, limit=37):
+    ids = []
+    recipes, token = search.search_recipes_page(None, search_query, limit=limit, search_mode=search_mode, seed=seed)
+    ids.extend(r['id'] for r in recipes)
+    while token:
+        recipes, token = search.search_recipes_page(None, search_query, limit=limit, search_mode=search_mode,
+                                                    token=token)
+        ids.extend(r['id'] for r in recipes)
+    return ids
+
+
+QUERIES = [('玉ねぎ', 'and'), ('玉ねぎ 豚肉', 'and'), ('玉ねぎ 豚肉', 'or'), ('卵 -玉ねぎ', 'and'),
+           ('にんじん 卵 -豚肉', 'or'), ('無い材料', 'and')]
+
+
+@pytest.mark.parametrize('use_index', [False, True])
+@pytest.mark.parametrize('search_query, search_mode', QUERIES)
+def test_pages_cover_the_match_set_exactly_once(fake_db, use_index, search_query, search_mode):
+    if use_index:
+        set_ingredient_index(IngredientIndex({name: array(POSTING_TYPECODE, ids) for name, ids in POSTINGS.items()}))
+    expected = reference_match(search_query, search_mode)
+    for seed in range(5):
+        ids = collect_pages(search_query, search_mode, seed)
+        assert len(ids) == len(set(ids))
+        assert set(ids) == expected
+
+
+def test_token_is_bound_to_its_query(fake_db):
+    _, token = search.search_recipes_page(None, '卵', limit=5, seed=1)
+    with pytest.raises(InvalidSearchToken):
+        search.search_recipes_page(None, '豚肉', limit=5, token=token)
+    with pytest.raises(InvalidSearchToken):
+        search.search_recipes_page(None, '卵', limit=5, search_mode='or', token=token)
+
+
+@pytest.mark.parametrize('bucket_size, n_starts', [(10000, 150), (1000, 1500)])
+def test_random_start_ids_snap_to_buckets(monkeypatch, bucket_size, n_starts):
+    monkeypatch.setattr(search, 'START_ID_BUCKET_SIZE', bucket_size)
+    monkeypatch.setattr(search, 'MAX_RECIPE_ID', 1500000)
+    rng = random.Random(0)
+    starts = {search.random_start_id(rng) for _ in range(20000)}
+    assert all((start - 1) % bucket_size == 0 and start <= 1500000 for start in starts)
+    # 最初のページは MAX_RECIPE_ID / START_ID_BUCKET_SIZE 通り
+    assert len(starts) == n_starts
@@ -0,0 +1,33 @@
+import pytest
+
+from services.search_token import (encode_search_token, decode_search_token, load_search_token_key,
+                                   InvalidSearchToken)
+
+
+def test_round_trip():
+    state = {'k': 'scan', 'o': 10001, 'p': 12345, 'w': 0, 'q': '玉ねぎ 豚肉', 'm': 'and'}
+    assert decode_search_token(encode_search_token(state)) == state
+
+
+@pytest.mark.parametrize('token', ['', 'abc', 'a.b.c', '.', '!!!.###'])
+def test_malformed_tokens_are_rejected(token):
+    with pytest.raises(InvalidSearchToken):
+        decode_search_token(token)
+
+
+def test_tampered_payload_is_rejected():
+    _, signature = encode_search_token({'k': 'sample', 's': 1, 'n': 10}).split('.')
+    forged, _ = encode_search_token({'k': 'sample', 's': 1, 'n': 1000}).split('.')
+    with pytest.raises(InvalidSearchToken):
+        decode_search_token(f"{forged}.{signature}")
+
+
+def test_key_from_secret_or_generated_file(tmp_path):
+    path = tmp_path / 'search_token.key'
+    assert load_search_token_key('explicit', str(path)) == b'explicit'
+    assert not path.exists()
+
+    generated = load_search_token_key('', str(path))
+    assert len(generated) >= 32 and path.exists()
+    # 他のワーカー (プレースホルダのまま) も同じ鍵を読む
+    assert load_search_token_key('change_me', str(path)) == generated
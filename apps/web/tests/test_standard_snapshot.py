@@ -0,0 +1,35 @@
+import pytest
+
+pytest.importorskip('mysql.connector')
+
+from services.standard_snapshot import StandardSnapshot
+
+RECIPES = [
+    {'id': 1, 'category_medium': 'ﾁｰｽﾞｹｰｷ', 'recipe_count': 30},
+    {'id': 2, 'category_medium': 'カレーライス', 'recipe_count': 20},
+    {'id': 3, 'category_medium': 'Pizza', 'recipe_count': 10},
+]
+INGREDIENTS = [
+    {'standard_recipe_id': 1, 'group_name': None, 'ingredient_name': 'ｸﾘｰﾑﾁｰｽﾞ', 'count': 9},
+    {'standard_recipe_id': 3, 'group_name': None, 'ingredient_name': 'クリームチーズ', 'count': 2},
+    {'standard_recipe_id': 2, 'group_name': None, 'ingredient_name': 'ＣＵＲＲＹ粉', 'count': 5},
+]
+
+
+@pytest.fixture(scope='module')
+def snapshot():
+    return StandardSnapshot(RECIPES, INGREDIENTS, [], 1, None)
+
+
+def test_names_match_case_and_width_variants(snapshot):
+    # utf8mb4_general_ci の LIKE と同じく、大文字・小文字や全角・半角の違いは一致する
+    assert snapshot.search_by_name(['チーズ'], []) == [1]
+    assert snapshot.search_by_name(['ｐｉｚｚａ'], []) == [3]
+    assert snapshot.search_by_name([], ['ﾁｰｽﾞ']) == [2, 3]
+
+
+def test_ingredients_match_case_and_width_variants(snapshot):
+    rows = snapshot.ingredient_rows('クリームチーズ')
+    assert rows == snapshot.ingredient_rows('ｸﾘｰﾑﾁｰｽﾞ') and len(rows) == 1
+    assert snapshot.ingredient_counts(rows) == {1: 9, 3: 2}
+    assert snapshot.ingredient_counts(snapshot.ingredient_rows_like('curry')) == {2: 5}
@@ -0,0 +1,46 @@
+import datetime
+
+from services.summary_store import RecipeSummaryStore
+
+# SELECT id, title, description, published_at FROM recipes ORDER BY id の行 (4 は欠番)
+ROWS = [
+    (1, 'カレー', '辛口', datetime.datetime(2024, 5, 1, 12, 30)),
+    (2, 'サラダ', None, datetime.datetime(2024, 5, 2, 8, 0, 0, 123456)),
+    (3, '味噌汁', '', None),
+    (5, '煮物', '和食', datetime.date(2024, 5, 3)),
+]
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.pending = []
+
+    def execute(self, sql, params=()):
+        if 'MAX(id)' in sql:
+            self.pending = [(max(row[0] for row in self.rows),)]
+        else:
+            self.pending = list(self.rows)
+
+    def fetchone(self):
+        return self.pending.pop(0)
+
+    def fetchmany(self, size):
+        rows, self.pending = self.pending[:size], self.pending[size:]
+        return rows
+
+
+def test_rows_match_sql_types(tmp_path):
+    path = str(tmp_path / 'summaries.bin')
+    assert RecipeSummaryStore.build(FakeCursor(ROWS), path) == 4
+    store = RecipeSummaryStore(path)
+    try:
+        rows, missing = store.get_many([5, 4, 1, 2, 3])
+        assert missing == [4]
+        # SQL と同じく published_at は datetime (DATE 列なら date) で返る
+        assert rows == [
+            {'id': rid, 'title': title, 'description': description, 'published_at': published_at}
+            for rid, title, description, published_at in [ROWS[3], ROWS[0], ROWS[1], ROWS[2]]
+        ]
+    finally:
+        store.close()
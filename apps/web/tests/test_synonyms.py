@@ -0,0 +1,73 @@
+import pytest
+
+from core import synonyms
+
+
+class FakeCursor:
+    """synonym_dictionary の行と CHECKSUM TABLE の値を返すカーソル"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.result = None
+
+    @property
+    def checksum(self):
+        return hash(tuple(self.rows)) & 0xffffffff
+
+    def execute(self, sql, params=None):
+        if sql.startswith('CHECKSUM TABLE'):
+            self.result = [('db.synonym_dictionary', self.checksum)]
+        else:
+            self.result = [(synonym, norm) for _, synonym, norm in sorted(self.rows)]
+
+    def fetchall(self):
+        return self.result
+
+
+@pytest.fixture
+def fresh_model(monkeypatch):
+    monkeypatch.setattr(synonyms, '_MODEL', None)
+    monkeypatch.setattr(synonyms, '_LAST_CHECK', 0.0)
+    monkeypatch.setattr(synonyms, 'SYNONYM_CACHE_ENABLED', True)
+    monkeypatch.setattr(synonyms, 'SYNONYM_CHECK_INTERVAL', -1)  # 毎回確認する
+    monkeypatch.setattr(synonyms, '_RELOAD_LISTENERS', [])
+
+
+def test_update_without_count_change_reloads(fresh_model):
+    # (COUNT(*), MAX(id)) が変わらない UPDATE・削除 + 追加でも読み直すこと
+    cursor = FakeCursor([(1, 'たまねぎ', '玉ねぎ'), (2, 'オニオン', '玉ねぎ')])
+    reloaded = []
+    synonyms.on_synonym_reload(reloaded.append)
+
+    model = synonyms.get_synonym_model(cursor)
+    assert model.get_normalized_name('オニオン') == '玉ねぎ'
+    assert synonyms.get_synonym_model(cursor) is model
+
+    cursor.rows[1] = (2, 'オニオン', 'たまねぎ類')
+    updated = synonyms.get_synonym_model(cursor)
+    assert updated is not model and updated.version == model.version + 1
+    assert updated.get_normalized_name('オニオン') == 'たまねぎ類'
+
+    cursor.rows[0] = (1, 'タマネギ', '玉ねぎ')
+    replaced = synonyms.get_synonym_model(cursor)
+    assert replaced.get_normalized_name('たまねぎ') is None
+    assert replaced.get_normalized_name('タマネギ') == '玉ねぎ'
+    assert reloaded == [model, updated, replaced]
+
+
+def test_model_resolution(fresh_model):
+    cursor = FakeCursor([(1, 'たまねぎ', '玉ねぎ'), (2, 'オニオン', '玉ねぎ'), (3, '豚肉', '豚肉')])
+    model = synonyms.get_synonym_model(cursor)
+    assert sorted(model.get_synonyms('オニオン')) == sorted(['オニオン', '玉ねぎ', 'たまねぎ'])
+    assert model.unify_keywords(['オニオン', 'たまねぎ', '人参']) == ['たまねぎ', '人参']
+
+
+def test_normalized_name_ignores_case_and_width(fresh_model):
+    # MySQL の照合順序 (utf8mb4_general_ci) と同じく、大文字・小文字や全角・半角の違いでも引けること
+    cursor = FakeCursor([(1, 'ｱｽﾊﾟﾗ', 'アスパラガス'), (2, 'Bacon', 'ベーコン'), (3, 'ベーコン', 'ベーコン')])
+    model = synonyms.get_synonym_model(cursor)
+    assert model.get_normalized_name('ＢＡＣＯＮ') == 'ベーコン'
+    assert model.get_normalized_name('bacon') == 'ベーコン'
+    assert model.get_normalized_name('アスパラ') == 'アスパラガス'
+    assert model.get_normalized_name('ｱｽﾊﾟﾗｶﾞｽ') == 'アスパラガス'
+    assert model.get_normalized_name('ほうれん草') is None